@@ -0,0 +1,377 @@
+"""Inbox digests: stored summaries grouped by conversation and reduced in a bounded number of model calls."""
+
+import asyncio
+import logging
+import math
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from email.utils import parseaddr
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Optional, TypeVar
+
+from starlette.concurrency import run_in_threadpool
+
+from app.agent.email_agent import EmailAgent, get_agent, heuristic_summary
+from app.agent.llm_router import deadline
+from app.agent.models import DigestRequest, DigestResponse, DigestSection, DigestSectionDraft
+from app.agent.summary_worker import estimate_tokens
+from app.config import get_settings
+from app.email.models import EmailPriority, EmailSummary
+from app.email.records import EmailRecord, as_utc
+from app.email.store import MailStore
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Ranking: the most urgent message of a section counts most, then required action
+PRIORITY_WEIGHTS = {EmailPriority.HIGH: 3.0, EmailPriority.MEDIUM: 1.5, EmailPriority.LOW: 0.5}
+ACTION_WEIGHT = 1.0
+UNREAD_WEIGHT = 0.25  # per unread message, up to MAX_UNREAD_BONUS
+MAX_UNREAD_BONUS = 1.0
+SIZE_WEIGHT = 0.25  # per doubling of the message count
+
+_REPLY_PREFIX_RE = re.compile(r"^\s*((re|fwd?|aw|wg)\s*:\s*)+", re.IGNORECASE)
+
+
+@dataclass(slots=True)
+class DigestGroup:
+    """Messages of one conversation (or sender) with their summaries, newest first."""
+
+    key: str
+    emails: list[EmailRecord] = field(default_factory=list)
+    summaries: list[EmailSummary] = field(default_factory=list)
+
+    @property
+    def priority(self) -> EmailPriority:
+        """Highest priority among the messages."""
+        return max((s.priority for s in self.summaries), key=PRIORITY_WEIGHTS.__getitem__)
+
+    @property
+    def action_required(self) -> bool:
+        """Whether any message asks the user to act."""
+        return any(s.action_required for s in self.summaries)
+
+    @property
+    def unread(self) -> int:
+        """Number of unread messages."""
+        return sum(not email.is_read for email in self.emails)
+
+    @property
+    def score(self) -> float:
+        """Ranking score from local signals only (no model call)."""
+        return (
+            PRIORITY_WEIGHTS[self.priority]
+            + (ACTION_WEIGHT if self.action_required else 0.0)
+            + min(self.unread * UNREAD_WEIGHT, MAX_UNREAD_BONUS)
+            + SIZE_WEIGHT * math.log2(len(self.emails))
+        )
+
+    def render(self, label: str, budget: int) -> str:
+        """
+        Prompt text of the group under a "[label]" heading, oldest first.
+
+        When the group does not fit in ``budget`` estimated tokens, the
+        oldest messages are left out.
+        """
+        lines: list[str] = []
+        used = estimate_tokens(label) + 2
+        for email, summary in zip(self.emails, self.summaries):
+            line = (
+                f"- {email.date:%Y-%m-%d %H:%M} {email.from_address}: {email.subject} -- {summary.summary}"
+                + (" (action required)" if summary.action_required else "")
+            )
+            used += estimate_tokens(line)
+            if lines and used > budget:
+                lines.append(f"- ({len(self.emails) - len(lines)} earlier messages omitted)")
+                break
+            lines.append(line)
+        return f"[{label}]\n" + "\n".join(reversed(lines))
+
+    def fallback_section(self) -> tuple[str, str]:
+        """Title and summary without a model call: the newest message's, plus a count."""
+        title = _REPLY_PREFIX_RE.sub("", self.emails[0].subject).strip() or "(no subject)"
+        summary = self.summaries[0].summary
+        if len(self.emails) > 1:
+            summary += f" ({len(self.emails) - 1} more messages)"
+        return title, summary
+
+
+def group_emails(
+    rows: list[tuple[EmailRecord, str, EmailSummary]], group_by: str
+) -> list[DigestGroup]:
+    """
+    Group summarized emails by thread id or sender address and rank the groups.
+
+    Args:
+        rows: (email, thread id, summary) tuples, newest first
+        group_by: "thread" or "sender"
+
+    Returns:
+        Groups, best ranked first (newest message breaks ties)
+    """
+    groups: dict[str, DigestGroup] = {}
+    for email, thread_id, summary in rows:
+        key = thread_id if group_by == "thread" else parseaddr(email.from_address)[1].lower()
+        group = groups.setdefault(key, DigestGroup(key=key))
+        group.emails.append(email)
+        group.summaries.append(summary)
+
+    return sorted(
+        groups.values(),
+        key=lambda g: (g.score, g.emails[0].date.timestamp()),
+        reverse=True,
+    )
+
+
+def pack(texts: list[str], budget: int) -> list[list[int]]:
+    """
+    Split texts, in order, into batches of at most ``budget`` estimated tokens.
+
+    A text larger than the budget gets a batch of its own.
+
+    Returns:
+        Indexes of the texts in each batch
+    """
+    batches: list[list[int]] = []
+    used = budget
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if used + tokens > budget:
+            batches.append([])
+            used = 0
+        batches[-1].append(i)
+        used += tokens
+    return batches
+
+
+class DigestBuilder:
+    """
+    Builds ranked digests of a mailbox over a time range.
+
+    Map: every message contributes its stored summary (the rule-based
+    summarizer stands in for messages not summarized yet), so no model
+    call is made per message. Messages are grouped by conversation or
+    sender and ranked from local signals.
+
+    Reduce: single-message sections use their summary as is. Sections
+    with several messages are condensed by the model, many per call, in
+    batches of at most ``level_token_budget`` prompt tokens, best ranked
+    first. The overview is then written from the sections; if they do
+    not fit in one call, each batch is reduced to a partial overview
+    and the partials are reduced again, level by level. At most
+    ``max_llm_calls`` calls are made per digest: sections that do not
+    get a call keep their uncondensed text, and when the overview's
+    levels would not fit in the remaining calls only the best-ranked
+    sections are summarized.
+    """
+
+    def __init__(self, agent: EmailAgent, max_emails: int, level_token_budget: int, max_llm_calls: int):
+        """Create a builder."""
+        self.agent = agent
+        self.max_emails = max(1, max_emails)
+        self.level_token_budget = max(500, level_token_budget)
+        self.max_llm_calls = max(0, max_llm_calls)
+
+    async def build(
+        self, store: MailStore, request: DigestRequest, timeout: Optional[float] = None
+    ) -> DigestResponse:
+        """Build a complete digest (see stream() for the arguments)."""
+        async for event in self.stream(store, request, timeout):
+            if event["type"] == "done":
+                return DigestResponse.model_validate(event["digest"])
+        raise RuntimeError("Digest stream ended without a result")
+
+    async def stream(
+        self, store: MailStore, request: DigestRequest, timeout: Optional[float] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Build a digest, yielding events as its parts complete.
+
+        Args:
+            store: Local store of the account
+            request: Range, mailbox and grouping of the digest
+            timeout: Client time budget in seconds (shortens the profile deadline)
+
+        Yields:
+            JSON-ready events: "start" (counts), one "section" per section
+            in completion order, "overview", then "done" with the full digest
+        """
+        until = as_utc(request.until) if request.until else datetime.now(timezone.utc)
+        since = as_utc(request.since) if request.since else until - timedelta(days=1)
+        period = f"{since:%Y-%m-%d %H:%M} to {until:%Y-%m-%d %H:%M} UTC"
+        seconds = self.agent.router.deadline_seconds("digest", timeout)
+        ends_at = time.monotonic() + seconds if seconds else None
+
+        # Map: stored summaries, or rule-based ones for messages not summarized yet
+        cached = await run_in_threadpool(store.emails_in_range, request.mailbox, since, until, self.max_emails)
+        heuristic = sum(summary is None or summary.heuristic for _, _, summary in cached)
+        rows = [
+            (email, thread_id, summary or heuristic_summary(email))
+            for email, thread_id, summary in cached
+        ]
+
+        ranked = group_emails(rows, request.group_by)
+        groups = ranked[:request.max_sections]
+        yield {"type": "start", "email_count": len(rows), "section_count": len(groups)}
+
+        calls_left = self.max_llm_calls
+        degraded = False
+        sections: dict[int, DigestSection] = {}
+
+        def section(index: int, title: str, summary: str, condensed: bool) -> DigestSection:
+            group = groups[index]
+            sections[index] = DigestSection(
+                rank=index + 1,
+                key=group.key,
+                title=title,
+                summary=summary,
+                email_ids=[email.id for email in group.emails],
+                senders=list(dict.fromkeys(email.from_address for email in group.emails)),
+                priority=group.priority,
+                action_required=group.action_required,
+                unread=group.unread,
+                score=round(group.score, 3),
+                condensed=condensed,
+            )
+            return sections[index]
+
+        # Level 1: single messages need no call, conversations are condensed in batches
+        to_condense = [i for i, group in enumerate(groups) if len(group.emails) > 1]
+        for i, group in enumerate(groups):
+            if len(group.emails) == 1:
+                yield {"type": "section", "section": section(i, *group.fallback_section(), False).model_dump(mode="json")}
+
+        texts = [groups[i].render(str(n + 1), self.level_token_budget) for n, i in enumerate(to_condense)]
+        batches = pack(texts, self.level_token_budget)
+        # Keep one call for the overview
+        condensed_batches = batches[:max(0, min(len(batches), calls_left - 1))]
+        calls_left -= len(condensed_batches)
+
+        async def condense(batch: list[int]) -> tuple[list[int], list[DigestSectionDraft]]:
+            prompt = "\n\n".join(texts[n] for n in batch)
+            return batch, await self._call(ends_at, self.agent.condense_digest_groups, prompt, period)
+
+        tasks = [asyncio.create_task(condense(batch)) for batch in condensed_batches]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    batch, drafts = await next_done
+                except Exception as e:
+                    logger.warning(f"Digest section batch failed: {e}")
+                    degraded = True
+                    continue
+                by_label = {draft.key.strip("[] "): draft for draft in drafts}
+                for n in batch:
+                    draft = by_label.get(str(n + 1))
+                    if draft is None:
+                        continue
+                    yield {
+                        "type": "section",
+                        "section": section(to_condense[n], draft.title, draft.summary, True).model_dump(mode="json"),
+                    }
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        # Batches without a call, failed batches and sections the model skipped
+        for i in to_condense:
+            if i not in sections:
+                degraded = True
+                yield {"type": "section", "section": section(i, *groups[i].fallback_section(), False).model_dump(mode="json")}
+
+        # Level 2+: overview of the ranked sections
+        ordered = [sections[i] for i in range(len(groups))]
+        overview, calls_used, complete = await self._overview(ordered, period, calls_left, ends_at)
+        degraded = degraded or not complete
+        calls_left -= calls_used
+        if overview is None:
+            overview = _fallback_overview(len(rows), ranked, ordered)
+        yield {"type": "overview", "overview": overview}
+
+        digest = DigestResponse(
+            mailbox=request.mailbox,
+            since=since,
+            until=until,
+            email_count=len(rows),
+            overview=overview,
+            sections=ordered,
+            omitted_sections=len(ranked) - len(groups),
+            heuristic_summaries=heuristic,
+            llm_calls=self.max_llm_calls - calls_left,
+            degraded=degraded,
+        )
+        logger.info(
+            f"Digest of {len(rows)} emails in {request.mailbox}: {len(ordered)} sections, "
+            f"{digest.llm_calls} model calls"
+        )
+        yield {"type": "done", "digest": digest.model_dump(mode="json")}
+
+    async def _overview(
+        self, sections: list[DigestSection], period: str, calls_left: int, ends_at: Optional[float]
+    ) -> tuple[Optional[str], int, bool]:
+        """
+        Reduce sections to an overview within the remaining calls.
+
+        Returns:
+            (overview or None if no call could be made or it failed,
+            calls made, whether every section was taken into account)
+        """
+        texts = [
+            f"- {s.title}: {s.summary}" + (" (action required)" if s.action_required else "")
+            for s in sections
+        ]
+        calls = 0
+        try:
+            while texts and calls_left - calls > 0:
+                batches = pack(texts, self.level_token_budget)
+                if len(batches) == 1 or calls_left - calls < len(batches) + 1:
+                    # Last level (or not enough calls for another one): best ranked part only
+                    calls += 1
+                    overview = await self._call(
+                        ends_at, self.agent.digest_overview, "\n".join(texts[i] for i in batches[0]), period
+                    )
+                    return overview, calls, len(batches) == 1
+
+                calls += len(batches)
+                texts = list(await asyncio.gather(*(
+                    self._call(ends_at, self.agent.digest_overview, "\n".join(texts[i] for i in batch), period)
+                    for batch in batches
+                )))
+        except Exception as e:
+            logger.warning(f"Digest overview failed: {e}")
+        return None, calls, False
+
+    @staticmethod
+    async def _call(ends_at: Optional[float], func: Callable[..., T], *args) -> T:
+        """Run an agent call off the event loop within what is left of the digest deadline."""
+        remaining = None if ends_at is None else max(0.0, ends_at - time.monotonic())
+        with deadline(remaining):
+            return await run_in_threadpool(func, *args)
+
+
+def _fallback_overview(email_count: int, groups: list[DigestGroup], sections: list[DigestSection]) -> str:
+    """Overview without a model call: counts and the top headlines."""
+    if not email_count:
+        return "No email in this period."
+
+    needs_action = sum(group.action_required for group in groups)
+    text = f"{email_count} emails in {len(groups)} {'conversations' if len(groups) != 1 else 'conversation'}"
+    text += f", {needs_action} needing action." if needs_action else "."
+    if sections:
+        text += " Most important: " + "; ".join(s.title for s in sections[:3]) + "."
+    return text
+
+
+@lru_cache
+def get_digest_builder() -> DigestBuilder:
+    """Get the shared digest builder."""
+    settings = get_settings()
+    return DigestBuilder(
+        get_agent(),
+        max_emails=settings.digest_max_emails,
+        level_token_budget=settings.digest_level_token_budget,
+        max_llm_calls=settings.digest_max_llm_calls,
+    )
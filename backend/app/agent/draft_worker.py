@@ -0,0 +1,130 @@
+"""Speculative reply drafting for high-priority email."""
+
+import asyncio
+import logging
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.agent.email_agent import EmailAgent, get_agent
+from app.agent.prompts import EmailTone
+from app.agent.summary_worker import TokenBudget, estimate_tokens
+from app.agent.usage import UsageLedger, get_usage_ledger
+from app.config import get_settings
+from app.email.models import EmailPriority, EmailSummary
+from app.email.records import EmailRecord
+
+if TYPE_CHECKING:
+    from app.core.accounts import MailAccount
+
+logger = logging.getLogger(__name__)
+
+
+class DraftWorker:
+    """
+    Pre-generates replies for emails the summarizer marks as urgent.
+
+    Registered as a summary worker listener: when a summary has
+    ``priority == HIGH`` and ``action_required``, a reply in the default
+    tone is drafted in the background (one at a time, within a daily token
+    budget) and stored so generate-reply can return it immediately. The
+    store drops the draft when a newer message joins the thread.
+
+    There is no rule-based stand-in for a reply: once the budget is used
+    up, and for emails whose summary is itself heuristic, no draft is made.
+    """
+
+    def __init__(
+        self,
+        agent: EmailAgent,
+        tone: EmailTone,
+        daily_token_budget: int,
+        ledger: Optional[UsageLedger] = None,
+    ):
+        """Create the worker (call start() to begin processing)."""
+        self.agent = agent
+        self.tone = tone
+        self.budget = TokenBudget(daily_token_budget, ledger, ("reply",))
+        self._queue: asyncio.Queue[tuple["MailAccount", EmailRecord]] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def on_summary(self, account: "MailAccount", email: EmailRecord, summary: EmailSummary) -> None:
+        """Queue a draft for high-priority, action-required emails (summary listener)."""
+        if summary.priority == EmailPriority.HIGH and summary.action_required and not summary.heuristic:
+            self._queue.put_nowait((account, email))
+
+    def start(self) -> None:
+        """Start processing queued drafts."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="draft-worker")
+
+    async def stop(self) -> None:
+        """Cancel the worker; queued drafts are dropped."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        """Draft queued emails until cancelled."""
+        while True:
+            account, email = await self._queue.get()
+            try:
+                await self._draft(account, email)
+            except Exception as e:
+                logger.error(f"Speculative draft for email {email.id} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _draft(self, account: "MailAccount", email: EmailRecord) -> None:
+        """Generate and store one draft, unless it is stale or over budget."""
+        store = account.store
+        if store.get_draft(email.id, self.tone.value):
+            return
+
+        # The same context as an on-demand reply, so the cached draft matches one
+        thread, related = await run_in_threadpool(account.reply_context, email)
+        cost = (
+            estimate_tokens(email.body)
+            + sum(estimate_tokens(m.body) for m in thread)
+            + (account.settings.related_context_max_tokens if related else 0)
+        )
+        if not self.budget.allows(cost):
+            logger.info(
+                f"Daily draft budget reached ({self.budget.used} tokens), skipping email {email.id}"
+            )
+            return
+
+        reply_text = await run_in_threadpool(
+            self.agent.generate_reply,
+            email=email,
+            tone=self.tone,
+            thread=thread,
+            related=related,
+        )
+        self.budget.spend(cost + estimate_tokens(reply_text))
+
+        # A message that arrived while drafting makes this reply stale
+        latest = store.get_thread(email).messages[-1]
+        if latest.message_id != email.message_id and latest.date > email.date:
+            logger.info(f"Discarding speculative draft for email {email.id}: thread moved on")
+            return
+
+        store.save_draft(email.id, self.tone.value, reply_text)
+        logger.info(f"Stored speculative {self.tone.value} draft for email {email.id}")
+
+
+@lru_cache
+def get_draft_worker() -> DraftWorker:
+    """Get the shared speculative draft worker."""
+    settings = get_settings()
+    return DraftWorker(
+        get_agent(),
+        tone=EmailTone(settings.speculative_draft_tone),
+        daily_token_budget=settings.speculative_daily_token_budget,
+        ledger=get_usage_ledger(),
+    )
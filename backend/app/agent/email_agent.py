@@ -1,24 +1,240 @@
 """LangChain agent for email response generation."""
 
+import difflib
 import json
 import logging
-from typing import Optional
-
-from langchain_anthropic import ChatAnthropic
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-
+import re
+import threading
+from functools import lru_cache
+from typing import AsyncIterator, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from app.agent.llm_router import CircuitOpenError, DeadlineExceededError, ModelRouter
+from app.agent.models import (
+    DigestSectionDraft,
+    DigestSectionDrafts,
+    DraftEdit,
+    DraftEdits,
+    EmailAnalysis,
+    SummaryOutputMetrics,
+)
 from app.agent.prompts import (
     BASE_SYSTEM_PROMPT,
     EmailTone,
+    get_digest_overview_prompt,
+    get_digest_sections_prompt,
+    get_edit_refinement_prompt,
     get_refinement_prompt,
     get_reply_generation_prompt,
     get_summary_prompt,
 )
-from app.config import Settings
-from app.email.models import Email, EmailPriority, EmailSentiment, EmailSummary
+from app.agent.usage import get_usage_ledger
+from app.config import MODEL_OPERATIONS, Settings, get_settings
+from app.email.html_text import html_to_text
+from app.email.models import EmailPriority, EmailSentiment, EmailSummary
+from app.email.records import EmailRecord
 
 logger = logging.getLogger(__name__)
 
+# "On Mon, 1 Jan 2026 at 10:00, Jane <jane@example.com> wrote:" style attribution lines
+_ATTRIBUTION_RE = re.compile(r"^\s*(On .+ wrote:|-----\s*Original Message\s*-----)\s*$", re.IGNORECASE)
+
+
+def strip_quoted_text(body: str) -> str:
+    """Drop quoted replies ("> ..." lines and everything after an attribution line)."""
+    lines = []
+    for line in body.splitlines():
+        if _ATTRIBUTION_RE.match(line):
+            break
+        if line.lstrip().startswith(">"):
+            continue
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def email_text(email: EmailRecord) -> str:
+    """Prompt text of an email, converting HTML-only bodies cached before text extraction."""
+    if email.body.strip() or not email.html_body:
+        return email.body
+    return html_to_text(email.html_body)
+
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_URGENT_RE = re.compile(
+    r"\b(urgent|asap|immediately|critical|outage|deadline|action required|today)\b", re.IGNORECASE
+)
+_REQUEST_RE = re.compile(
+    r"\?|\b(please|could you|can you|would you|let me know|confirm|need you to)\b", re.IGNORECASE
+)
+_BULK_RE = re.compile(r"\b(unsubscribe|newsletter|no-?reply)\b", re.IGNORECASE)
+
+
+def heuristic_summary(email: EmailRecord) -> EmailSummary:
+    """
+    Rule-based summary for when the model is unavailable.
+
+    Uses the opening sentences as summary and key points, and keyword
+    cues for priority and whether a response is expected.
+    """
+    text = strip_quoted_text(email_text(email)) or email.subject
+    sentences = [s.strip() for s in _SENTENCE_RE.split(text) if len(s.strip()) > 3]
+    summary = sentences[0] if sentences else email.subject
+    if len(summary) > 200:
+        summary = summary[:197].rsplit(" ", 1)[0] + "..."
+
+    head = f"{email.subject}\n{text[:2000]}"
+    action_required = bool(_REQUEST_RE.search(text[:2000]))
+    if _URGENT_RE.search(head):
+        priority = EmailPriority.HIGH
+    elif _BULK_RE.search(f"{email.from_address}\n{text}"):
+        priority = EmailPriority.LOW
+        action_required = False
+    else:
+        priority = EmailPriority.MEDIUM
+
+    return EmailSummary(
+        email_id=email.id,
+        summary=summary,
+        key_points=[s[:120] for s in sentences[1:4]],
+        sentiment=EmailSentiment.NEUTRAL,
+        priority=priority,
+        action_required=action_required,
+        suggested_actions=["Reply to the sender"] if action_required else [],
+        heuristic=True,
+    )
+
+
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_PYTHON_BOOL_RE = re.compile(r"\b(?:True|False)\b")
+
+
+def message_text(message: BaseMessage) -> str:
+    """Concatenated text blocks of a model response."""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        block.get("text", "") for block in message.content
+        if isinstance(block, dict) and block.get("type") == "text"
+    )
+
+
+def _load_json_object(text: str) -> Optional[dict]:
+    """Find and parse the outermost JSON object in model text (prose, code fences, small slips)."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+
+    candidate = text[start:end + 1]
+    cleaned = _TRAILING_COMMA_RE.sub(r"\1", candidate)
+    cleaned = _PYTHON_BOOL_RE.sub(lambda m: m.group().lower(), cleaned)
+    for attempt in (candidate, cleaned):
+        try:
+            data = json.loads(attempt)
+        except json.JSONDecodeError:
+            continue
+        return data if isinstance(data, dict) else None
+    return None
+
+
+def _as_list(value) -> list[str]:
+    """Coerce a model-produced field into a list of at most three strings."""
+    if isinstance(value, str):
+        value = [line.strip(" -*\u2022") for line in value.splitlines()]
+    if not isinstance(value, list):
+        return []
+    return [str(item).strip() for item in value if str(item).strip()][:3]
+
+
+def _as_enum(enum_type, value, default):
+    """Coerce a model-produced label into an enum member, falling back to a default."""
+    try:
+        return enum_type(str(value).strip().lower())
+    except ValueError:
+        return default
+
+
+def repair_summary_output(message: BaseMessage) -> Optional[dict]:
+    """
+    Leniently recover summary fields from a response that failed validation.
+
+    Looks at the tool call arguments first, then for a JSON object in the
+    text (inside code fences or prose). Unknown labels fall back to
+    defaults; returns None when no summary text can be found.
+    """
+    data = None
+    for call in getattr(message, "tool_calls", None) or []:
+        if isinstance(call.get("args"), dict):
+            data = call["args"]
+            break
+    if data is None:
+        data = _load_json_object(message_text(message))
+    if not data or not str(data.get("summary", "")).strip():
+        return None
+
+    action_required = data.get("action_required", False)
+    if isinstance(action_required, str):
+        action_required = action_required.strip().lower() in ("true", "yes", "1")
+
+    return {
+        "summary": str(data["summary"]).strip(),
+        "key_points": _as_list(data.get("key_points")),
+        "sentiment": _as_enum(EmailSentiment, data.get("sentiment"), EmailSentiment.NEUTRAL),
+        "priority": _as_enum(EmailPriority, data.get("priority"), EmailPriority.MEDIUM),
+        "action_required": bool(action_required),
+        "suggested_actions": _as_list(data.get("suggested_actions")),
+    }
+
+
+def apply_edits(text: str, edits: list[DraftEdit]) -> Optional[str]:
+    """
+    Apply replace-passage edits to a draft.
+
+    Returns None if any edit's passage is missing or ambiguous, so the
+    caller can fall back to a full rewrite rather than guess.
+    """
+    for edit in edits:
+        if not edit.find or text.count(edit.find) != 1:
+            return None
+        text = text.replace(edit.find, edit.replace, 1)
+    return text
+
+
+def draft_diff(before: str, after: str) -> str:
+    """Unified diff between two versions of a draft."""
+    return "".join(difflib.unified_diff(
+        before.splitlines(keepends=True),
+        after.splitlines(keepends=True),
+        fromfile="current_draft",
+        tofile="refined_draft",
+    ))
+
+
+class SummaryOutputCounter:
+    """Thread-safe tally of how summarization responses were parsed."""
+
+    OUTCOMES = ("structured", "repaired", "malformed")
+
+    def __init__(self):
+        self._counts = dict.fromkeys(self.OUTCOMES, 0)
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str) -> None:
+        """Count one response with the given outcome."""
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def snapshot(self) -> SummaryOutputMetrics:
+        """Current counts and the share of unusable responses."""
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        return SummaryOutputMetrics(
+            total=total,
+            malformed_rate=counts["malformed"] / total if total else 0.0,
+            **counts,
+        )
+
 
 class EmailAgent:
     """LangChain agent for email operations."""
@@ -27,21 +243,22 @@ class EmailAgent:
         """Initialize the email agent."""
         self.settings = settings
 
-        # Initialize Claude
-        self.llm = ChatAnthropic(
-            model=settings.llm_model,
-            api_key=settings.anthropic_api_key,
-            temperature=settings.llm_temperature,
-            max_tokens=settings.llm_max_tokens,
-        )
+        # One shared client per model profile (see Settings.model_profile)
+        self.router = ModelRouter(settings, get_usage_ledger())
+        self.summary_metrics = SummaryOutputCounter()
 
-        logger.info(f"EmailAgent initialized with model: {settings.llm_model}")
+        logger.info(
+            "EmailAgent initialized with models: "
+            + ", ".join(f"{op}={settings.model_profile(op).model}" for op in MODEL_OPERATIONS)
+        )
 
     def generate_reply(
         self,
-        email: Email,
+        email: EmailRecord,
         tone: EmailTone = EmailTone.PROFESSIONAL,
         additional_context: str = "",
+        thread: Optional[list[EmailRecord]] = None,
+        related: Optional[list[EmailRecord]] = None,
     ) -> str:
         """
         Generate a reply to an email.
@@ -50,6 +267,8 @@ class EmailAgent:
             email: The email to reply to
             tone: Desired tone for the response
             additional_context: Additional instructions from the user
+            thread: Cached messages of the conversation, oldest first
+            related: Related emails from other conversations, most useful first
 
         Returns:
             Generated reply text
@@ -58,20 +277,28 @@ class EmailAgent:
             # Extract sender name from email address
             sender_name = email.from_address.split("@")[0]
 
+            # When earlier messages are supplied, the quoted copy in the body is redundant
+            thread_context = self._build_thread_context(email, thread or [])
+            original_email = email_text(email)
+            if thread_context:
+                original_email = strip_quoted_text(original_email) or original_email
+
             # Generate prompt
             prompt = get_reply_generation_prompt(
-                original_email=email.body,
+                original_email=original_email,
                 sender_name=sender_name,
                 subject=email.subject,
                 tone=tone,
                 additional_context=additional_context,
+                thread_context=thread_context,
+                related_context=self._build_related_context(related or []),
             )
 
             # Generate response
             logger.info(f"Generating reply for email {email.id} with tone: {tone}")
 
             messages = [HumanMessage(content=prompt)]
-            response = self.llm.invoke(messages)
+            response = self.router.invoke("reply", messages)
 
             reply_text = response.content
 
@@ -82,9 +309,76 @@ class EmailAgent:
             logger.error(f"Error generating reply: {e}")
             raise
 
+    def _build_thread_context(self, email: EmailRecord, thread: list[EmailRecord]) -> str:
+        """
+        Condense earlier thread messages into a bounded block of prompt text.
+
+        Quoted text is stripped (each message already quotes its
+        predecessors), and the most recent messages are kept first when
+        the thread does not fit in ``thread_context_max_chars``.
+        """
+        budget = self.settings.thread_context_max_chars
+        earlier = [
+            m for m in thread
+            if m.message_id != email.message_id and m.date <= email.date
+        ]
+
+        entries: list[str] = []
+        for message in reversed(earlier):
+            body = strip_quoted_text(email_text(message))
+            if not body:
+                continue
+
+            header = f"From: {message.from_address} ({message.date:%Y-%m-%d %H:%M})"
+            remaining = budget - len(header) - 2
+            if remaining <= 0:
+                break
+
+            if len(body) > remaining:
+                body = body[: max(remaining - 3, 0)].rstrip() + "..."
+
+            entries.append(f"{header}\n{body}")
+            budget -= len(entries[-1]) + 2
+
+        return "\n\n".join(reversed(entries))
+
+    def _build_related_context(self, related: list[EmailRecord]) -> str:
+        """
+        Turn related emails into short snippets within ``related_context_max_tokens``.
+
+        The budget is shared equally, so one long message cannot crowd out
+        the others; quoted text is stripped first.
+        """
+        # About four characters per token
+        budget = self.settings.related_context_max_tokens * 4
+        if not related or budget <= 0:
+            return ""
+
+        share = budget // len(related)
+        entries: list[str] = []
+        for message in related:
+            body = " ".join(strip_quoted_text(email_text(message)).split())
+            if not body:
+                continue
+
+            recipients = ", ".join(message.to_addresses[:2])
+            header = (
+                f"From: {message.from_address} To: {recipients} "
+                f"({message.date:%Y-%m-%d}) Subject: {message.subject}"
+            )
+            remaining = share - len(header) - 1
+            if remaining < 40:
+                continue
+
+            if len(body) > remaining:
+                body = body[: remaining - 3].rstrip() + "..."
+            entries.append(f"{header}\n{body}")
+
+        return "\n\n".join(entries)
+
     def refine_reply(
         self,
-        original_email: Email,
+        original_email: EmailRecord,
         current_draft: str,
         user_feedback: str,
     ) -> str:
@@ -101,7 +395,7 @@ class EmailAgent:
         """
         try:
             prompt = get_refinement_prompt(
-                original_email=original_email.body,
+                original_email=email_text(original_email),
                 current_draft=current_draft,
                 user_feedback=user_feedback,
             )
@@ -109,7 +403,7 @@ class EmailAgent:
             logger.info(f"Refining reply based on feedback: {user_feedback[:50]}...")
 
             messages = [HumanMessage(content=prompt)]
-            response = self.llm.invoke(messages)
+            response = self.router.invoke("refine", messages)
 
             refined_text = response.content
 
@@ -120,6 +414,49 @@ class EmailAgent:
             logger.error(f"Error refining reply: {e}")
             raise
 
+    def refine_reply_with_edits(
+        self,
+        original_email: EmailRecord,
+        current_draft: str,
+        user_feedback: str,
+    ) -> tuple[str, str]:
+        """
+        Refine a reply through targeted edits, rewriting it only when needed.
+
+        The model returns replace-passage edits (a few dozen output tokens
+        for a small change) which are applied to the current draft. If it
+        asks for a rewrite, or an edit does not match the draft exactly
+        once, the draft is regenerated with refine_reply().
+
+        Args:
+            original_email: The original email being replied to
+            current_draft: Current draft of the response
+            user_feedback: User's feedback on what to change
+
+        Returns:
+            (refined text, "edit" or "rewrite")
+        """
+        prompt = get_edit_refinement_prompt(
+            original_email=email_text(original_email),
+            current_draft=current_draft,
+            user_feedback=user_feedback,
+        )
+
+        logger.info(f"Requesting edits for feedback: {user_feedback[:50]}...")
+        result = self.router.invoke_structured("refine", [HumanMessage(content=prompt)], DraftEdits)
+
+        plan = result["parsed"]
+        if plan is not None and plan.edits and not plan.rewrite:
+            refined = apply_edits(current_draft, plan.edits)
+            if refined is not None:
+                logger.info(f"Applied {len(plan.edits)} edits to the draft")
+                return refined, "edit"
+            logger.info("Edits did not match the draft, falling back to a rewrite")
+        else:
+            logger.info("No usable edits returned, falling back to a rewrite")
+
+        return self.refine_reply(original_email, current_draft, user_feedback), "rewrite"
+
     def chat_refine(
         self,
         conversation_history: list[dict],
@@ -137,21 +474,11 @@ class EmailAgent:
             Assistant's response
         """
         try:
-            # Convert history to LangChain messages
-            messages = [SystemMessage(content=BASE_SYSTEM_PROMPT)]
-
-            for msg in conversation_history:
-                if msg["role"] == "user":
-                    messages.append(HumanMessage(content=msg["content"]))
-                elif msg["role"] == "assistant":
-                    messages.append(AIMessage(content=msg["content"]))
-
-            # Add new user message
-            messages.append(HumanMessage(content=user_message))
+            messages = self._chat_messages(conversation_history, user_message)
 
             logger.info(f"Chat refine with {len(conversation_history)} history messages")
 
-            response = self.llm.invoke(messages)
+            response = self.router.invoke("chat", messages)
 
             return response.content
 
@@ -159,7 +486,57 @@ class EmailAgent:
             logger.error(f"Error in chat refinement: {e}")
             raise
 
-    def summarize_email(self, email: Email) -> EmailSummary:
+    async def stream_chat_refine(
+        self,
+        conversation_history: list[dict],
+        user_message: str,
+        draft: str = "",
+    ) -> AsyncIterator[str]:
+        """
+        Stream the assistant's reply to a chat refinement message.
+
+        Cancelling the consuming task closes the upstream LLM stream.
+
+        Args:
+            conversation_history: Previous messages, as for chat_refine()
+            user_message: New message from the user
+            draft: Current draft, given to the model as context
+
+        Yields:
+            Text fragments of the response as they arrive
+        """
+        messages = self._chat_messages(conversation_history, user_message, draft)
+
+        logger.info(f"Streaming chat refine with {len(conversation_history)} history messages")
+
+        async for chunk in self.router.astream("chat", messages):
+            text = message_text(chunk)
+            if text:
+                yield text
+
+    def _chat_messages(
+        self,
+        conversation_history: list[dict],
+        user_message: str,
+        draft: str = "",
+    ) -> list[BaseMessage]:
+        """Convert a refinement conversation to LangChain messages."""
+        system_prompt = BASE_SYSTEM_PROMPT
+        if draft:
+            system_prompt += f"\n\nCurrent draft of the reply:\n{draft}"
+        messages: list[BaseMessage] = [SystemMessage(content=system_prompt)]
+
+        for msg in conversation_history:
+            if msg["role"] == "user":
+                messages.append(HumanMessage(content=msg["content"]))
+            elif msg["role"] == "assistant":
+                messages.append(AIMessage(content=msg["content"]))
+
+        # Add new user message
+        messages.append(HumanMessage(content=user_message))
+        return messages
+
+    def summarize_email(self, email: EmailRecord) -> EmailSummary:
         """
         Generate a summary of an email.
 
@@ -174,7 +551,7 @@ class EmailAgent:
             sender = email.from_address.split("@")[0] if email.from_address else "Unknown"
 
             prompt = get_summary_prompt(
-                email_body=email.body,
+                email_body=email_text(email),
                 sender=sender,
                 subject=email.subject,
             )
@@ -182,35 +559,77 @@ class EmailAgent:
             logger.info(f"Generating summary for email {email.id}")
 
             messages = [HumanMessage(content=prompt)]
-            response = self.llm.invoke(messages)
-
-            # Parse JSON response
             try:
-                summary_data = json.loads(response.content)
-
-                return EmailSummary(
-                    email_id=email.id,
-                    summary=summary_data.get("summary", ""),
-                    key_points=summary_data.get("key_points", []),
-                    sentiment=EmailSentiment(summary_data.get("sentiment", "neutral")),
-                    priority=EmailPriority(summary_data.get("priority", "medium")),
-                    action_required=summary_data.get("action_required", False),
-                    suggested_actions=summary_data.get("suggested_actions", []),
-                )
-
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse summary JSON: {e}")
-                # Return basic summary
-                return EmailSummary(
-                    email_id=email.id,
-                    summary=response.content[:200],
-                    key_points=[],
-                    sentiment=EmailSentiment.NEUTRAL,
-                    priority=EmailPriority.MEDIUM,
-                    action_required=False,
-                    suggested_actions=[],
-                )
+                result = self.router.invoke_structured("summarize", messages, EmailAnalysis)
+            except (CircuitOpenError, DeadlineExceededError) as e:
+                logger.warning(f"Model unavailable for email {email.id} ({e}), using a heuristic summary")
+                return heuristic_summary(email)
+
+            analysis = result["parsed"]
+            if analysis is not None:
+                self.summary_metrics.record("structured")
+                return EmailSummary(email_id=email.id, **analysis.model_dump())
+
+            # Tool call missing or invalid: salvage what we can from the raw output
+            raw = result["raw"]
+            logger.warning(f"Summary output for email {email.id} failed validation: {result['parsing_error']}")
+            fields = repair_summary_output(raw)
+            if fields is not None:
+                self.summary_metrics.record("repaired")
+                return EmailSummary(email_id=email.id, **fields)
+
+            self.summary_metrics.record("malformed")
+            return EmailSummary(
+                email_id=email.id,
+                summary=message_text(raw)[:200],
+                key_points=[],
+                sentiment=EmailSentiment.NEUTRAL,
+                priority=EmailPriority.MEDIUM,
+                action_required=False,
+                suggested_actions=[],
+            )
 
         except Exception as e:
             logger.error(f"Error generating summary: {e}")
             raise
+
+    def condense_digest_groups(self, groups: str, period: str) -> list[DigestSectionDraft]:
+        """
+        Merge the message summaries of several digest groups in one call.
+
+        Args:
+            groups: Rendered groups, each under a "[key]" heading
+            period: Human-readable time range of the digest
+
+        Returns:
+            One drafted section per group the model answered for (may be fewer)
+        """
+        prompt = get_digest_sections_prompt(groups=groups, period=period)
+        result = self.router.invoke_structured("digest", [HumanMessage(content=prompt)], DigestSectionDrafts)
+
+        drafts = result["parsed"]
+        if drafts is None:
+            logger.warning(f"Digest section output failed validation: {result['parsing_error']}")
+            return []
+        return drafts.sections
+
+    def digest_overview(self, sections: str, period: str) -> str:
+        """
+        Write the overview paragraph of a digest (or of one part of it).
+
+        Args:
+            sections: Section lines or partial overviews, most important first
+            period: Human-readable time range of the digest
+
+        Returns:
+            Overview text
+        """
+        prompt = get_digest_overview_prompt(sections=sections, period=period)
+        response = self.router.invoke("digest", [HumanMessage(content=prompt)])
+        return message_text(response).strip()
+
+
+@lru_cache
+def get_agent() -> EmailAgent:
+    """Get the shared email agent instance."""
+    return EmailAgent(get_settings())
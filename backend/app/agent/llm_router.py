@@ -0,0 +1,480 @@
+"""Routing of agent operations to per-profile LLM clients."""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, TypeVar
+
+import anthropic
+from langchain_anthropic import ChatAnthropic
+from langchain_core.messages import BaseMessage, BaseMessageChunk
+from pydantic import BaseModel
+
+from app.agent.usage import UsageLedger, usage_metadata
+from app.config import ModelProfile, Settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP statuses meaning "busy or slow right now", worth retrying on another model
+OVERLOADED_STATUS = {408, 429, 500, 502, 503, 504, 529}
+
+# Latency samples kept per operation and model, and how many are needed before hedging
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+
+# Recent calls per model considered by its circuit breaker
+CIRCUIT_WINDOW = 20
+CIRCUIT_MIN_CALLS = 10
+
+# Absolute time.monotonic() by which LLM calls in the current request must finish
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+
+class DeadlineExceededError(TimeoutError):
+    """An agent operation ran out of time."""
+
+
+class CircuitOpenError(Exception):
+    """Every model for an operation is failing; the call was not attempted."""
+
+
+def is_overloaded(error: Exception) -> bool:
+    """Whether an LLM error means the model is unavailable rather than the request bad."""
+    if isinstance(error, (anthropic.APITimeoutError, anthropic.APIConnectionError, DeadlineExceededError)):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and error.status_code in OVERLOADED_STATUS
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Bound every LLM call made in this context to finish within ``seconds``.
+
+    The deadline follows the request into run_in_threadpool (context
+    variables are copied); nested deadlines can only shorten it.
+    """
+    if seconds is None:
+        yield
+        return
+
+    end = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(end if current is None else min(current, end))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+class LatencyTracker:
+    """Recent successful call latencies per (operation, model)."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: dict[tuple[str, str], deque[float]] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, model: str, seconds: float) -> None:
+        """Add one latency sample."""
+        with self._lock:
+            samples = self._samples.setdefault((operation, model), deque(maxlen=self._window))
+            samples.append(seconds)
+
+    def percentile(self, operation: str, model: str, q: float = 0.95) -> Optional[float]:
+        """The q-th latency percentile, or None with too few samples to be meaningful."""
+        with self._lock:
+            samples = sorted(self._samples.get((operation, model), ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class CircuitBreaker:
+    """
+    Fails fast for a model whose recent calls mostly failed.
+
+    Opens when at least ``failure_rate`` of the last CIRCUIT_WINDOW calls
+    (and CIRCUIT_MIN_CALLS or more) were timeouts or overload errors.
+    After ``cooldown`` seconds one trial call is let through: success
+    closes the circuit, failure keeps it open for another cooldown. Every
+    allowed call must end in record() or, if it ended without telling
+    anything about the model (cancelled, stopped early), release().
+    """
+
+    def __init__(self, failure_rate: float, cooldown: float):
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self._outcomes: deque[bool] = deque(maxlen=CIRCUIT_WINDOW)
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state: closed, open or half_open."""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or time.monotonic() - self._opened_at >= self.cooldown:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may be made now (claims the trial call when half-open)."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._probing = True
+            return True
+
+    def release(self) -> None:
+        """End an allowed call without an outcome, so the trial call can be made again."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, success: bool) -> bool:
+        """
+        Record the outcome of an allowed call.
+
+        Returns:
+            True if this outcome opened the circuit
+        """
+        with self._lock:
+            if self._probing:
+                self._probing = False
+                self._opened_at = None if success else time.monotonic()
+                self._outcomes.clear()
+                return not success
+
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (
+                len(self._outcomes) >= CIRCUIT_MIN_CALLS
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._opened_at = time.monotonic()
+                self._outcomes.clear()
+                return True
+            return False
+
+
+class ModelRouter:
+    """
+    Sends each agent operation to the model configured for it.
+
+    Clients are created lazily and shared between all calls with the same
+    model, temperature, token limit and timeout. When a profile has a
+    fallback model, the primary is given a single retry and a timed-out
+    or overloaded request is re-sent to the fallback.
+
+    Every operation has a deadline (the profile's, or a shorter one set
+    with ``deadline()`` for the current request). With hedging enabled, a
+    request still running after the model's p95 latency is duplicated and
+    the first answer wins. A per-model circuit breaker skips models whose
+    recent calls mostly failed, so an outage fails fast instead of
+    timing out request after request.
+
+    The token usage of every completed call, hedged duplicates and calls
+    abandoned at the deadline included, is recorded in the usage ledger.
+    """
+
+    def __init__(self, settings: Settings, usage: Optional[UsageLedger] = None):
+        """Create a router for the given settings, recording token usage in ``usage`` if given."""
+        self.settings = settings
+        self.usage = usage
+        self.latency = LatencyTracker()
+        self._clients: dict[tuple, ChatAnthropic] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        # Blocking calls run here so callers can stop waiting at the deadline;
+        # an abandoned request still ends at its client timeout
+        self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm")
+
+    def client(self, model: str, profile: ModelProfile, max_retries: int = 2) -> ChatAnthropic:
+        """Get the shared client for a model with a profile's parameters."""
+        key = (model, profile.temperature, profile.max_tokens, profile.timeout, max_retries)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = ChatAnthropic(
+                    model=model,
+                    api_key=self.settings.anthropic_api_key,
+                    temperature=profile.temperature,
+                    max_tokens=profile.max_tokens,
+                    default_request_timeout=profile.timeout,
+                    max_retries=max_retries,
+                )
+                self._clients[key] = client
+            return client
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        """Get the circuit breaker of a model."""
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    self.settings.llm_circuit_failure_rate, self.settings.llm_circuit_cooldown
+                )
+                self._breakers[model] = breaker
+            return breaker
+
+    def circuit_states(self) -> dict[str, str]:
+        """Circuit state of every model used so far."""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {model: breaker.state for model, breaker in breakers.items()}
+
+    def deadline_seconds(self, operation: str, requested: Optional[float] = None) -> Optional[float]:
+        """Time budget of an operation: its profile deadline, or less if the client asked for less."""
+        limits = [s for s in (self.settings.model_profile(operation).deadline, requested) if s]
+        return min(limits) if limits else None
+
+    def deadline(self, operation: str, requested: Optional[float] = None):
+        """
+        Context manager bounding an operation by its profile deadline.
+
+        Args:
+            operation: One of config.MODEL_OPERATIONS
+            requested: Shorter time budget asked for by the client, in seconds
+        """
+        return deadline(self.deadline_seconds(operation, requested))
+
+    def invoke(self, operation: str, messages: list[BaseMessage]) -> BaseMessage:
+        """
+        Run a chat completion for an operation, falling back if the model is unavailable.
+
+        Args:
+            operation: One of config.MODEL_OPERATIONS
+            messages: Prompt messages
+
+        Returns:
+            The model's response message
+        """
+        return self._call(operation, lambda client: client.invoke(messages))
+
+    def invoke_structured(
+        self, operation: str, messages: list[BaseMessage], schema: type[BaseModel]
+    ) -> dict[str, Any]:
+        """
+        Run a completion whose answer is a forced tool call matching ``schema``.
+
+        Returns:
+            {"raw": response message, "parsed": schema instance or None,
+            "parsing_error": exception or None}
+        """
+        return self._call(
+            operation,
+            lambda client: client.with_structured_output(schema, include_raw=True).invoke(messages),
+        )
+
+    async def astream(
+        self, operation: str, messages: list[BaseMessage]
+    ) -> AsyncIterator[BaseMessageChunk]:
+        """
+        Stream a chat completion for an operation.
+
+        Falls back to the secondary model only if the primary fails (or its
+        circuit is open) before its first chunk; a stream that already
+        started is not restarted. Streams are not hedged.
+        """
+        profile = self.settings.model_profile(operation)
+        fallback = profile.fallback_model if profile.fallback_model != profile.model else None
+
+        for model in [profile.model] + ([fallback] if fallback else []):
+            breaker = self.breaker(model)
+            client = self.client(model, profile, max_retries=1 if fallback and model != fallback else 2)
+            if not breaker.allow():
+                logger.warning(f"Circuit open for {model}, skipping it for {operation}")
+                continue
+
+            started = False
+            settled = False  # whether the outcome was recorded on the breaker
+            usage: dict[str, int] = {}
+            try:
+                async for chunk in client.astream(messages):
+                    if not started:
+                        started = settled = True
+                        breaker.record(True)
+                    # Usage arrives in pieces (input tokens first, output tokens at the end)
+                    for key, value in (getattr(chunk, "usage_metadata", None) or {}).items():
+                        if isinstance(value, int):
+                            usage[key] = usage.get(key, 0) + value
+                    yield chunk
+                if not started:
+                    settled = True
+                    breaker.record(True)
+                return
+            except Exception as e:
+                if started:
+                    raise
+                settled = True
+                self._record_failure(model, breaker, e)
+                if model == fallback or not fallback or not is_overloaded(e):
+                    raise
+                logger.warning(
+                    f"{model} unavailable for {operation} ({type(e).__name__}), "
+                    f"falling back to {fallback}"
+                )
+            finally:
+                if not settled:
+                    # Cancelled (or closed) before the first chunk: nothing learned about the model
+                    breaker.release()
+                if usage:
+                    self._record_usage(operation, model, usage)
+
+        raise CircuitOpenError(f"No model available for {operation}")
+
+    def _call(self, operation: str, call: Callable[[ChatAnthropic], T]) -> T:
+        """Run ``call`` on the operation's client, retrying on the fallback model if overloaded."""
+        profile = self.settings.model_profile(operation)
+        fallback = profile.fallback_model if profile.fallback_model != profile.model else None
+
+        end = _deadline.get()
+        if profile.deadline:
+            end = min(end or float("inf"), time.monotonic() + profile.deadline)
+
+        for model in [profile.model] + ([fallback] if fallback else []):
+            breaker = self.breaker(model)
+            client = self.client(model, profile, max_retries=1 if fallback and model != fallback else 2)
+            if not breaker.allow():
+                logger.warning(f"Circuit open for {model}, skipping it for {operation}")
+                continue
+
+            try:
+                return self._attempt(operation, model, client, call, end, profile.deadline, bool(profile.hedge))
+            except DeadlineExceededError:
+                raise
+            except Exception as e:
+                if model == fallback or not fallback or not is_overloaded(e):
+                    raise
+                logger.warning(
+                    f"{model} unavailable for {operation} ({type(e).__name__}), "
+                    f"falling back to {fallback}"
+                )
+
+        raise CircuitOpenError(f"No model available for {operation}")
+
+    def _attempt(
+        self,
+        operation: str,
+        model: str,
+        client: ChatAnthropic,
+        call: Callable[[ChatAnthropic], T],
+        end: Optional[float],
+        limit: Optional[float],
+        hedge: bool,
+    ) -> T:
+        """
+        Run one call to a model, hedged and bounded by the deadline.
+
+        The caller already claimed the model's breaker with allow(); the
+        outcome is recorded on it on every path. Running out of time only
+        counts against the model when the call was given its operation's
+        whole deadline (``limit`` seconds): a shorter deadline, asked for by
+        the client or left over after a failed primary model, says nothing
+        about the model, so the abandoned call's own outcome is recorded
+        when it completes instead.
+        """
+        breaker = self.breaker(model)
+        started = time.monotonic()
+        settled = False  # whether the outcome was (or will be) recorded on the breaker
+        try:
+            if end is not None and end <= started:
+                raise DeadlineExceededError(f"No time left for {operation}")
+
+            delay = self.latency.percentile(operation, model) if hedge else None
+            hedge_at = started + max(delay, self.settings.llm_hedge_min_delay) if delay else None
+
+            pending = {self._submit(operation, model, call, client)}
+            error: Optional[Exception] = None
+            while pending:
+                wakeups = [t for t in (end, hedge_at) if t is not None]
+                timeout = max(min(wakeups) - time.monotonic(), 0) if wakeups else None
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    if future.exception() is None:
+                        self.latency.record(operation, model, time.monotonic() - started)
+                        settled = True
+                        breaker.record(True)
+                        return future.result()
+                    error = future.exception()
+
+                now = time.monotonic()
+                if pending and end is not None and now >= end:
+                    settled = True
+                    if limit and now - started >= limit:
+                        self._record_failure(model, breaker, DeadlineExceededError())
+                    else:
+                        self._record_when_done(model, breaker, pending)
+                    raise DeadlineExceededError(f"{operation} did not finish before its deadline")
+                if pending and hedge_at is not None and now >= hedge_at:
+                    logger.info(f"{model} slower than p95 for {operation}, sending a hedged request")
+                    pending.add(self._submit(operation, model, call, client))
+                    hedge_at = None
+
+            settled = True
+            self._record_failure(model, breaker, error)
+            raise error
+        finally:
+            if not settled:
+                breaker.release()
+
+    def _record_when_done(self, model: str, breaker: CircuitBreaker, futures: set[Future]) -> None:
+        """Record on the breaker the outcome of the first abandoned call to complete."""
+        lock = threading.Lock()
+        recorded = False
+
+        def record(future: Future) -> None:
+            nonlocal recorded
+            with lock:
+                if recorded:
+                    return
+                recorded = True
+            if future.cancelled():
+                breaker.release()
+            elif future.exception() is None:
+                breaker.record(True)
+            else:
+                self._record_failure(model, breaker, future.exception())
+
+        for future in futures:
+            future.add_done_callback(record)
+
+    def _submit(
+        self, operation: str, model: str, call: Callable[[ChatAnthropic], T], client: ChatAnthropic
+    ) -> Future:
+        """Start a call on the executor; its token usage is recorded whenever it completes."""
+        def record(done: Future) -> None:
+            if not done.cancelled() and done.exception() is None:
+                self._record_usage(operation, model, usage_metadata(done.result()))
+
+        future = self._executor.submit(call, client)
+        if self.usage is not None:
+            future.add_done_callback(record)
+        return future
+
+    def _record_usage(self, operation: str, model: str, usage: Optional[dict]) -> None:
+        """Add a call's usage to the ledger (never raises: accounting must not fail a call)."""
+        if self.usage is None or not usage:
+            return
+        try:
+            self.usage.record(operation, model, usage)
+        except Exception as e:
+            logger.error(f"Could not record token usage of {operation} on {model}: {e}")
+
+    def _record_failure(self, model: str, breaker: CircuitBreaker, error: Exception) -> None:
+        """Count a failed call; only unavailability (not a bad request) counts against the model."""
+        if breaker.record(not is_overloaded(error)):
+            logger.warning(
+                f"Circuit opened for {model} after repeated failures; "
+                f"failing fast for {breaker.cooldown:.0f}s"
+            )
@@ -1,8 +1,12 @@
 """Models for agent API requests and responses."""
 
+from datetime import date, datetime
+from typing import Literal, Optional
+
 from pydantic import BaseModel, Field
 
 from app.agent.prompts import EmailTone
+from app.email.models import EmailPriority, EmailSentiment
 
 
 class GenerateReplyRequest(BaseModel):
@@ -26,6 +30,13 @@ class GenerateReplyResponse(BaseModel):
     reply_text: str
     tone: EmailTone
     char_count: int = Field(..., description="Character count of the reply")
+    speculative: bool = Field(
+        default=False,
+        description="True if the reply was drafted in the background before it was requested"
+    )
+
+
+RefineMode = Literal["edit", "rewrite"]
 
 
 class RefineReplyRequest(BaseModel):
@@ -34,6 +45,11 @@ class RefineReplyRequest(BaseModel):
     email_id: str = Field(..., description="ID of the original email")
     current_draft: str = Field(..., description="Current draft of the reply")
     user_feedback: str = Field(..., description="User's feedback on what to change")
+    mode: RefineMode = Field(
+        default="edit",
+        description="'edit' asks for targeted replacements (falls back to a rewrite), "
+                    "'rewrite' regenerates the whole draft"
+    )
 
 
 class RefineReplyResponse(BaseModel):
@@ -41,6 +57,25 @@ class RefineReplyResponse(BaseModel):
 
     refined_text: str
     char_count: int
+    mode: RefineMode = Field(default="rewrite", description="How the draft was actually refined")
+    diff: str = Field(default="", description="Unified diff from the current draft to the refined text")
+
+
+class DraftEdit(BaseModel):
+    """Replace one passage of the draft."""
+
+    find: str = Field(..., description="Exact text from the current draft to replace, long enough to be unique")
+    replace: str = Field(..., description="Replacement text (empty to delete the passage)")
+
+
+class DraftEdits(BaseModel):
+    """Record the edits that apply the user's feedback to the draft."""
+
+    edits: list[DraftEdit] = Field(default_factory=list, description="Edits in document order")
+    rewrite: bool = Field(
+        default=False,
+        description="True if the feedback needs the whole draft rewritten instead of targeted edits"
+    )
 
 
 class ChatMessage(BaseModel):
@@ -76,4 +111,174 @@ class SummarizeEmailRequest(BaseModel):
     email_id: str = Field(..., description="ID of the email to summarize")
 
 
+class EmailAnalysis(BaseModel):
+    """Record the analysis of an email."""
+
+    summary: str = Field(..., description="A 1-2 sentence summary of the email")
+    key_points: list[str] = Field(default_factory=list, description="Main points (max 3)")
+    sentiment: EmailSentiment = Field(..., description="Overall tone of the email")
+    priority: EmailPriority = Field(..., description="How urgently the email needs attention")
+    action_required: bool = Field(..., description="Whether the recipient needs to act")
+    suggested_actions: list[str] = Field(
+        default_factory=list,
+        description="Suggested next steps, if any (max 3)"
+    )
+
+
+class SummaryOutputMetrics(BaseModel):
+    """How summarization responses were parsed since startup."""
+
+    total: int = 0
+    structured: int = Field(0, description="Valid tool-call output")
+    repaired: int = Field(0, description="Recovered by the lenient parser")
+    malformed: int = Field(0, description="Unusable output, fell back to the raw text")
+    malformed_rate: float = 0.0
+
+
+class AgentMetricsResponse(BaseModel):
+    """Agent quality metrics."""
+
+    summaries: SummaryOutputMetrics
+    circuits: dict[str, str] = Field(
+        default_factory=dict,
+        description="Circuit breaker state per model: closed, open or half_open",
+    )
+
+
+class BatchOperation(BaseModel):
+    """One operation of a batch request."""
+
+    id: Optional[str] = Field(
+        default=None,
+        description="Client reference echoed in the result (default: the operation's position)"
+    )
+    op: Literal["get", "summarize", "mark-read", "generate-reply"] = Field(..., description="Operation to run")
+    email_id: str = Field(..., description="Email the operation applies to (IMAP UID in INBOX)")
+    tone: EmailTone = Field(default=EmailTone.PROFESSIONAL, description="Reply tone (generate-reply only)")
+    additional_context: str = Field(default="", description="Reply instructions (generate-reply only)")
+
+
+class BatchRequest(BaseModel):
+    """Several email and agent operations in one request."""
+
+    operations: list[BatchOperation] = Field(
+        ...,
+        min_length=1,
+        description="Operations to run concurrently; results stream back as they complete"
+    )
+
+
+class DigestRequest(BaseModel):
+    """Request for a digest of the mail received in a time range."""
+
+    mailbox: str = Field(default="INBOX", description="Mailbox to digest")
+    since: Optional[datetime] = Field(default=None, description="Start of the range (default: 24 hours ago)")
+    until: Optional[datetime] = Field(default=None, description="End of the range (default: now)")
+    group_by: Literal["thread", "sender"] = Field(
+        default="thread",
+        description="Make one section per conversation or per sender"
+    )
+    max_sections: int = Field(default=20, ge=1, le=100, description="Sections returned, best ranked first")
+    stream: bool = Field(
+        default=False,
+        description="Stream newline-delimited JSON events as sections complete"
+    )
+
+
+class DigestSection(BaseModel):
+    """One conversation (or sender) in a digest."""
+
+    rank: int = Field(..., description="Position in the digest, 1 = most important")
+    key: str = Field(..., description="Thread id or sender address the section groups by")
+    title: str
+    summary: str
+    email_ids: list[str] = Field(default_factory=list, description="Messages in the section, newest first")
+    senders: list[str] = Field(default_factory=list)
+    priority: EmailPriority = EmailPriority.MEDIUM
+    action_required: bool = False
+    unread: int = 0
+    score: float = Field(..., description="Ranking score from priority, required action, unread count and size")
+    condensed: bool = Field(
+        default=False,
+        description="True if the model merged several message summaries into this section"
+    )
+
+
+class DigestResponse(BaseModel):
+    """A ranked digest of the mail in a time range."""
+
+    mailbox: str
+    since: datetime
+    until: datetime
+    email_count: int
+    overview: str
+    sections: list[DigestSection] = Field(default_factory=list, description="Best ranked first")
+    omitted_sections: int = Field(default=0, description="Lower-ranked sections beyond max_sections")
+    heuristic_summaries: int = Field(
+        default=0,
+        description="Messages without a stored summary, described by the rule-based summarizer"
+    )
+    llm_calls: int = 0
+    degraded: bool = Field(
+        default=False,
+        description="True if a call budget, deadline or unavailable model left parts uncondensed"
+    )
+
+
+class DigestSectionDraft(BaseModel):
+    """A digest section written by the model."""
+
+    key: str = Field(..., description="The section key exactly as given in square brackets")
+    title: str = Field(..., description="Short headline (max 10 words)")
+    summary: str = Field(..., description="1-2 sentences on what happened and what the user needs to do")
+
+
+class DigestSectionDrafts(BaseModel):
+    """Record the digest sections, one per key."""
+
+    sections: list[DigestSectionDraft] = Field(default_factory=list)
+
+
 # EmailSummary is already defined in email.models, so we'll import that
+
+
+class UsageRow(BaseModel):
+    """Token usage of one operation and model on one day."""
+
+    day: date
+    operation: str = Field(..., description="Agent operation: summarize, reply, refine, chat or digest")
+    model: str
+    calls: int
+    input_tokens: int
+    output_tokens: int
+    cost_usd: Optional[float] = Field(default=None, description="Estimated cost; null if the model has no price")
+
+
+class UsageTotal(BaseModel):
+    """Token usage summed over several rows."""
+
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = Field(default=0.0, description="Estimated cost of the priced calls")
+    unpriced_calls: int = Field(default=0, description="Calls to models without a price, not in cost_usd")
+
+
+class UsageBudget(BaseModel):
+    """Today's spending against a daily token budget."""
+
+    name: str = Field(..., description="all, summaries or speculative_drafts")
+    daily_limit: int = Field(..., description="Tokens per day, 0 = unlimited")
+    used_today: int
+    reached: bool = Field(..., description="Whether the background work it limits has gone heuristic or paused")
+
+
+class UsageResponse(BaseModel):
+    """LLM usage report."""
+
+    since: date
+    until: date
+    rows: list[UsageRow] = Field(default_factory=list, description="Per day, operation and model, oldest first")
+    by_operation: dict[str, UsageTotal] = Field(default_factory=dict)
+    by_model: dict[str, UsageTotal] = Field(default_factory=dict)
+    budgets: list[UsageBudget] = Field(default_factory=list)
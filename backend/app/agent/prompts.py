@@ -83,6 +83,8 @@ def get_reply_generation_prompt(
     subject: str,
     tone: EmailTone = EmailTone.PROFESSIONAL,
     additional_context: str = "",
+    thread_context: str = "",
+    related_context: str = "",
 ) -> str:
     """
     Generate a prompt for email reply generation.
@@ -93,6 +95,8 @@ def get_reply_generation_prompt(
         subject: Subject line of the email
         tone: Desired tone for the response
         additional_context: Additional user instructions
+        thread_context: Compacted earlier messages of the conversation
+        related_context: Snippets of related emails from other conversations
 
     Returns:
         Complete prompt for the LLM
@@ -103,7 +107,27 @@ def get_reply_generation_prompt(
 
 ---
 
-You are responding to this email:
+"""
+
+    if thread_context:
+        prompt += f"""Earlier messages in this conversation (oldest first, condensed):
+
+{thread_context}
+
+---
+
+"""
+
+    if related_context:
+        prompt += f"""Related emails from other conversations (for reference; use only what is relevant):
+
+{related_context}
+
+---
+
+"""
+
+    prompt += f"""You are responding to this email:
 
 From: {sender_name}
 Subject: {subject}
@@ -170,6 +194,48 @@ keeping the rest of the email intact where possible. Output only the updated ema
 """
 
 
+def get_edit_refinement_prompt(
+    original_email: str,
+    current_draft: str,
+    user_feedback: str,
+) -> str:
+    """
+    Generate a prompt asking for targeted edits to an email draft.
+
+    Args:
+        original_email: The original email being replied to
+        current_draft: Current draft of the response
+        user_feedback: User's feedback on what to change
+
+    Returns:
+        Complete prompt for the LLM
+    """
+    return f"""{BASE_SYSTEM_PROMPT}
+
+You are helping refine an email response based on user feedback.
+
+Original Email:
+{original_email}
+
+---
+
+Current Draft:
+{current_draft}
+
+---
+
+User Feedback:
+{user_feedback}
+
+---
+
+Task: Apply the user's feedback with the DraftEdits tool. Each edit replaces an exact passage
+of the current draft ("find", copied verbatim and long enough to occur only once) with new text
+("replace"). Change only what the feedback asks for. If the feedback requires rewriting most of
+the draft, set "rewrite" to true and leave "edits" empty.
+"""
+
+
 def get_summary_prompt(email_body: str, sender: str, subject: str) -> str:
     """
     Generate a prompt for email summarization.
@@ -192,13 +258,62 @@ Email:
 
 ---
 
-Provide a JSON response with:
+Record your analysis with the EmailAnalysis tool:
 1. "summary": A 1-2 sentence summary of the email
 2. "key_points": Array of main points (max 3)
 3. "sentiment": "positive", "neutral", or "negative"
 4. "priority": "low", "medium", or "high"
 5. "action_required": true/false - does this email require action?
 6. "suggested_actions": Array of suggested actions if any (max 3)
+"""
+
+
+def get_digest_sections_prompt(groups: str, period: str) -> str:
+    """
+    Generate a prompt condensing groups of email summaries into digest sections.
+
+    Args:
+        groups: Groups of per-message summaries, each under a "[key]" heading
+        period: Human-readable time range of the digest
+
+    Returns:
+        Complete prompt for the LLM
+    """
+    return f"""You are preparing a digest of the user's inbox for {period}.
+
+Below are conversations (or senders), each introduced by its key in square brackets
+and followed by short summaries of its messages, oldest first.
+
+{groups}
+
+---
+
+Record one section per key with the DigestSectionDrafts tool:
+1. "key": The key exactly as written in square brackets
+2. "title": A short headline for the conversation (max 10 words)
+3. "summary": 1-2 sentences on what happened and what, if anything, the user needs to do
+"""
+
+
+def get_digest_overview_prompt(sections: str, period: str) -> str:
+    """
+    Generate a prompt for the overview paragraph of an inbox digest.
+
+    Args:
+        sections: Digest sections (or partial overviews), most important first
+        period: Human-readable time range of the digest
+
+    Returns:
+        Complete prompt for the LLM
+    """
+    return f"""You are preparing a digest of the user's inbox for {period}.
+
+These are the topics, most important first:
+
+{sections}
+
+---
 
-Output only valid JSON, nothing else.
+Write a short overview (3-5 sentences) of what happened, leading with what needs the
+user's attention. Do not list every topic. Output only the overview text.
 """
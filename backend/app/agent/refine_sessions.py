@@ -0,0 +1,130 @@
+"""Server-side state for WebSocket draft-refinement sessions."""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Sessions idle for longer than this are forgotten (seconds)
+SESSION_TTL = 3600
+MAX_SESSIONS = 256
+
+# Seconds a write waits for another process's transaction before failing
+BUSY_TIMEOUT = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS refine_sessions (
+    id TEXT PRIMARY KEY,
+    history TEXT NOT NULL,
+    draft TEXT NOT NULL,
+    last_active REAL NOT NULL  -- Unix time
+);
+
+CREATE INDEX IF NOT EXISTS idx_refine_sessions_last_active ON refine_sessions (last_active);
+"""
+
+
+class RefineSession:
+    """Conversation history and current draft of one refinement session."""
+
+    def __init__(self, session_id: str, history: Optional[list[dict]] = None, draft: str = ""):
+        """Create a session (empty unless restored from the store)."""
+        self.id = session_id
+        self.history: list[dict] = history or []
+        self.draft = draft
+        self.resumed = False  # whether it was found in the store on connect
+
+    def add_turn(self, user_message: str, response: str) -> None:
+        """Record a completed exchange; the response becomes the new draft."""
+        self.history.append({"role": "user", "content": user_message})
+        self.history.append({"role": "assistant", "content": response})
+        self.draft = response
+
+    def snapshot(self) -> dict:
+        """Session state as sent to the client on (re)connect."""
+        return {"session_id": self.id, "resumed": self.resumed, "history": self.history, "draft": self.draft}
+
+
+class RefineSessionStore:
+    """
+    Sessions persisted in a SQLite file shared by all worker processes, so
+    a client that reconnects with its session id picks up where it left
+    off, whichever worker accepts the new connection. Idle sessions expire
+    after ``ttl`` seconds and the least recently used are dropped beyond
+    ``max_sessions``.
+    """
+
+    def __init__(self, path: str, ttl: float = SESSION_TTL, max_sessions: int = MAX_SESSIONS):
+        """Open (and create if needed) the store at the given path."""
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=BUSY_TIMEOUT)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def get_or_create(self, session_id: Optional[str] = None) -> RefineSession:
+        """
+        Return the live session with this id, or start a new one.
+
+        An unknown or expired id starts an empty session under a new id;
+        its ``resumed`` flag tells the client to re-seed it.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM refine_sessions WHERE last_active < ?", (time.time() - self.ttl,)
+            )
+            row = self._conn.execute(
+                "SELECT history, draft FROM refine_sessions WHERE id = ?", (session_id,)
+            ).fetchone() if session_id else None
+
+        if row is not None:
+            session = RefineSession(session_id, json.loads(row["history"]), row["draft"])
+            session.resumed = True
+        else:
+            if session_id:
+                logger.info(f"Refine session {session_id} unknown or expired, starting a new one")
+            session = RefineSession(uuid.uuid4().hex)
+        self.save(session)
+        return session
+
+    def save(self, session: RefineSession) -> None:
+        """Store a session's current state and mark it active."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO refine_sessions (id, history, draft, last_active) "
+                "VALUES (?, ?, ?, ?)",
+                (session.id, json.dumps(session.history, ensure_ascii=False), session.draft, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM refine_sessions WHERE id NOT IN ("
+                "  SELECT id FROM refine_sessions ORDER BY last_active DESC LIMIT ?"
+                ")",
+                (self.max_sessions,),
+            )
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+@lru_cache
+def get_refine_sessions() -> RefineSessionStore:
+    """Get the shared refinement session store."""
+    return RefineSessionStore(get_settings().refine_sessions_path)
@@ -0,0 +1,236 @@
+"""Background worker that summarizes new email as soon as it arrives."""
+
+import asyncio
+import inspect
+import logging
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional, Union
+
+from starlette.concurrency import run_in_threadpool
+
+from app.agent.email_agent import EmailAgent, get_agent, heuristic_summary
+from app.agent.usage import UsageLedger, get_usage_ledger
+from app.config import get_settings
+from app.email.models import EmailSummary
+from app.email.records import EmailRecord
+
+if TYPE_CHECKING:
+    from app.core.accounts import MailAccount
+
+logger = logging.getLogger(__name__)
+
+SummaryListener = Callable[["MailAccount", EmailRecord, EmailSummary], Union[None, Awaitable[None]]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+class TokenBudget:
+    """
+    A daily token allowance that resets at local midnight.
+
+    With a usage ledger, the tokens spent are those the ledger measured
+    today for ``operations`` (every worker's calls, on-demand requests
+    included), and the ledger's deployment-wide daily budget applies too.
+    Without one, they are the estimates reported with spend().
+    """
+
+    def __init__(
+        self,
+        daily_limit: int,
+        ledger: Optional[UsageLedger] = None,
+        operations: tuple[str, ...] = (),
+    ):
+        """Create a budget; a limit of 0 means unlimited."""
+        self.daily_limit = daily_limit
+        self.ledger = ledger
+        self.operations = operations
+        self._day = date.today()
+        self._used = 0
+
+    def _roll_over(self) -> None:
+        """Reset the counter when the day changes."""
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self._used = 0
+
+    @property
+    def used(self) -> int:
+        """Tokens spent today."""
+        if self.ledger is not None:
+            return self.ledger.tokens_today(self.operations)
+        self._roll_over()
+        return self._used
+
+    def allows(self, tokens: int) -> bool:
+        """Whether spending ``tokens`` more would stay within today's limits."""
+        if self.ledger is not None and self.ledger.budget_reached():
+            return False
+        return not self.daily_limit or self.used + tokens <= self.daily_limit
+
+    def spend(self, tokens: int) -> None:
+        """Record estimated tokens spent (measured usage is recorded by the model router instead)."""
+        if self.ledger is not None:
+            return
+        self._roll_over()
+        self._used += tokens
+
+
+class SummaryWorker:
+    """
+    Summarizes newly arrived emails in the background and stores the results.
+
+    Registered as a mailbox watcher listener. Jobs are processed by a fixed
+    number of concurrent tasks; once the daily token budget is used up,
+    new emails get a rule-based summary (marked ``heuristic``) instead of
+    a model call, which an on-demand request replaces with a real one.
+    The on-demand /summarize route shares the same in-flight tracking so
+    an email is never summarized twice at once.
+
+    A near-duplicate (by SimHash) of a recent, already-summarized message
+    from the same sender gets a copy of that summary instead of a model
+    call, so alert storms and mailing-list blasts cost one request.
+    """
+
+    def __init__(
+        self,
+        agent: EmailAgent,
+        concurrency: int,
+        daily_token_budget: int,
+        duplicate_max_distance: int = 3,
+        duplicate_window_days: int = 14,
+        ledger: Optional[UsageLedger] = None,
+    ):
+        """Create the worker (call start() to begin processing)."""
+        self.agent = agent
+        self.concurrency = max(1, concurrency)
+        self.budget = TokenBudget(daily_token_budget, ledger, ("summarize",))
+        self.duplicate_max_distance = duplicate_max_distance
+        self.duplicate_window = timedelta(days=duplicate_window_days)
+        self._queue: asyncio.Queue[tuple["MailAccount", EmailRecord]] = asyncio.Queue()
+        self._inflight: dict[tuple[str, str], asyncio.Task] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._listeners: list[SummaryListener] = []
+
+    def add_listener(self, listener: SummaryListener) -> None:
+        """Register a callback (sync or async) for every newly stored summary."""
+        self._listeners.append(listener)
+
+    def enqueue(self, account: "MailAccount", emails: list[EmailRecord]) -> None:
+        """Queue emails for background summarization (watcher listener)."""
+        for email in emails:
+            self._queue.put_nowait((account, email))
+
+    def start(self) -> None:
+        """Start the worker tasks."""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._run(), name=f"summary-worker-{i}")
+                for i in range(self.concurrency)
+            ]
+
+    async def stop(self) -> None:
+        """Cancel the worker tasks; queued jobs are dropped."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self) -> None:
+        """Process queued emails until cancelled."""
+        while True:
+            account, email = await self._queue.get()
+            try:
+                if account.store.get_summary(email.id):
+                    continue
+
+                cost = estimate_tokens(email.subject + email.body)
+                if not self.budget.allows(cost) and not self.derive_summary(account, email):
+                    logger.info(
+                        f"Daily summary budget reached ({self.budget.used} tokens), "
+                        f"storing a heuristic summary for email {email.id}"
+                    )
+                    await self._save(account, email, heuristic_summary(email))
+                    continue
+
+                await self.summarize(account, email)
+            except Exception as e:
+                logger.error(f"Background summary of email {email.id} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def summarize(self, account: "MailAccount", email: EmailRecord) -> EmailSummary:
+        """
+        Summarize an email and store the result.
+
+        Concurrent calls for the same email share one LLM request.
+        """
+        key = (account.id, email.id)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._summarize(account, email))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def derive_summary(self, account: "MailAccount", email: EmailRecord) -> EmailSummary | None:
+        """Reuse the stored summary of a near-duplicate email, if there is one."""
+        if self.duplicate_max_distance < 0:
+            return None
+
+        source = account.store.find_duplicate_summary(
+            email,
+            since=datetime.now(timezone.utc) - self.duplicate_window,
+            max_distance=self.duplicate_max_distance,
+        )
+        if source is None or source.heuristic:
+            return None
+        return source.model_copy(
+            update={"email_id": email.id, "derived_from": source.derived_from or source.email_id}
+        )
+
+    async def _summarize(self, account: "MailAccount", email: EmailRecord) -> EmailSummary:
+        """Run the agent off the event loop (unless a duplicate's summary fits) and persist the result."""
+        summary = self.derive_summary(account, email)
+        if summary is not None:
+            logger.info(f"Email {email.id} is a near-duplicate of {summary.derived_from}, reusing its summary")
+        else:
+            summary = await run_in_threadpool(self.agent.summarize_email, email)
+            if summary.heuristic:
+                # Model unavailable: serve the stand-in, but leave the email unsummarized
+                return summary
+            self.budget.spend(
+                estimate_tokens(email.subject + email.body) + estimate_tokens(summary.model_dump_json())
+            )
+        await self._save(account, email, summary)
+        return summary
+
+    async def _save(self, account: "MailAccount", email: EmailRecord, summary: EmailSummary) -> None:
+        """Store a summary and notify the listeners."""
+        account.store.save_summary(summary)
+
+        for listener in self._listeners:
+            try:
+                result = listener(account, email, summary)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Summary listener {listener!r} failed: {e}")
+
+
+@lru_cache
+def get_summary_worker() -> SummaryWorker:
+    """Get the shared summary worker."""
+    settings = get_settings()
+    return SummaryWorker(
+        get_agent(),
+        concurrency=settings.summary_worker_concurrency,
+        daily_token_budget=settings.summary_daily_token_budget,
+        duplicate_max_distance=settings.duplicate_max_distance,
+        duplicate_window_days=settings.duplicate_window_days,
+        ledger=get_usage_ledger(),
+    )
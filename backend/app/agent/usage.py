@@ -0,0 +1,135 @@
+"""Token usage ledger: every LLM call's tokens, aggregated per day, operation and model."""
+
+import logging
+import sqlite3
+import threading
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from app.config import ModelPrice, get_settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds a write waits for another process's transaction before failing
+BUSY_TIMEOUT = 30.0
+
+SCHEMA = """
+-- One row per local day, agent operation and model
+CREATE TABLE IF NOT EXISTS llm_usage (
+    day TEXT NOT NULL,
+    operation TEXT NOT NULL,
+    model TEXT NOT NULL,
+    calls INTEGER NOT NULL DEFAULT 0,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, operation, model)
+);
+"""
+
+
+def usage_metadata(result: Any) -> Optional[dict]:
+    """Token usage of a router call's result (a message, or a structured-output dict)."""
+    message = result.get("raw") if isinstance(result, dict) else result
+    return getattr(message, "usage_metadata", None)
+
+
+class UsageLedger:
+    """
+    Persists the tokens of every model call, for reports and budgets.
+
+    Calls are added to per-day aggregates as they complete, in a SQLite
+    file shared by all worker processes, so budgets see the spending of
+    the whole deployment. Days are local days, like TokenBudget's.
+    """
+
+    def __init__(self, path: str, prices: dict[str, ModelPrice], daily_token_budget: int = 0):
+        """
+        Open (and create if needed) the ledger.
+
+        Args:
+            path: SQLite file
+            prices: USD per million tokens, by model
+            daily_token_budget: Tokens per day (all operations) after which background
+                work goes heuristic, 0 for no limit
+        """
+        self.path = path
+        self.prices = prices
+        self.daily_token_budget = daily_token_budget
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=BUSY_TIMEOUT)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def record(self, operation: str, model: str, usage: dict) -> None:
+        """Add one call's usage_metadata to today's totals."""
+        input_tokens = int(usage.get("input_tokens") or 0)
+        output_tokens = int(usage.get("output_tokens") or 0)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO llm_usage (day, operation, model, calls, input_tokens, output_tokens) "
+                "VALUES (?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT (day, operation, model) DO UPDATE SET "
+                "calls = calls + 1, "
+                "input_tokens = input_tokens + excluded.input_tokens, "
+                "output_tokens = output_tokens + excluded.output_tokens",
+                (date.today().isoformat(), operation, model, input_tokens, output_tokens),
+            )
+
+    def tokens_today(self, operations: Optional[Iterable[str]] = None) -> int:
+        """Input and output tokens spent today, by the given operations or by all."""
+        query = "SELECT COALESCE(SUM(input_tokens + output_tokens), 0) FROM llm_usage WHERE day = ?"
+        params: list = [date.today().isoformat()]
+        if operations is not None:
+            operations = list(operations)
+            query += f" AND operation IN ({', '.join('?' * len(operations))})"
+            params += operations
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
+
+    def budget_reached(self) -> bool:
+        """Whether today's spending across all operations reached the daily budget."""
+        return bool(self.daily_token_budget) and self.tokens_today() >= self.daily_token_budget
+
+    def rows(self, since: date, until: date) -> list[dict]:
+        """Aggregates of the days in [since, until], oldest first, each with its estimated cost."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day, operation, model, calls, input_tokens, output_tokens FROM llm_usage "
+                "WHERE day BETWEEN ? AND ? ORDER BY day, operation, model",
+                (since.isoformat(), until.isoformat()),
+            ).fetchall()
+        return [
+            {**dict(row), "cost_usd": self.cost(row["model"], row["input_tokens"], row["output_tokens"])}
+            for row in rows
+        ]
+
+    def cost(self, model: str, input_tokens: int, output_tokens: int) -> Optional[float]:
+        """Estimated USD cost of some tokens, or None if the model has no price."""
+        price = self.prices.get(model)
+        if price is None:
+            return None
+        return round((input_tokens * price.input + output_tokens * price.output) / 1_000_000, 6)
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+@lru_cache
+def get_usage_ledger() -> UsageLedger:
+    """Get the shared usage ledger."""
+    settings = get_settings()
+    return UsageLedger(
+        settings.llm_usage_path,
+        prices=settings.model_prices(),
+        daily_token_budget=settings.llm_daily_token_budget,
+    )
@@ -1,34 +1,122 @@
 """API routes for AI agent operations."""
 
+import asyncio
+import contextlib
+import json
 import logging
+from datetime import date, timedelta
+from typing import AsyncIterator, Optional
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
-from app.agent.email_agent import EmailAgent
+from app.agent.digest import get_digest_builder
+from app.agent.draft_worker import get_draft_worker
+from app.agent.email_agent import draft_diff, get_agent
+from app.agent.llm_router import CircuitOpenError, DeadlineExceededError
 from app.agent.models import (
+    AgentMetricsResponse,
+    ChatMessage,
     ChatRefineRequest,
     ChatRefineResponse,
+    DigestRequest,
+    DigestResponse,
     GenerateReplyRequest,
     GenerateReplyResponse,
     RefineReplyRequest,
     RefineReplyResponse,
     SummarizeEmailRequest,
-    ChatMessage,
+    UsageBudget,
+    UsageResponse,
+    UsageRow,
+    UsageTotal,
 )
+from app.agent.refine_sessions import RefineSession, get_refine_sessions
+from app.agent.summary_worker import get_summary_worker
+from app.agent.usage import get_usage_ledger
+from app.api.dependencies import get_account, request_timeout
 from app.config import get_settings
-from app.email.imap_client import IMAPClient
+from app.core.accounts import MailAccount
 from app.email.models import EmailSummary
+from app.email.records import EmailRecord
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 settings = get_settings()
 
 # Initialize agent
-agent = EmailAgent(settings)
+agent = get_agent()
+
+
+def llm_unavailable(error: Exception, action: str) -> HTTPException:
+    """HTTP error for an operation stopped by its deadline or an open circuit."""
+    if isinstance(error, CircuitOpenError):
+        logger.warning(f"Cannot {action}: {error}")
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"AI model temporarily unavailable, cannot {action}",
+            headers={"Retry-After": str(int(settings.llm_circuit_cooldown))},
+        )
+    logger.warning(f"Cannot {action}: {error}")
+    return HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail=f"Timed out trying to {action}",
+    )
+
+
+def speculative_reply(account: MailAccount, request: GenerateReplyRequest) -> Optional[GenerateReplyResponse]:
+    """The background-drafted reply for a request, if one was stored."""
+    # A speculative draft only matches a plain request in its tone
+    if request.additional_context:
+        return None
+    draft = account.store.get_draft(request.email_id, request.tone.value)
+    if not draft:
+        return None
+    return GenerateReplyResponse(
+        email_id=request.email_id,
+        reply_text=draft,
+        tone=request.tone,
+        char_count=len(draft),
+        speculative=True,
+    )
+
+
+async def compose_reply(
+    account: MailAccount,
+    request: GenerateReplyRequest,
+    email: EmailRecord,
+    timeout: Optional[float],
+) -> GenerateReplyResponse:
+    """Generate a reply to a fetched email, with its thread and related mail as context."""
+    # Earlier messages and related mail come from the local indexes, not from IMAP
+    thread, related = await run_in_threadpool(account.reply_context, email)
+
+    # Generate reply
+    with agent.router.deadline("reply", timeout):
+        reply_text = await run_in_threadpool(
+            agent.generate_reply,
+            email=email,
+            tone=request.tone,
+            additional_context=request.additional_context,
+            thread=thread,
+            related=related,
+        )
+
+    return GenerateReplyResponse(
+        email_id=request.email_id,
+        reply_text=reply_text,
+        tone=request.tone,
+        char_count=len(reply_text)
+    )
 
 
 @router.post("/generate-reply", response_model=GenerateReplyResponse)
-async def generate_reply(request: GenerateReplyRequest):
+async def generate_reply(
+    request: GenerateReplyRequest,
+    account: MailAccount = Depends(get_account),
+    timeout: Optional[float] = Depends(request_timeout),
+):
     """
     Generate an AI-powered email reply.
 
@@ -39,32 +127,25 @@ async def generate_reply(request: GenerateReplyRequest):
         Generated reply text
     """
     try:
-        # Fetch the email
-        with IMAPClient(settings) as imap:
-            email = imap.fetch_email_by_id(request.email_id)
+        draft = speculative_reply(account, request)
+        if draft:
+            return draft
 
-            if not email:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Email {request.email_id} not found"
-                )
+        # Fetch the email
+        email = await account.run_imap(lambda imap: imap.fetch_email_by_id(request.email_id))
 
-        # Generate reply
-        reply_text = agent.generate_reply(
-            email=email,
-            tone=request.tone,
-            additional_context=request.additional_context
-        )
+        if not email:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Email {request.email_id} not found"
+            )
 
-        return GenerateReplyResponse(
-            email_id=request.email_id,
-            reply_text=reply_text,
-            tone=request.tone,
-            char_count=len(reply_text)
-        )
+        return await compose_reply(account, request, email, timeout)
 
     except HTTPException:
         raise
+    except (CircuitOpenError, DeadlineExceededError) as e:
+        raise llm_unavailable(e, "generate a reply")
     except Exception as e:
         logger.error(f"Error generating reply: {e}")
         raise HTTPException(
@@ -74,7 +155,11 @@ async def generate_reply(request: GenerateReplyRequest):
 
 
 @router.post("/refine-reply", response_model=RefineReplyResponse)
-async def refine_reply(request: RefineReplyRequest):
+async def refine_reply(
+    request: RefineReplyRequest,
+    account: MailAccount = Depends(get_account),
+    timeout: Optional[float] = Depends(request_timeout),
+):
     """
     Refine an existing email draft based on user feedback.
 
@@ -86,29 +171,43 @@ async def refine_reply(request: RefineReplyRequest):
     """
     try:
         # Fetch the original email
-        with IMAPClient(settings) as imap:
-            email = imap.fetch_email_by_id(request.email_id)
+        email = await account.run_imap(lambda imap: imap.fetch_email_by_id(request.email_id))
 
-            if not email:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Email {request.email_id} not found"
-                )
+        if not email:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Email {request.email_id} not found"
+            )
 
         # Refine the reply
-        refined_text = agent.refine_reply(
-            original_email=email,
-            current_draft=request.current_draft,
-            user_feedback=request.user_feedback
-        )
+        with agent.router.deadline("refine", timeout):
+            if request.mode == "edit":
+                refined_text, mode = await run_in_threadpool(
+                    agent.refine_reply_with_edits,
+                    original_email=email,
+                    current_draft=request.current_draft,
+                    user_feedback=request.user_feedback
+                )
+            else:
+                refined_text = await run_in_threadpool(
+                    agent.refine_reply,
+                    original_email=email,
+                    current_draft=request.current_draft,
+                    user_feedback=request.user_feedback
+                )
+                mode = "rewrite"
 
         return RefineReplyResponse(
             refined_text=refined_text,
-            char_count=len(refined_text)
+            char_count=len(refined_text),
+            mode=mode,
+            diff=draft_diff(request.current_draft, refined_text),
         )
 
     except HTTPException:
         raise
+    except (CircuitOpenError, DeadlineExceededError) as e:
+        raise llm_unavailable(e, "refine the reply")
     except Exception as e:
         logger.error(f"Error refining reply: {e}")
         raise HTTPException(
@@ -118,7 +217,10 @@ async def refine_reply(request: RefineReplyRequest):
 
 
 @router.post("/chat-refine", response_model=ChatRefineResponse)
-async def chat_refine(request: ChatRefineRequest):
+async def chat_refine(
+    request: ChatRefineRequest,
+    timeout: Optional[float] = Depends(request_timeout),
+):
     """
     Chat-based refinement of email drafts.
 
@@ -139,10 +241,12 @@ async def chat_refine(request: ChatRefineRequest):
         ]
 
         # Get AI response
-        response = agent.chat_refine(
-            conversation_history=history_dicts,
-            user_message=request.user_message
-        )
+        with agent.router.deadline("chat", timeout):
+            response = await run_in_threadpool(
+                agent.chat_refine,
+                conversation_history=history_dicts,
+                user_message=request.user_message
+            )
 
         # Build updated history
         updated_history = list(request.conversation_history)
@@ -154,6 +258,8 @@ async def chat_refine(request: ChatRefineRequest):
             updated_history=updated_history
         )
 
+    except (CircuitOpenError, DeadlineExceededError) as e:
+        raise llm_unavailable(e, "process the chat message")
     except Exception as e:
         logger.error(f"Error in chat refinement: {e}")
         raise HTTPException(
@@ -162,8 +268,98 @@ async def chat_refine(request: ChatRefineRequest):
         )
 
 
+@router.websocket("/chat-refine/ws")
+async def chat_refine_session(websocket: WebSocket, session_id: Optional[str] = None):
+    """
+    Draft-refinement session over a WebSocket.
+
+    History and the current draft live on the server, so each turn sends
+    only the new message. Client messages (JSON):
+        {"type": "init", "draft": "...", "history": [...]}  seed a new session
+        {"type": "message", "content": "..."}               ask for a change
+        {"type": "cancel"}                                  stop the current generation
+        {"type": "draft", "draft": "..."}                   replace the draft (manual edit)
+
+    Server messages: "session" (state on connect), "token" (streamed text),
+    "draft" (updated draft after a turn), "done", "cancelled" and "error".
+    Reconnect with ?session_id= to resume a session; the "session" message
+    has "resumed": false (and a new id) if it expired.
+    """
+    await websocket.accept()
+    sessions = get_refine_sessions()
+    session = sessions.get_or_create(session_id)
+    await websocket.send_json({"type": "session", **session.snapshot()})
+
+    generation: Optional[asyncio.Task] = None
+    try:
+        while True:
+            message = await websocket.receive_json()
+            kind = message.get("type")
+
+            if kind == "message":
+                if generation and not generation.done():
+                    await websocket.send_json(
+                        {"type": "error", "detail": "A response is already being generated"}
+                    )
+                    continue
+                generation = asyncio.create_task(
+                    _run_refine_turn(websocket, session, str(message.get("content", "")))
+                )
+            elif kind == "cancel":
+                if generation and not generation.done():
+                    generation.cancel()
+            elif kind == "draft":
+                session.draft = str(message.get("draft", ""))
+                sessions.save(session)
+            elif kind == "init":
+                if not session.history:
+                    session.history = [
+                        ChatMessage(**m).model_dump() for m in message.get("history", [])
+                    ]
+                    session.draft = str(message.get("draft", session.draft))
+                    sessions.save(session)
+                await websocket.send_json({"type": "session", **session.snapshot()})
+            else:
+                await websocket.send_json({"type": "error", "detail": f"Unknown message type: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Refine session {session.id} failed: {e}")
+    finally:
+        # Closing the socket stops the upstream LLM request too
+        if generation and not generation.done():
+            generation.cancel()
+
+
+async def _run_refine_turn(websocket: WebSocket, session: RefineSession, content: str) -> None:
+    """Stream one assistant turn to the client and update the session when it completes."""
+    parts: list[str] = []
+    try:
+        async for text in agent.stream_chat_refine(session.history, content, session.draft):
+            parts.append(text)
+            await websocket.send_json({"type": "token", "text": text})
+
+        response = "".join(parts)
+        session.add_turn(content, response)
+        get_refine_sessions().save(session)
+        await websocket.send_json({"type": "draft", "draft": session.draft})
+        await websocket.send_json({"type": "done"})
+    except asyncio.CancelledError:
+        logger.info(f"Generation cancelled in refine session {session.id}")
+        with contextlib.suppress(Exception):
+            await websocket.send_json({"type": "cancelled"})
+    except Exception as e:
+        logger.error(f"Error in refine session {session.id}: {e}")
+        with contextlib.suppress(Exception):
+            await websocket.send_json({"type": "error", "detail": f"Failed to process chat: {str(e)}"})
+
+
 @router.post("/summarize", response_model=EmailSummary)
-async def summarize_email(request: SummarizeEmailRequest):
+async def summarize_email(
+    request: SummarizeEmailRequest,
+    account: MailAccount = Depends(get_account),
+    timeout: Optional[float] = Depends(request_timeout),
+):
     """
     Generate an AI-powered summary of an email.
 
@@ -174,18 +370,24 @@ async def summarize_email(request: SummarizeEmailRequest):
         Email summary with key points, sentiment, and priority
     """
     try:
+        # Summaries warmed by the background worker need no IMAP or LLM call
+        # (rule-based ones it stored once over budget are replaced on request)
+        cached = account.store.get_summary(request.email_id)
+        if cached and not cached.heuristic:
+            return cached
+
         # Fetch the email
-        with IMAPClient(settings) as imap:
-            email = imap.fetch_email_by_id(request.email_id)
+        email = await account.run_imap(lambda imap: imap.fetch_email_by_id(request.email_id))
 
-            if not email:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Email {request.email_id} not found"
-                )
+        if not email:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Email {request.email_id} not found"
+            )
 
-        # Generate summary
-        summary = agent.summarize_email(email)
+        # Generate and store summary (a heuristic stand-in if the model is unavailable)
+        with agent.router.deadline("summarize", timeout):
+            summary = await get_summary_worker().summarize(account, email)
 
         return summary
 
@@ -197,3 +399,143 @@ async def summarize_email(request: SummarizeEmailRequest):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to summarize email: {str(e)}"
         )
+
+
+@router.post("/digest", response_model=DigestResponse)
+async def create_digest(
+    request: DigestRequest,
+    account: MailAccount = Depends(get_account),
+    timeout: Optional[float] = Depends(request_timeout),
+):
+    """
+    Build a ranked digest of the mail received in a time range.
+
+    Stored summaries are grouped by conversation (or sender) and reduced
+    in a bounded number of model calls. With "stream": true the response
+    is newline-delimited JSON: a "start" event, one "section" event per
+    section as it completes, an "overview" event and a final "done"
+    event carrying the whole digest ("error" if building it failed).
+
+    Args:
+        request: Mailbox, time range (default: the last 24 hours) and grouping
+
+    Returns:
+        The digest, sections best ranked first
+    """
+    builder = get_digest_builder()
+    if request.stream:
+        return StreamingResponse(
+            ndjson_events(builder.stream(account.store, request, timeout), "build digest"),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache"},
+        )
+
+    try:
+        return await builder.build(account.store, request, timeout)
+    except Exception as e:
+        logger.error(f"Error building digest: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to build digest: {str(e)}"
+        )
+
+
+async def ndjson_events(events: AsyncIterator[dict], action: str) -> AsyncIterator[str]:
+    """Encode events one per line, ending with an "error" event if the source fails."""
+    try:
+        async for event in events:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    except Exception as e:
+        logger.error(f"Error streaming events ({action}): {e}")
+        yield json.dumps({"type": "error", "detail": f"Failed to {action}: {str(e)}"}) + "\n"
+
+
+@router.get("/metrics", response_model=AgentMetricsResponse)
+async def get_agent_metrics():
+    """
+    Get agent output-quality metrics since startup.
+
+    Returns:
+        Counts of structured, repaired and malformed summarization responses,
+        and the circuit breaker state of each model
+    """
+    return AgentMetricsResponse(
+        summaries=agent.summary_metrics.snapshot(),
+        circuits=agent.router.circuit_states(),
+    )
+
+
+def _totals(rows: list[UsageRow], key: str) -> dict[str, UsageTotal]:
+    """Sum usage rows by one of their fields."""
+    totals: dict[str, UsageTotal] = {}
+    for row in rows:
+        total = totals.setdefault(getattr(row, key), UsageTotal())
+        total.calls += row.calls
+        total.input_tokens += row.input_tokens
+        total.output_tokens += row.output_tokens
+        if row.cost_usd is None:
+            total.unpriced_calls += row.calls
+        else:
+            total.cost_usd = round(total.cost_usd + row.cost_usd, 6)
+    return totals
+
+
+def _budgets() -> list[UsageBudget]:
+    """Today's spending against each daily token budget."""
+    ledger = get_usage_ledger()
+    budgets = [UsageBudget(
+        name="all",
+        daily_limit=ledger.daily_token_budget,
+        used_today=ledger.tokens_today(),
+        reached=ledger.budget_reached(),
+    )]
+    for name, budget in (
+        ("summaries", get_summary_worker().budget),
+        ("speculative_drafts", get_draft_worker().budget),
+    ):
+        budgets.append(UsageBudget(
+            name=name,
+            daily_limit=budget.daily_limit,
+            used_today=budget.used,
+            reached=not budget.allows(0),
+        ))
+    return budgets
+
+
+@router.get("/usage", response_model=UsageResponse)
+async def get_usage(days: int = Query(default=7, ge=1, le=366)):
+    """
+    Get LLM token usage and estimated cost, per day, operation and model.
+
+    Usage is recorded for every model call of every worker, including
+    fallback and hedged requests. Costs are estimates from the price table
+    (built-in prices, overridden by LLM_PRICES); models without a price
+    have no cost.
+
+    Args:
+        days: Number of days to report, today included
+
+    Returns:
+        Daily rows, totals per operation and per model, and today's budget status
+    """
+    try:
+        ledger = get_usage_ledger()
+        until = date.today()
+        since = until - timedelta(days=days - 1)
+        rows = [UsageRow(**row) for row in await run_in_threadpool(ledger.rows, since, until)]
+
+        return UsageResponse(
+            since=since,
+            until=until,
+            rows=rows,
+            by_operation=_totals(rows, "operation"),
+            by_model=_totals(rows, "model"),
+            budgets=await run_in_threadpool(_budgets),
+        )
+
+    except Exception as e:
+        logger.error(f"Error reading LLM usage: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read LLM usage: {str(e)}"
+        )
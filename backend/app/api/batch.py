@@ -0,0 +1,232 @@
+"""API route running several email and agent operations in one request."""
+
+import asyncio
+import logging
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.agent.llm_router import CircuitOpenError, DeadlineExceededError
+from app.agent.models import BatchOperation, BatchRequest, GenerateReplyRequest
+from app.agent.summary_worker import get_summary_worker
+from app.api.agent import agent, compose_reply, llm_unavailable, ndjson_events, speculative_reply
+from app.api.dependencies import get_account, request_timeout
+from app.config import get_settings
+from app.core.accounts import MailAccount
+from app.email.flag_queue import SEEN
+from app.email.records import EmailRecord
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+settings = get_settings()
+
+# What each operation does, for error messages
+ACTIONS = {
+    "get": "fetch email",
+    "summarize": "summarize email",
+    "mark-read": "mark email as read",
+    "generate-reply": "generate a reply",
+}
+
+
+class BatchRun:
+    """
+    One batch request: its emails are loaded together, then its operations run concurrently.
+
+    Emails needed by the operations and not in the local store are fetched
+    with a single UID FETCH, started at once so operations answered from
+    the store (stored summaries, speculative drafts) do not wait for it.
+    Mark-read operations are queued together as one flag change. At most
+    ``batch_concurrency`` summaries and replies are generated at once.
+    """
+
+    def __init__(self, account: MailAccount, operations: list[BatchOperation], timeout: Optional[float]):
+        """Prepare a batch (nothing runs until ``results`` is iterated)."""
+        self.account = account
+        self.operations = operations
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max(1, settings.batch_concurrency))
+        self._emails: Optional[asyncio.Task] = None
+
+    async def results(self) -> AsyncIterator[dict]:
+        """Yield one "result" event per operation as it completes, then a "done" event."""
+        failed = 0
+        for event in self._mark_read():
+            failed += event["status"] >= 400
+            yield event
+
+        self._emails = asyncio.create_task(self._load_emails())
+        tasks = [
+            asyncio.create_task(self._run(index, operation))
+            for index, operation in enumerate(self.operations)
+            if operation.op != "mark-read"
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                event = await next_done
+                failed += event["status"] >= 400
+                yield event
+        finally:
+            # The client went away: stop work nobody will read
+            for task in tasks + [self._emails]:
+                task.cancel()
+
+        yield {"type": "done", "operations": len(self.operations), "failed": failed}
+
+    def _mark_read(self) -> list[dict]:
+        """Queue every mark-read operation as one flag change."""
+        operations = [(i, op) for i, op in enumerate(self.operations) if op.op == "mark-read"]
+        uids = [int(op.email_id) for _, op in operations if op.email_id.isdigit()]
+        if uids:
+            self.account.flag_queue.enqueue("INBOX", uids, SEEN, True)
+
+        events = []
+        for index, operation in operations:
+            event = self._event(index, operation)
+            if operation.email_id.isdigit():
+                event.update(
+                    status=status.HTTP_202_ACCEPTED,
+                    data={"pending": self.account.flag_queue.pending_count},
+                )
+            else:
+                event.update(status=status.HTTP_400_BAD_REQUEST, detail="Email IDs must be IMAP UIDs")
+            events.append(event)
+        return events
+
+    def _needs_email(self, operation: BatchOperation) -> bool:
+        """Whether an operation needs the email itself (and not only stored results)."""
+        if operation.op == "summarize":
+            cached = self.account.store.get_summary(operation.email_id)
+            return cached is None or cached.heuristic
+        if operation.op == "generate-reply":
+            return speculative_reply(self.account, self._reply_request(operation)) is None
+        return operation.op == "get"
+
+    async def _load_emails(self) -> dict[str, EmailRecord]:
+        """Emails of the batch from the store, and the rest with one IMAP fetch."""
+        emails: dict[str, EmailRecord] = {}
+        missing: list[int] = []
+        for email_id in dict.fromkeys(op.email_id for op in self.operations if self._needs_email(op)):
+            email_obj = self.account.store.get_email(email_id)
+            if email_obj:
+                emails[email_id] = email_obj
+            elif email_id.isdigit():
+                missing.append(int(email_id))
+
+        if missing:
+            fetched = await self.account.run_imap(lambda imap: imap.fetch_emails(missing))
+            emails.update((email_obj.id, email_obj) for email_obj in fetched)
+        return emails
+
+    async def _email(self, email_id: str) -> EmailRecord:
+        """An email of the batch, once loaded (404 if it does not exist)."""
+        email_obj = (await asyncio.shield(self._emails)).get(email_id)
+        if not email_obj:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Email {email_id} not found"
+            )
+        return email_obj
+
+    async def _run(self, index: int, operation: BatchOperation) -> dict:
+        """Run one operation and describe its outcome as an event."""
+        event = self._event(index, operation)
+        try:
+            if operation.op == "get":
+                email_obj = await self._email(operation.email_id)
+                data = email_obj.to_model().model_dump(mode="json", by_alias=True)
+            elif operation.op == "summarize":
+                data = (await self._summarize(operation)).model_dump(mode="json")
+            else:
+                data = (await self._reply(operation)).model_dump(mode="json")
+            event.update(status=status.HTTP_200_OK, data=data)
+        except HTTPException as e:
+            event.update(status=e.status_code, detail=e.detail)
+        except (CircuitOpenError, DeadlineExceededError) as e:
+            error = llm_unavailable(e, ACTIONS[operation.op])
+            event.update(status=error.status_code, detail=error.detail)
+        except Exception as e:
+            logger.error(f"Error in batch operation {operation.op} on email {operation.email_id}: {e}")
+            event.update(
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to {ACTIONS[operation.op]}: {str(e)}",
+            )
+        return event
+
+    async def _summarize(self, operation: BatchOperation):
+        """Stored summary, or a new one (a heuristic stand-in if the model is unavailable)."""
+        cached = self.account.store.get_summary(operation.email_id)
+        if cached and not cached.heuristic:
+            return cached
+
+        email_obj = await self._email(operation.email_id)
+        async with self._semaphore:
+            with agent.router.deadline("summarize", self.timeout):
+                return await get_summary_worker().summarize(self.account, email_obj)
+
+    async def _reply(self, operation: BatchOperation):
+        """Speculative draft, or a newly generated reply."""
+        request = self._reply_request(operation)
+        draft = speculative_reply(self.account, request)
+        if draft:
+            return draft
+
+        email_obj = await self._email(operation.email_id)
+        async with self._semaphore:
+            return await compose_reply(self.account, request, email_obj, self.timeout)
+
+    @staticmethod
+    def _reply_request(operation: BatchOperation) -> GenerateReplyRequest:
+        return GenerateReplyRequest(
+            email_id=operation.email_id,
+            tone=operation.tone,
+            additional_context=operation.additional_context,
+        )
+
+    @staticmethod
+    def _event(index: int, operation: BatchOperation) -> dict:
+        return {
+            "type": "result",
+            "id": operation.id if operation.id is not None else str(index),
+            "op": operation.op,
+            "email_id": operation.email_id,
+        }
+
+
+@router.post("/batch")
+async def run_batch(
+    request: BatchRequest,
+    account: MailAccount = Depends(get_account),
+    timeout: Optional[float] = Depends(request_timeout),
+):
+    """
+    Run several operations on INBOX emails in one request.
+
+    Operations ("get", "summarize", "mark-read", "generate-reply") run
+    concurrently and share one IMAP fetch for the emails they need. The
+    response is newline-delimited JSON: one "result" event per operation
+    as it completes, carrying the operation's id, an HTTP-style status and
+    either "data" (what the single-operation endpoint returns) or
+    "detail", then a final "done" event. Results arrive in completion
+    order, not request order.
+
+    Args:
+        request: Operations to run
+        timeout: X-Request-Timeout seconds, applied to each summary and reply
+
+    Returns:
+        Streamed result events
+    """
+    if len(request.operations) > settings.batch_max_operations:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.batch_max_operations} operations per batch"
+        )
+
+    run = BatchRun(account, request.operations, timeout)
+    return StreamingResponse(
+        ndjson_events(run.results(), "run batch"),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache"},
+    )
@@ -0,0 +1,31 @@
+"""Shared FastAPI dependencies."""
+
+from typing import Optional
+
+from fastapi import Header, HTTPException, Query, status
+
+from app.core.accounts import MailAccount, get_accounts
+
+
+def get_account(
+    account: Optional[str] = Query(
+        None, description="Account id (the default account when omitted)"
+    ),
+) -> MailAccount:
+    """Resolve the ``account`` query parameter to a configured mail account."""
+    try:
+        return get_accounts().get(account)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Account {account} not found"
+        )
+
+
+def request_timeout(
+    x_request_timeout: Optional[float] = Header(
+        None, gt=0, description="Seconds the client is willing to wait for the AI operation"
+    ),
+) -> Optional[float]:
+    """Client time budget for a request, tightening the operation's configured deadline."""
+    return x_request_timeout
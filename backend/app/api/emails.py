@@ -1,36 +1,106 @@
 """API routes for email operations."""
 
 import logging
-from datetime import datetime
-from typing import Optional
+import re
+from datetime import date, datetime, timezone
+from typing import Literal, Optional
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from pydantic_core import to_json
 
+from app.api.dependencies import get_account
 from app.config import get_settings
-from app.email.imap_client import IMAPClient
-from app.email.models import CheckEmailsResponse, Email, EmailDraft, SendEmailRequest
-from app.email.smtp_client import SMTPClient
+from app.core.accounts import MailAccount
+from app.email.fingerprint import group_near_duplicates
+from app.email.flag_queue import FLAGGED, SEEN
+from app.email.models import (
+    BulkEmailsRequest,
+    BulkEmailsResponse,
+    CheckEmailsResponse,
+    Email,
+    EmailDraft,
+    EmailPage,
+    EmailThread,
+    MailboxInfo,
+    PrioritizedEmail,
+    PrioritizedEmailsResponse,
+    SearchResponse,
+    SendEmailRequest,
+)
+from app.email.records import EmailRecord
+from app.email.store import MailStore
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
-settings = get_settings()
+
+# Email fields selectable with ?fields=, by their JSON name, plus the derived "snippet"
+EMAIL_FIELDS = {
+    (field.alias or name): name for name, field in Email.model_fields.items()
+}
+SNIPPET_LENGTH = 200
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+FIELDS_QUERY = Query(
+    None,
+    description=(
+        "Comma-separated fields to return instead of the full email, "
+        "e.g. id,from,subject,date,is_read,snippet"
+    ),
+)
+
+
+def json_response(content, headers: Optional[dict] = None) -> Response:
+    """Serialize hand-built payloads with pydantic-core (same fast path as response models)."""
+    return Response(content=to_json(content), media_type="application/json", headers=headers)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[set[str]]:
+    """Validate a ?fields= projection; None means the full email."""
+    if not fields:
+        return None
+
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - EMAIL_FIELDS.keys() - {"snippet"}
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    return requested
+
+
+def project_email(email: EmailRecord, fields: set[str]) -> dict:
+    """Pick the requested fields of an email (serialized by json_response)."""
+    data = {f: getattr(email, EMAIL_FIELDS[f]) for f in fields if f in EMAIL_FIELDS}
+    if "snippet" in fields:
+        data["snippet"] = _WHITESPACE_RE.sub(" ", email.body).strip()[:SNIPPET_LENGTH]
+    return data
 
 
 @router.get("/", response_model=list[Email])
-async def list_emails(limit: int = 20):
+async def list_emails(
+    limit: int = 20,
+    fields: Optional[str] = FIELDS_QUERY,
+    account: MailAccount = Depends(get_account),
+):
     """
     List unread emails from inbox.
 
     Args:
         limit: Maximum number of emails to return (default: 20)
+        fields: Optional projection, e.g. "id,from,subject,date,snippet"
 
     Returns:
-        List of unread emails
+        List of unread emails (only the requested fields when projected)
     """
+    projection = parse_fields(fields)
     try:
-        with IMAPClient(settings) as imap:
-            emails = imap.fetch_unread_emails(limit=limit)
-            return emails
+        emails = await account.run_imap(lambda imap: imap.fetch_unread_emails(limit=limit))
+
+        if projection:
+            return json_response([project_email(e, projection) for e in emails])
+        return [e.to_model() for e in emails]
     except Exception as e:
         logger.error(f"Error listing emails: {e}")
         raise HTTPException(
@@ -40,25 +110,46 @@ async def list_emails(limit: int = 20):
 
 
 @router.post("/check", response_model=CheckEmailsResponse)
-async def check_emails(limit: int = 20):
+async def check_emails(
+    limit: int = 20,
+    fields: Optional[str] = FIELDS_QUERY,
+    account: MailAccount = Depends(get_account),
+):
     """
     Check for new emails.
 
     Args:
         limit: Maximum number of emails to return (default: 20)
+        fields: Optional projection for each email, e.g. "id,from,subject,snippet"
 
     Returns:
         New emails and count
     """
+    projection = parse_fields(fields)
     try:
-        with IMAPClient(settings) as imap:
-            emails = imap.fetch_unread_emails(limit=limit)
+        emails = await account.run_imap(lambda imap: imap.fetch_unread_emails(limit=limit))
+        summaries = account.store.get_summaries([e.id for e in emails])
+        duplicate_groups = group_near_duplicates(
+            ((e.id, e.from_address, e.fingerprint) for e in emails),
+            max_distance=get_settings().duplicate_max_distance,
+        )
 
-            return CheckEmailsResponse(
-                new_emails_count=len(emails),
-                emails=emails,
-                last_check=datetime.now()
-            )
+        if projection:
+            return json_response({
+                "new_emails_count": len(emails),
+                "emails": [project_email(e, projection) for e in emails],
+                "last_check": datetime.now(),
+                "summaries": {k: v.model_dump(mode="json") for k, v in summaries.items()},
+                "duplicate_groups": duplicate_groups,
+            })
+
+        return CheckEmailsResponse(
+            new_emails_count=len(emails),
+            emails=[e.to_model() for e in emails],
+            last_check=datetime.now(),
+            summaries=summaries,
+            duplicate_groups=duplicate_groups,
+        )
     except Exception as e:
         logger.error(f"Error checking emails: {e}")
         raise HTTPException(
@@ -67,28 +158,215 @@ async def check_emails(limit: int = 20):
         )
 
 
+@router.get("/mailboxes", response_model=list[MailboxInfo])
+async def list_mailboxes(account: MailAccount = Depends(get_account)):
+    """
+    List mailboxes with message counts.
+
+    Returns:
+        Mailbox names with total, unseen, UIDNEXT and UIDVALIDITY from IMAP STATUS
+    """
+    try:
+        return await account.run_imap(lambda imap: imap.list_mailboxes())
+    except Exception as e:
+        logger.error(f"Error listing mailboxes: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to list mailboxes: {str(e)}"
+        )
+
+
+@router.get("/list", response_model=EmailPage)
+async def list_mailbox_page(
+    mailbox: str = "INBOX",
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    order: Literal["desc", "asc"] = "desc",
+    is_read: Optional[bool] = None,
+    is_flagged: Optional[bool] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    account: MailAccount = Depends(get_account),
+):
+    """
+    List email headers from any mailbox, one cursor-paginated page at a time.
+
+    Args:
+        mailbox: Mailbox to list (default: INBOX)
+        limit: Page size (default: 50)
+        cursor: next_cursor from the previous page
+        order: "desc" (newest first) or "asc" (oldest first)
+        is_read: Only read (true) or unread (false) emails
+        is_flagged: Only flagged (true) or unflagged (false) emails
+        since: Only emails received on or after this date
+        until: Only emails received before this date
+
+    Returns:
+        A page of email headers and the cursor for the next page
+    """
+    try:
+        page = await account.run_imap(
+            lambda imap: imap.fetch_page(
+                mailbox=mailbox,
+                limit=limit,
+                cursor=cursor,
+                order=order,
+                is_read=is_read,
+                is_flagged=is_flagged,
+                since=since,
+                until=until,
+            )
+        )
+        # Flag changes not yet written back still show as applied
+        account.flag_queue.overlay(mailbox, page.emails)
+        return page
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error listing mailbox {mailbox}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to list emails: {str(e)}"
+        )
+
+
+@router.get("/search", response_model=SearchResponse)
+async def search_emails(
+    q: str = Query(..., min_length=1, description="Search text"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    mailbox: Optional[str] = None,
+    account: MailAccount = Depends(get_account),
+):
+    """
+    Full-text search over locally cached emails.
+
+    Matches subject, sender, recipients, body text and attachment names,
+    ranked by relevance. The mail server is never contacted.
+
+    Args:
+        q: Search text (the last word is prefix-matched)
+        limit: Page size (default: 20)
+        offset: Number of results to skip (default: 0)
+        mailbox: Restrict results to one mailbox
+
+    Returns:
+        A page of ranked search hits and the total match count
+    """
+    try:
+        return account.store.search(q, limit=limit, offset=offset, mailbox=mailbox)
+    except Exception as e:
+        logger.error(f"Error searching emails: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search emails: {str(e)}"
+        )
+
+
+@router.get("/prioritized", response_model=PrioritizedEmailsResponse)
+async def list_prioritized_emails(
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    mailbox: str = "INBOX",
+    unread_only: bool = True,
+    account: MailAccount = Depends(get_account),
+):
+    """
+    Locally cached emails ranked by how likely they are to need attention.
+
+    The ranking uses local signals only (how often you write to the
+    sender, threads you took part in, stored summaries, headers); neither
+    the mail server nor the model is contacted.
+
+    Args:
+        limit: Page size (default: 20)
+        offset: Number of ranked emails to skip (default: 0)
+        mailbox: Mailbox to rank (default: INBOX)
+        unread_only: Leave out emails already read (default: true)
+
+    Returns:
+        A page of emails, most important first
+    """
+    try:
+        entries, has_more = account.priority.top(
+            limit=limit, offset=offset, mailbox=mailbox, unread_only=unread_only
+        )
+        return PrioritizedEmailsResponse(
+            emails=[
+                PrioritizedEmail(
+                    email_id=entry.uid,
+                    mailbox=entry.mailbox,
+                    from_address=entry.sender,
+                    subject=entry.subject,
+                    date=entry.date,
+                    is_read=entry.is_read,
+                    is_flagged=entry.is_flagged,
+                    priority=entry.priority,
+                    action_required=entry.action_required,
+                    score=entry.score,
+                    reasons=entry.reasons,
+                )
+                for entry in entries
+            ],
+            limit=limit,
+            offset=offset,
+            has_more=has_more,
+            indexed=len(account.priority),
+        )
+    except Exception as e:
+        logger.error(f"Error ranking emails: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to rank emails: {str(e)}"
+        )
+
+
 @router.get("/{email_id}", response_model=Email)
-async def get_email(email_id: str):
+async def get_email(
+    email_id: str,
+    if_none_match: Optional[str] = Header(None),
+    account: MailAccount = Depends(get_account),
+):
     """
     Get a specific email by ID.
 
+    A message's content never changes for a given UID, so emails already in
+    the local store are served from it. The response carries an ETag; a
+    request with a matching If-None-Match gets 304 without touching IMAP.
+
     Args:
         email_id: Email ID (IMAP UID)
+        if_none_match: ETag(s) from a previous response
 
     Returns:
         Email details
     """
     try:
-        with IMAPClient(settings) as imap:
-            email_obj = imap.fetch_email_by_id(email_id)
-
-            if not email_obj:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Email {email_id} not found"
-                )
+        etag = account.store.get_etag(email_id)
+        if etag and if_none_match and _etag_matches(etag, if_none_match):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        email_obj = account.store.get_email(email_id) if etag else None
+        if not email_obj:
+            email_obj = await account.run_imap(lambda imap: imap.fetch_email_by_id(email_id))
+
+        if not email_obj:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Email {email_id} not found"
+            )
 
-            return email_obj
+        return Response(
+            content=email_obj.to_model().model_dump_json(by_alias=True),
+            media_type="application/json",
+            headers={
+                "ETag": etag or MailStore.etag_for(email_obj.to_json()),
+                "Cache-Control": "private, no-cache",
+            },
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -99,72 +377,187 @@ async def get_email(email_id: str):
         )
 
 
-@router.post("/{email_id}/mark-read")
-async def mark_email_as_read(email_id: str):
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    """Weak comparison of an ETag against an If-None-Match header value."""
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+@router.get("/{email_id}/thread", response_model=EmailThread)
+async def get_email_thread(email_id: str, account: MailAccount = Depends(get_account)):
     """
-    Mark an email as read.
+    Get the whole conversation thread an email belongs to.
+
+    The thread is assembled from the local index (Message-ID, In-Reply-To
+    and References); only the requested email is fetched from IMAP if it
+    is not cached yet.
 
     Args:
         email_id: Email ID (IMAP UID)
 
     Returns:
-        Success message
+        Thread id and its cached messages, oldest first
     """
     try:
-        with IMAPClient(settings) as imap:
-            success = imap.mark_as_read(email_id)
+        email_obj = account.store.get_email(email_id)
 
-            if not success:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to mark email as read"
-                )
+        if not email_obj:
+            email_obj = await account.run_imap(lambda imap: imap.fetch_email_by_id(email_id))
+
+        if not email_obj:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Email {email_id} not found"
+            )
 
-            return {"message": "Email marked as read", "email_id": email_id}
+        return account.store.get_thread(email_obj).to_model()
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error marking email as read: {e}")
+        logger.error(f"Error fetching thread for email {email_id}: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to mark email as read: {str(e)}"
+            detail=f"Failed to fetch thread: {str(e)}"
         )
 
 
-@router.post("/{email_id}/mark-unread")
-async def mark_email_as_unread(email_id: str):
+@router.post("/{email_id}/mark-read", status_code=status.HTTP_202_ACCEPTED)
+async def mark_email_as_read(email_id: str, account: MailAccount = Depends(get_account)):
     """
-    Mark an email as unread.
+    Mark an email as read (written to the server in the background).
 
     Args:
         email_id: Email ID (IMAP UID)
 
     Returns:
-        Success message
+        Acknowledgement with the number of pending changes
     """
-    try:
-        with IMAPClient(settings) as imap:
-            success = imap.mark_as_unread(email_id)
+    return _queue_single_flag_change(account, email_id, True, "Email marked as read")
 
-            if not success:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to mark email as unread"
-                )
 
-            return {"message": "Email marked as unread", "email_id": email_id}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error marking email as unread: {e}")
+@router.post("/{email_id}/mark-unread", status_code=status.HTTP_202_ACCEPTED)
+async def mark_email_as_unread(email_id: str, account: MailAccount = Depends(get_account)):
+    """
+    Mark an email as unread (written to the server in the background).
+
+    Args:
+        email_id: Email ID (IMAP UID)
+
+    Returns:
+        Acknowledgement with the number of pending changes
+    """
+    return _queue_single_flag_change(account, email_id, False, "Email marked as unread")
+
+
+def _queue_single_flag_change(account: MailAccount, email_id: str, read: bool, message: str) -> dict:
+    """Queue a read-state change of one INBOX email, updating its cached copy (and ETag) at once."""
+    if not email_id.isdigit():
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to mark email as unread: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email ID must be an IMAP UID"
         )
 
+    account.flag_queue.enqueue("INBOX", [int(email_id)], SEEN, read)
+    return {"message": message, "email_id": email_id, "pending": account.flag_queue.pending_count}
+
+
+async def _queue_flag_change(
+    account: MailAccount, request: BulkEmailsRequest, flag: str, add: bool, message: str
+) -> BulkEmailsResponse:
+    """Validate the ids and mailbox and hand the change to the account's flag queue."""
+    try:
+        uids = [int(email_id) for email_id in request.email_ids]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email IDs must be IMAP UIDs"
+        )
+
+    # A change to a missing mailbox would only fail later, in the background
+    if request.mailbox != "INBOX":
+        try:
+            exists = await account.run_imap(lambda imap: imap.mailbox_exists(request.mailbox))
+        except Exception as e:
+            logger.error(f"Error checking mailbox {request.mailbox}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to check mailbox: {str(e)}"
+            )
+        if not exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Mailbox {request.mailbox} not found"
+            )
+
+    account.flag_queue.enqueue(request.mailbox, uids, flag, add)
+    return BulkEmailsResponse(
+        message=message,
+        email_ids=request.email_ids,
+        pending=account.flag_queue.pending_count,
+    )
+
+
+@router.post("/mark-read", response_model=BulkEmailsResponse, status_code=status.HTTP_202_ACCEPTED)
+async def mark_emails_as_read(request: BulkEmailsRequest, account: MailAccount = Depends(get_account)):
+    """
+    Mark several emails as read.
+
+    The change is applied to the local cache at once and written to the
+    server shortly after, coalesced with other pending flag changes.
+
+    Args:
+        request: Email IDs and mailbox
+
+    Returns:
+        Acknowledgement with the number of pending changes
+    """
+    return await _queue_flag_change(account, request, SEEN, True, "Emails marked as read")
+
+
+@router.post("/mark-unread", response_model=BulkEmailsResponse, status_code=status.HTTP_202_ACCEPTED)
+async def mark_emails_as_unread(request: BulkEmailsRequest, account: MailAccount = Depends(get_account)):
+    """
+    Mark several emails as unread (written to the server in the background).
+
+    Args:
+        request: Email IDs and mailbox
+
+    Returns:
+        Acknowledgement with the number of pending changes
+    """
+    return await _queue_flag_change(account, request, SEEN, False, "Emails marked as unread")
+
+
+@router.post("/flag", response_model=BulkEmailsResponse, status_code=status.HTTP_202_ACCEPTED)
+async def flag_emails(request: BulkEmailsRequest, account: MailAccount = Depends(get_account)):
+    """
+    Flag (star) several emails (written to the server in the background).
+
+    Args:
+        request: Email IDs and mailbox
+
+    Returns:
+        Acknowledgement with the number of pending changes
+    """
+    return await _queue_flag_change(account, request, FLAGGED, True, "Emails flagged")
+
+
+@router.post("/unflag", response_model=BulkEmailsResponse, status_code=status.HTTP_202_ACCEPTED)
+async def unflag_emails(request: BulkEmailsRequest, account: MailAccount = Depends(get_account)):
+    """
+    Remove the flag from several emails (written to the server in the background).
+
+    Args:
+        request: Email IDs and mailbox
+
+    Returns:
+        Acknowledgement with the number of pending changes
+    """
+    return await _queue_flag_change(account, request, FLAGGED, False, "Emails unflagged")
+
 
 @router.post("/send")
-async def send_email(request: SendEmailRequest):
+async def send_email(request: SendEmailRequest, account: MailAccount = Depends(get_account)):
     """
     Send an email.
 
@@ -175,20 +568,33 @@ async def send_email(request: SendEmailRequest):
         Success message
     """
     try:
-        with SMTPClient(settings) as smtp:
-            success = smtp.send_email(request.draft)
+        success = await account.run_smtp(lambda smtp: smtp.send_email(request.draft))
 
-            if not success:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to send email"
-                )
+        if not success:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to send email"
+            )
 
-            return {
-                "message": "Email sent successfully",
-                "to": request.draft.to_addresses,
-                "subject": request.draft.subject
-            }
+        # Our replies are reply context for later mail to the same people
+        draft = request.draft
+        account.related.add_sent(EmailRecord(
+            id="",
+            message_id="",
+            from_address=account.settings.email_address,
+            to_addresses=list(draft.to_addresses),
+            cc_addresses=list(draft.cc_addresses),
+            subject=draft.subject,
+            body=draft.body,
+            date=datetime.now(timezone.utc),
+            in_reply_to=draft.in_reply_to,
+        ))
+
+        return {
+            "message": "Email sent successfully",
+            "to": request.draft.to_addresses,
+            "subject": request.draft.subject
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,252 @@
+"""
+Backfill the local store with the existing history of a mailbox.
+
+Messages are fetched newest first, many per UID FETCH, parsed across a
+process pool and written to the store (and its search, thread and
+fingerprint indexes) one transaction per chunk. Progress is checkpointed
+by UID after every chunk, so an interrupted run resumes where it stopped;
+a later run also picks up messages that arrived since, and retries those
+that could not be parsed.
+
+Run from the backend directory (the server may keep running):
+
+    python -m app.backfill [--mailbox INBOX] [--account ID] [--chunk 100] [--workers N] [--restart]
+"""
+
+import argparse
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from app.config import Settings, get_settings
+from app.email.imap_client import IMAPClient, parse_email_bytes
+from app.email.records import EmailRecord
+from app.email.store import MailStore
+
+logger = logging.getLogger(__name__)
+
+# Seconds between progress reports
+PROGRESS_INTERVAL = 5.0
+
+
+def parse_chunk(items: list[tuple[int, bytes, bool, bool]]) -> list[EmailRecord]:
+    """Parse raw messages (runs in a worker process); unparseable ones are skipped."""
+    records = []
+    for uid, raw, is_read, is_flagged in items:
+        try:
+            record = parse_email_bytes(str(uid), raw)
+        except Exception as e:
+            logger.error(f"Error parsing email {uid}: {e}")
+            continue
+        record.is_read = is_read
+        record.is_flagged = is_flagged
+        records.append(record)
+    return records
+
+
+@dataclass(slots=True)
+class BackfillStats:
+    """Counters of one backfill run."""
+
+    total: int = 0  # messages to fetch in this run
+    stored: int = 0
+    failed: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Messages stored per second."""
+        return self.stored / self.seconds if self.seconds else 0.0
+
+
+class Backfill:
+    """
+    Copies a mailbox's messages into the local store, resumably.
+
+    The store keeps the contiguous UID range [low, high] already copied.
+    A run first fetches messages above ``high`` (arrived since the last
+    run), oldest first, raising ``high``; then the history below ``low``,
+    newest first, lowering ``low``. Each chunk is written and
+    checkpointed in order, so the range stays contiguous whenever the
+    run stops. Messages of the range that failed to parse are recorded
+    with the checkpoint and fetched again first by the next run.
+
+    The main process fetches and writes while up to ``workers`` processes
+    parse; at most two chunks per worker are in flight.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        store: MailStore,
+        mailbox: str = "INBOX",
+        chunk_size: int = 100,
+        workers: int = 0,
+    ):
+        """Create a backfill (workers=0 uses one per CPU)."""
+        self.settings = settings
+        self.store = store
+        self.mailbox = mailbox
+        self.chunk_size = max(1, chunk_size)
+        self.workers = workers or os.cpu_count() or 1
+        self.stats = BackfillStats()
+
+    def run(self, restart: bool = False) -> BackfillStats:
+        """
+        Copy every message not stored yet.
+
+        Args:
+            restart: Ignore the checkpoint and fetch the whole mailbox again
+
+        Returns:
+            Counters of the run
+        """
+        imap = IMAPClient(self.settings, self.store)
+        started = time.monotonic()
+        try:
+            # Selecting also drops cached data (and the checkpoint) if UIDVALIDITY changed
+            imap.select_mailbox(self.mailbox, readonly=True)
+            if restart:
+                self.store.clear_backfill_range(self.mailbox)
+
+            uids = imap.search_uids()
+            if not uids:
+                logger.info(f"{self.mailbox} is empty")
+                return self.stats
+
+            present = set(uids)
+            skipped = self.store.get_backfill_failures(self.mailbox)
+            self.store.clear_backfill_failures(self.mailbox, [uid for uid in skipped if uid not in present])
+            retry = [uid for uid in skipped if uid in present]
+
+            checkpoint = self.store.get_backfill_range(self.mailbox)
+            low, high = checkpoint or (uids[-1] + 1, uids[-1])
+            newer = [uid for uid in uids if uid > high]
+            older = [uid for uid in reversed(uids) if uid < low]
+            self.stats.total = len(retry) + len(newer) + len(older)
+            logger.info(
+                f"Backfilling {self.stats.total} of {len(uids)} messages in {self.mailbox} "
+                f"({self.workers} parser processes, {self.chunk_size} per fetch)"
+            )
+
+            if not self.stats.total:
+                return self.stats
+
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                state = {"low": low, "high": high}
+                self._copy(imap, pool, retry, state, ascending=None, started=started)
+                self._copy(imap, pool, newer, state, ascending=True, started=started)
+                self._copy(imap, pool, older, state, ascending=False, started=started)
+        finally:
+            imap.disconnect()
+            self.stats.seconds = time.monotonic() - started
+
+        logger.info(
+            f"Backfilled {self.stats.stored} messages from {self.mailbox} in "
+            f"{self.stats.seconds:.1f}s ({self.stats.rate:.0f} messages/s, "
+            f"{self.stats.bytes / 1e6:.1f} MB, {self.stats.failed} failed)"
+        )
+        return self.stats
+
+    def _copy(
+        self,
+        imap: IMAPClient,
+        pool: ProcessPoolExecutor,
+        uids: list[int],
+        state: dict,
+        ascending: Optional[bool],
+        started: float,
+    ) -> None:
+        """
+        Fetch, parse and store UIDs in the given order, checkpointing after each chunk.
+
+        ``ascending`` is None when retrying UIDs the range already covers.
+        """
+        pending: deque[tuple[list[int], list[int], Future]] = deque()
+        last_report = time.monotonic()
+
+        for i in range(0, len(uids), self.chunk_size):
+            chunk = uids[i:i + self.chunk_size]
+            items = imap.fetch_raw(chunk)
+            self.stats.bytes += sum(len(raw) for _, raw, _, _ in items)
+            fetched = [uid for uid, _, _, _ in items]
+            pending.append((chunk, fetched, pool.submit(parse_chunk, items)))
+
+            # Write finished chunks in order; wait only when too many are in flight
+            while pending and (len(pending) > 2 * self.workers or pending[0][2].done()):
+                self._write(*pending.popleft(), state, ascending)
+
+            if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                last_report = time.monotonic()
+                elapsed = last_report - started
+                logger.info(
+                    f"{self.stats.stored}/{self.stats.total} messages stored, "
+                    f"{self.stats.stored / elapsed:.0f} messages/s"
+                )
+
+        while pending:
+            self._write(*pending.popleft(), state, ascending)
+
+    def _write(
+        self, chunk: list[int], fetched: list[int], future: Future, state: dict, ascending: Optional[bool]
+    ) -> None:
+        """Store one parsed chunk and move the checkpoint past it, recording the UIDs that failed."""
+        records = future.result()
+        self.store.add_emails(records, self.mailbox)
+        stored = {int(record.id) for record in records}
+        # UIDs missing from the response were expunged meanwhile and are not failures
+        failed = [uid for uid in fetched if uid not in stored]
+        self.stats.stored += len(records)
+        self.stats.failed += len(failed)
+
+        if ascending is None:
+            self.store.clear_backfill_failures(self.mailbox, [uid for uid in chunk if uid not in failed])
+            return
+        if ascending:
+            state["high"] = max(chunk)
+        else:
+            state["low"] = min(chunk)
+        self.store.set_backfill_range(self.mailbox, state["low"], state["high"], failed)
+
+
+def account_settings(settings: Settings, account_id: str | None) -> Settings:
+    """Settings of the default account, or of one entry in ACCOUNTS."""
+    if not account_id or account_id == settings.default_account_id:
+        return settings
+    for account in settings.accounts:
+        if account.id == account_id:
+            return settings.for_account(account)
+    raise SystemExit(f"Unknown account: {account_id}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mailbox", default="INBOX")
+    parser.add_argument("--account", default=None, help="Account id (default: the default account)")
+    parser.add_argument("--chunk", type=int, default=100, help="Messages per UID FETCH")
+    parser.add_argument("--workers", type=int, default=0, help="Parser processes (default: one per CPU)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    args = parser.parse_args()
+
+    settings = account_settings(get_settings(), args.account)
+    logging.basicConfig(
+        level=getattr(logging, settings.log_level),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    store = MailStore(settings.local_store_path)
+    try:
+        Backfill(settings, store, args.mailbox, args.chunk, args.workers).run(restart=args.restart)
+    except KeyboardInterrupt:
+        logger.info("Interrupted; run the command again to resume")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
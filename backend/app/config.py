@@ -1,10 +1,79 @@
 """Application configuration."""
 
+import re
 from functools import lru_cache
+from pathlib import Path
 from typing import Literal
 
+from pydantic import BaseModel, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# Account ids become part of a file name (the account's store), so only a plain slug is allowed
+ACCOUNT_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+
+class AccountConfig(BaseModel):
+    """An additional mailbox served alongside the default account."""
+
+    id: str
+    email_address: str
+    email_password: str
+    imap_server: str = "imap.gmail.com"
+    imap_port: int = 993
+    smtp_server: str = "smtp.gmail.com"
+    smtp_port: int = 587
+    max_connections: int | None = None  # defaults to max_connections_per_account
+    check_interval: int | None = None  # defaults to check_interval
+
+    @field_validator("id")
+    @classmethod
+    def check_id(cls, value: str) -> str:
+        """Reject ids that are not safe inside a file name (path separators, "..")."""
+        if not ACCOUNT_ID_RE.match(value):
+            raise ValueError(
+                f"Invalid account id {value!r}: use up to 64 letters, digits, '-' and '_', "
+                "starting with a letter or digit"
+            )
+        return value
+
+
+class ModelProfile(BaseModel):
+    """LLM settings for one agent operation; unset fields use the llm_* defaults."""
+
+    model: str | None = None
+    temperature: float | None = None
+    max_tokens: int | None = None
+    timeout: float | None = None  # seconds per request
+    fallback_model: str | None = None  # used when the model times out or is overloaded
+    deadline: float | None = None  # seconds for the whole operation, fallback and hedging included
+    hedge: bool | None = None  # re-send a request that runs past the model's p95 latency
+
+
+class ModelPrice(BaseModel):
+    """List price of a model in USD per million tokens, for usage cost estimates."""
+
+    input: float
+    output: float
+
+
+# Agent operations that can be routed to their own model profile
+MODEL_OPERATIONS = ("summarize", "reply", "refine", "chat", "digest")
+
+# Built-in overrides: summaries are one short tool call and should be deterministic
+DEFAULT_MODEL_PROFILES = {
+    "summarize": ModelProfile(temperature=0.0, max_tokens=400, timeout=30.0, deadline=45.0),
+    "digest": ModelProfile(temperature=0.2, max_tokens=2048, deadline=180.0),
+}
+
+# Built-in prices (USD per million tokens); LLM_PRICES adds or overrides models
+DEFAULT_MODEL_PRICES = {
+    "claude-3-haiku-20240307": ModelPrice(input=0.25, output=1.25),
+    "claude-3-5-haiku-20241022": ModelPrice(input=0.80, output=4.00),
+    "claude-3-5-haiku-latest": ModelPrice(input=0.80, output=4.00),
+    "claude-3-5-sonnet-20241022": ModelPrice(input=3.00, output=15.00),
+    "claude-3-opus-20240229": ModelPrice(input=15.00, output=75.00),
+}
+
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
@@ -30,6 +99,23 @@ class Settings(BaseSettings):
     llm_model: str = "claude-3-haiku-20240307"
     llm_temperature: float = 0.7
     llm_max_tokens: int = 4096
+    llm_timeout: float = 60.0  # seconds per request
+    llm_fallback_model: str | None = None  # secondary model when the primary is slow or overloaded
+    llm_deadline: float = 90.0  # seconds per agent operation (requests may ask for less)
+    llm_hedging: bool = False  # duplicate requests that run past the p95 latency (costs tokens)
+    llm_hedge_min_delay: float = 2.0  # never hedge sooner than this many seconds
+    llm_circuit_failure_rate: float = 0.5  # share of failed recent calls that opens a model's circuit
+    llm_circuit_cooldown: float = 30.0  # seconds an open circuit fails fast before a trial call
+    model_profiles: dict[str, ModelProfile] = {}  # JSON in MODEL_PROFILES, keyed by operation
+    thread_context_max_chars: int = 4000  # earlier thread messages included in reply prompts
+    related_context_max_tokens: int = 300  # related-email snippets in reply prompts, 0 = off
+    related_context_count: int = 3  # at most this many related emails per reply
+    related_index_max_messages: int = 5000  # newest cached messages in the similarity index
+
+    # LLM Usage Accounting
+    llm_usage_path: str = "data/email_agent.usage.db"  # token totals per day, operation and model
+    llm_prices: dict[str, ModelPrice] = {}  # JSON in LLM_PRICES, keyed by model, USD per million tokens
+    llm_daily_token_budget: int = 0  # all operations; once reached, background work goes heuristic (0 = unlimited)
 
     # Email Configuration
     email_address: str
@@ -39,12 +125,134 @@ class Settings(BaseSettings):
     smtp_server: str = "smtp.gmail.com"
     smtp_port: int = 587
     check_interval: int = 60  # seconds
+    imap_compression: bool = True  # COMPRESS=DEFLATE when the server offers it
+
+    # Background Summarization
+    summary_worker_enabled: bool = True
+    summary_worker_concurrency: int = 2
+    summary_daily_token_budget: int = 200_000  # summary tokens per day (all summaries, measured), 0 = unlimited
+    duplicate_max_distance: int = 3  # SimHash bits for reusing a near-duplicate's summary, -1 = off
+    duplicate_window_days: int = 14  # how far back near-duplicates are looked up
+
+    # Inbox Digest
+    digest_max_emails: int = 500  # newest messages of the range included in a digest
+    digest_level_token_budget: int = 6000  # estimated prompt tokens per reduce call
+    digest_max_llm_calls: int = 8  # model calls per digest, overview included
+
+    # Batch Endpoint
+    batch_max_operations: int = 50  # sub-operations per POST /api/batch
+    batch_concurrency: int = 4  # summaries and replies of one batch generated at once
+
+    # Speculative Reply Drafts (opt-in)
+    speculative_drafts_enabled: bool = False
+    speculative_draft_tone: str = "professional"
+    speculative_daily_token_budget: int = 100_000  # reply tokens per day (all replies, measured), 0 = unlimited
+
+    # Local Store Configuration
+    local_store_path: str = "data/email_agent.db"
+
+    # Multi-worker Deployment
+    workers: int = 1  # uvicorn worker processes (ignored with DEBUG=true reload)
+    leader_lock_path: str = "data/email_agent.leader.lock"  # elects the worker running background jobs
+    leader_retry_interval: float = 15.0  # seconds between takeover attempts by standby workers
+    refine_sessions_path: str = "data/email_agent.sessions.db"  # WebSocket refine sessions, shared by workers
+
+    # Multi-account Configuration
+    default_account_id: str = "default"
+    accounts: list[AccountConfig] = []  # JSON list in the ACCOUNTS env var
+    max_connections_per_account: int = 2
+    flag_flush_delay: float = 2.0  # seconds bulk flag changes are coalesced before UID STORE
+    watcher_enabled: bool = True
 
     # LangSmith (optional)
     langchain_tracing_v2: bool = False
     langchain_api_key: str | None = None
     langchain_project: str = "email-agent"
 
+    @field_validator("model_profiles")
+    @classmethod
+    def check_model_operations(cls, profiles: dict[str, ModelProfile]) -> dict[str, ModelProfile]:
+        """Reject profiles for operations the agent does not have."""
+        unknown = set(profiles) - set(MODEL_OPERATIONS)
+        if unknown:
+            raise ValueError(
+                f"Unknown model profile operations: {', '.join(sorted(unknown))} "
+                f"(expected {', '.join(MODEL_OPERATIONS)})"
+            )
+        return profiles
+
+    @model_validator(mode="after")
+    def check_account_ids(self) -> "Settings":
+        """Reject account ids that are taken or whose store would be another data file."""
+        taken = {self.default_account_id.casefold()}
+        # Compared case-insensitively, for case-insensitive file systems
+        reserved = {
+            str(Path(path).resolve()).casefold(): name
+            for name, path in (
+                ("LOCAL_STORE_PATH", self.local_store_path),
+                ("LLM_USAGE_PATH", self.llm_usage_path),
+                ("LEADER_LOCK_PATH", self.leader_lock_path),
+                ("REFINE_SESSIONS_PATH", self.refine_sessions_path),
+            )
+        }
+        for account in self.accounts:
+            if account.id.casefold() in taken:
+                raise ValueError(f"Duplicate account id: {account.id}")
+            taken.add(account.id.casefold())
+
+            store_path = str(Path(self.account_store_path(account.id)).resolve()).casefold()
+            if store_path in reserved:
+                raise ValueError(
+                    f"Account id {account.id!r} is reserved: its store would be {reserved[store_path]}"
+                )
+        return self
+
+    def model_profile(self, operation: str) -> ModelProfile:
+        """Resolve the complete model profile for an agent operation."""
+        resolved = ModelProfile(
+            model=self.llm_model,
+            temperature=self.llm_temperature,
+            max_tokens=self.llm_max_tokens,
+            timeout=self.llm_timeout,
+            fallback_model=self.llm_fallback_model,
+            deadline=self.llm_deadline,
+            hedge=self.llm_hedging,
+        ).model_dump()
+
+        for override in (DEFAULT_MODEL_PROFILES.get(operation), self.model_profiles.get(operation)):
+            if override:
+                resolved.update(override.model_dump(exclude_unset=True))
+        return ModelProfile(**resolved)
+
+    def model_prices(self) -> dict[str, ModelPrice]:
+        """Prices by model: the built-in table with LLM_PRICES applied."""
+        return {**DEFAULT_MODEL_PRICES, **self.llm_prices}
+
+    def account_store_path(self, account_id: str) -> str:
+        """Path of an additional account's own database file, next to the default one."""
+        store_path = Path(self.local_store_path)
+        return str(store_path.with_name(f"{store_path.stem}.{account_id}{store_path.suffix}"))
+
+    def for_account(self, account: AccountConfig) -> "Settings":
+        """Return a copy of these settings with one account's mailbox details."""
+        return self.model_copy(
+            update={
+                "email_address": account.email_address,
+                "email_password": account.email_password,
+                "imap_server": account.imap_server,
+                "imap_port": account.imap_port,
+                "smtp_server": account.smtp_server,
+                "smtp_port": account.smtp_port,
+                "check_interval": account.check_interval or self.check_interval,
+                "max_connections_per_account": (
+                    account.max_connections or self.max_connections_per_account
+                ),
+                # Each account gets its own database file
+                "local_store_path": self.account_store_path(account.id),
+                "accounts": [],
+            }
+        )
+
 
 @lru_cache
 def get_settings() -> Settings:
@@ -0,0 +1,143 @@
+"""Mail accounts served by the backend and their per-account resources."""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Optional, TypeVar
+
+from app.config import Settings, get_settings
+from app.email.flag_queue import FlagQueue
+from app.email.imap_client import IMAPClient
+from app.email.pool import ConnectionPool
+from app.email.priority_index import PriorityIndex
+from app.email.records import EmailRecord
+from app.email.related_index import RelatedIndex
+from app.email.smtp_client import SMTPClient
+from app.email.store import MailStore
+from app.email.watcher import MailboxWatcher
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class MailAccount:
+    """
+    One mailbox with its own store, connection pools, executor and watcher.
+
+    All blocking IMAP/SMTP work for the account runs on the account's own
+    thread pool, sized to its connection limit, so a slow provider only
+    queues its own requests and never blocks the event loop or other
+    accounts.
+    """
+
+    def __init__(self, account_id: str, settings: Settings):
+        """Create the account's resources (connections are opened lazily)."""
+        self.id = account_id
+        self.settings = settings
+        self.store = MailStore(settings.local_store_path)
+
+        size = settings.max_connections_per_account
+        self.imap_pool: ConnectionPool[IMAPClient] = ConnectionPool(
+            lambda: IMAPClient(settings, self.store), size, name=f"imap-{account_id}"
+        )
+        self.smtp_pool: ConnectionPool[SMTPClient] = ConnectionPool(
+            lambda: SMTPClient(settings), 1, name=f"smtp-{account_id}"
+        )
+        # One extra worker so sending mail never waits behind a full IMAP pool
+        self.executor = ThreadPoolExecutor(
+            max_workers=size + 1, thread_name_prefix=f"account-{account_id}"
+        )
+        self.watcher = MailboxWatcher(self)
+        self.flag_queue = FlagQueue(self, settings.flag_flush_delay)
+        self.related = RelatedIndex(
+            self.store, settings.email_address, settings.related_index_max_messages
+        )
+        self.priority = PriorityIndex(self.store, settings.email_address)
+
+    def reply_context(self, email: EmailRecord) -> tuple[list[EmailRecord], list[EmailRecord]]:
+        """
+        Context for replying to an email, read from the local indexes (blocking).
+
+        Returns:
+            The cached messages of its thread, oldest first, and related
+            mail from other conversations, most useful first (none when
+            RELATED_CONTEXT_MAX_TOKENS is 0)
+        """
+        thread = self.store.get_thread(email).messages
+        related = []
+        if self.settings.related_context_max_tokens > 0:
+            related = self.related.related_emails(
+                email,
+                k=self.settings.related_context_count,
+                exclude={m.message_id.strip() for m in thread},
+            )
+        return thread, related
+
+    async def run_imap(self, fn: Callable[[IMAPClient], T]) -> T:
+        """Run ``fn`` with a pooled IMAP client on the account's executor."""
+        def call() -> T:
+            with self.imap_pool.connection() as imap:
+                return fn(imap)
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+    async def run_smtp(self, fn: Callable[[SMTPClient], T]) -> T:
+        """Run ``fn`` with a pooled SMTP client on the account's executor."""
+        def call() -> T:
+            with self.smtp_pool.connection() as smtp:
+                return fn(smtp)
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+    def close(self) -> None:
+        """Release connections, worker threads and the store."""
+        self.imap_pool.close()
+        self.smtp_pool.close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.store.close()
+
+
+class AccountRegistry:
+    """All configured accounts, keyed by account id."""
+
+    def __init__(self, settings: Settings):
+        """Build the default account plus every entry in ``settings.accounts``."""
+        self.default_id = settings.default_account_id
+        self._accounts: dict[str, MailAccount] = {
+            self.default_id: MailAccount(self.default_id, settings)
+        }
+
+        for config in settings.accounts:
+            if config.id in self._accounts:
+                raise ValueError(f"Duplicate account id: {config.id}")
+            self._accounts[config.id] = MailAccount(config.id, settings.for_account(config))
+
+        logger.info(f"Configured accounts: {', '.join(self._accounts)}")
+
+    def get(self, account_id: Optional[str] = None) -> MailAccount:
+        """Return an account by id (the default account when id is None)."""
+        return self._accounts[account_id or self.default_id]
+
+    def all(self) -> list[MailAccount]:
+        """Return every configured account."""
+        return list(self._accounts.values())
+
+    def start(self) -> None:
+        """Start the mailbox watchers."""
+        for account in self._accounts.values():
+            account.watcher.start()
+
+    async def stop(self) -> None:
+        """Stop the watchers and release every account's resources."""
+        for account in self._accounts.values():
+            await account.watcher.stop()
+            await account.flag_queue.close()
+            account.close()
+
+
+@lru_cache
+def get_accounts() -> AccountRegistry:
+    """Get the shared account registry."""
+    return AccountRegistry(get_settings())
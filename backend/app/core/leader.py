@@ -0,0 +1,87 @@
+"""Leader election between worker processes sharing one data directory."""
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import IO, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """
+    Exclusive, non-blocking file lock held by exactly one worker process.
+
+    The operating system releases the lock when its holder exits (even on
+    a crash), so a waiting worker takes over on its next attempt. Only the
+    leader runs the mailbox watchers and background workers; the others
+    serve API requests from the shared store.
+    """
+
+    def __init__(self, path: str):
+        """Create a lock on the given file (created if missing)."""
+        self.path = path
+        self._file: Optional[IO] = None
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this process holds the lock."""
+        return self._file is not None
+
+    def try_acquire(self) -> bool:
+        """Take the lock if no other process holds it."""
+        if self._file:
+            return True
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.path, "a+")
+        try:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return False
+
+        # Record the holder for operators; the lock itself is what counts
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{os.getpid()}\n")
+        lock_file.flush()
+
+        self._file = lock_file
+        return True
+
+    async def wait_for_leadership(self, interval: float) -> None:
+        """Retry every ``interval`` seconds until this process becomes the leader."""
+        logged = False
+        while not self.try_acquire():
+            if not logged:
+                logger.info(f"Another worker is the leader, standing by (pid {os.getpid()})")
+                logged = True
+            await asyncio.sleep(interval)
+        logger.info(f"Worker {os.getpid()} is the leader")
+
+    def release(self) -> None:
+        """Give up leadership."""
+        if not self._file:
+            return
+
+        try:
+            if fcntl:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
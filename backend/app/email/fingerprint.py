@@ -0,0 +1,99 @@
+"""SimHash fingerprints for spotting near-duplicate messages."""
+
+import hashlib
+import re
+from typing import Iterable
+
+# Fingerprint width and the bands used by the locality-sensitive index:
+# two fingerprints within MAX_BANDED_DISTANCE bits of each other agree
+# exactly on at least one band
+FINGERPRINT_BITS = 64
+BANDS = 4
+BAND_BITS = FINGERPRINT_BITS // BANDS
+MAX_BANDED_DISTANCE = BANDS - 1
+
+# Only the start of a message is fingerprinted; mass mail differs early if at all
+MAX_FINGERPRINT_CHARS = 2000
+SHINGLE_WORDS = 3
+
+_URL_RE = re.compile(r"https?://\S+|www\.\S+", re.IGNORECASE)
+_DIGITS_RE = re.compile(r"\d+")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _shingles(text: str) -> set[str]:
+    """Word n-grams of normalized text (numbers and links blanked out)."""
+    text = _URL_RE.sub(" ", text[:MAX_FINGERPRINT_CHARS].lower())
+    words = _WORD_RE.findall(_DIGITS_RE.sub("0", text))
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash of a text.
+
+    Counters, dates, ticket numbers and links are normalized away, so
+    alert storms and CI notifications that differ only in those land a
+    few bits apart. Returns 0 for text without words.
+    """
+    shingles = _shingles(text)
+    if not shingles:
+        return 0
+
+    # Shingle hashes as one string of bits; column i is every 64th character,
+    # so the per-bit vote needs no Python loop per shingle
+    bits = "".join(
+        format(int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big"), "064b")
+        for s in shingles
+    )
+    threshold = len(shingles) / 2
+    value = 0
+    for column in range(FINGERPRINT_BITS):
+        value = (value << 1) | (bits[column::FINGERPRINT_BITS].count("1") > threshold)
+    return value
+
+
+def email_fingerprint(subject: str, body: str) -> int:
+    """Fingerprint of a message's subject and text body."""
+    return simhash(f"{subject}\n{body}")
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two fingerprints."""
+    return (a ^ b).bit_count()
+
+
+def bands(fingerprint: int) -> list[int]:
+    """Split a fingerprint into the index's bands."""
+    mask = (1 << BAND_BITS) - 1
+    return [(fingerprint >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+
+def group_near_duplicates(
+    items: Iterable[tuple[str, str, int]], max_distance: int
+) -> list[list[str]]:
+    """
+    Group ids whose fingerprints are near-duplicates from the same sender.
+
+    Args:
+        items: (id, sender, fingerprint) tuples, in display order
+        max_distance: Largest Hamming distance counted as a duplicate
+
+    Returns:
+        Groups of two or more ids, each in input order
+    """
+    groups: list[list[tuple[str, str, int]]] = []
+    for item in items:
+        _, sender, fingerprint = item
+        if fingerprint:
+            for group in groups:
+                if any(
+                    s == sender and hamming(f, fingerprint) <= max_distance for _, s, f in group
+                ):
+                    group.append(item)
+                    break
+            else:
+                groups.append([item])
+    return [[i for i, _, _ in group] for group in groups if len(group) > 1]
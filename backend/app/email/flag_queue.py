@@ -0,0 +1,217 @@
+"""Write-behind queue that coalesces IMAP flag changes."""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from app.core.accounts import MailAccount
+
+logger = logging.getLogger(__name__)
+
+SEEN = "\\Seen"
+FLAGGED = "\\Flagged"
+
+# Cached email field mirroring each flag
+FLAG_FIELDS = {SEEN: "is_read", FLAGGED: "is_flagged"}
+
+# Writes of a change attempted before it is given up, and the longest wait between them
+MAX_ATTEMPTS = 5
+MAX_RETRY_DELAY = 300.0
+
+
+@dataclass(slots=True)
+class _Change:
+    """The latest unsaved change of one flag on one message."""
+
+    add: bool
+    original: Optional[bool]  # cached value before the first unsaved change, if known
+    attempts: int = 0
+
+
+class FlagQueue:
+    """
+    Buffers flag changes for an account and writes them in bulk.
+
+    Changes are applied to the local store immediately (so listings
+    reflect them at once) and sent to the server ``delay`` seconds after
+    the first pending change. Only the latest change per message and flag
+    is kept, and each flush sends at most one UID STORE per mailbox, flag
+    and direction over a compressed UID set.
+
+    Failed writes are re-queued unless a newer change for the same message
+    superseded them, with the wait before the next flush doubling after
+    each failing one. A change that failed MAX_ATTEMPTS times, or whose
+    mailbox does not exist, is dropped and its cached flag restored to
+    the value it had before.
+    """
+
+    def __init__(self, account: "MailAccount", delay: float):
+        """Create an empty queue for the given account."""
+        self.account = account
+        self.delay = delay
+        # (mailbox, flag) -> {uid: change}
+        self._pending: dict[tuple[str, str], dict[int, _Change]] = {}
+        self._flushing: dict[tuple[str, str], dict[int, _Change]] = {}
+        self._failed_flushes = 0
+        self._timer: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def enqueue(self, mailbox: str, uids: list[int], flag: str, add: bool) -> None:
+        """Record a flag change for later write-back."""
+        if not uids:
+            return
+
+        key = (mailbox, flag)
+        changes = self._pending.setdefault(key, {})
+        field = FLAG_FIELDS.get(flag)
+        unsaved = {
+            uid: change.original
+            for source in (self._flushing.get(key, {}), changes)
+            for uid, change in source.items()
+        }
+        cached = {}
+        if field and any(uid not in unsaved for uid in uids):
+            try:
+                cached = self.account.store.cached_flags(mailbox, uids, field)
+            except Exception as e:
+                logger.error(f"Error reading cached flags: {e}")
+
+        for uid in uids:
+            original = unsaved[uid] if uid in unsaved else cached.get(uid)
+            changes[uid] = _Change(add, original)
+
+        if field:
+            self._update_cache(mailbox, uids, field, add)
+
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    @property
+    def pending_count(self) -> int:
+        """Number of message flag changes not yet written to the server."""
+        return sum(len(changes) for changes in self._pending.values())
+
+    def overlay(self, mailbox: str, emails: list) -> None:
+        """Apply pending changes to emails or headers just read from the server."""
+        seen = self._pending.get((mailbox, SEEN), {})
+        flagged = self._pending.get((mailbox, FLAGGED), {})
+        if not seen and not flagged:
+            return
+
+        for email in emails:
+            uid = int(email.id)
+            if uid in seen:
+                email.is_read = seen[uid].add
+            if uid in flagged:
+                email.is_flagged = flagged[uid].add
+
+    async def _flush_later(self) -> None:
+        """Wait for more changes to accumulate (longer after failed flushes), then flush."""
+        await asyncio.sleep(min(self.delay * 2 ** self._failed_flushes, MAX_RETRY_DELAY))
+        self._timer = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write every pending change to the server now."""
+        async with self._flush_lock:
+            self._flushing, self._pending = self._pending, {}
+            failed = False
+
+            for (mailbox, flag), changes in self._flushing.items():
+                for add in (True, False):
+                    uids = [uid for uid, change in changes.items() if change.add is add]
+                    if not uids:
+                        continue
+
+                    try:
+                        ok = await self.account.run_imap(
+                            lambda imap: imap.store_flags(mailbox, uids, flag, add)
+                        )
+                    except ValueError as e:
+                        # The mailbox does not exist: retrying cannot help
+                        logger.error(f"Dropping flag changes for {mailbox}: {e}")
+                        self._drop(mailbox, flag, uids, changes)
+                        continue
+                    except Exception as e:
+                        logger.error(f"Error flushing flag changes for {mailbox}: {e}")
+                        ok = False
+
+                    if ok:
+                        self._written(mailbox, flag, uids, add)
+                    else:
+                        failed = True
+                        self._requeue(mailbox, flag, uids, changes)
+
+            self._flushing = {}
+            self._failed_flushes = self._failed_flushes + 1 if failed else 0
+            if self._pending and (self._timer is None or self._timer.done()):
+                self._timer = asyncio.create_task(self._flush_later())
+
+    def _written(self, mailbox: str, flag: str, uids: list[int], add: bool) -> None:
+        """The server now has ``add``: newer changes to the same messages would revert to it."""
+        newer = self._pending.get((mailbox, flag), {})
+        for uid in uids:
+            if uid in newer:
+                newer[uid].original = add
+
+    def _requeue(self, mailbox: str, flag: str, uids: list[int], changes: dict[int, _Change]) -> None:
+        """Put failed changes back without overriding newer ones, dropping those out of attempts."""
+        pending = self._pending.setdefault((mailbox, flag), {})
+        exhausted = []
+        for uid in uids:
+            if uid in pending:
+                continue
+            change = changes[uid]
+            change.attempts += 1
+            if change.attempts >= MAX_ATTEMPTS:
+                exhausted.append(uid)
+            else:
+                pending[uid] = change
+
+        if exhausted:
+            logger.error(
+                f"Giving up on {len(exhausted)} flag changes in {mailbox} "
+                f"after {MAX_ATTEMPTS} failed attempts"
+            )
+            self._drop(mailbox, flag, exhausted, changes)
+
+    def _drop(self, mailbox: str, flag: str, uids: list[int], changes: dict[int, _Change]) -> None:
+        """Forget changes the server refused, restoring their cached flags unless newer changes exist."""
+        field = FLAG_FIELDS.get(flag)
+        if not field:
+            return
+
+        pending = self._pending.get((mailbox, flag), {})
+        restore: dict[bool, list[int]] = {True: [], False: []}
+        for uid in uids:
+            original = changes[uid].original
+            if uid not in pending and original is not None:
+                restore[original].append(uid)
+        for value, restored in restore.items():
+            if restored:
+                self._update_cache(mailbox, restored, field, value)
+
+    def _update_cache(self, mailbox: str, uids: list[int], field: str, value: bool) -> None:
+        """Apply a flag value to the cached emails and the priority index."""
+        try:
+            self.account.store.update_flags(mailbox, uids, **{field: value})
+            self.account.priority.update_flags(mailbox, uids, **{field: value})
+        except Exception as e:
+            logger.error(f"Error updating cached flags: {e}")
+
+    async def close(self) -> None:
+        """Cancel the timer and make a final attempt to flush pending changes."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._pending:
+            await self.flush()
+
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            logger.error(f"Dropping {self.pending_count} unsaved flag changes at shutdown")
@@ -0,0 +1,167 @@
+"""Plain-text extraction from HTML email bodies."""
+
+import re
+from html.parser import HTMLParser
+from typing import Optional
+
+# Input beyond this is ignored; output stops growing at MAX_TEXT_CHARS
+MAX_HTML_CHARS = 2_000_000
+MAX_TEXT_CHARS = 20_000
+
+# HTML is fed in chunks so conversion can stop once enough text is collected
+_CHUNK_CHARS = 64_000
+
+# Elements whose content is never shown as text
+_SKIPPED_TAGS = {"head", "script", "style", "noscript", "template", "svg", "title", "object", "iframe"}
+
+_BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "center", "dd", "div", "dl", "dt",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hr", "main", "nav", "ol", "p", "pre", "section", "table", "ul",
+}
+
+_VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+    "param", "source", "track", "wbr",
+}
+
+_HIDDEN_STYLE_RE = re.compile(
+    r"display\s*:\s*none|visibility\s*:\s*hidden|opacity\s*:\s*0(?![.\d])", re.IGNORECASE
+)
+_SPACES_RE = re.compile(r"[ \t\r\f\v\xa0\u200b\u200c\u200d\u034f\ufeff]+")
+_BLANK_LINES_RE = re.compile(r"\n[ \t]*(?:\n[ \t]*)+")
+
+
+class _TextExtractor(HTMLParser):
+    """Collects visible text, turning block structure into line breaks."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self.length = 0
+        self._skip_tag: Optional[str] = None
+        self._skip_depth = 0
+        self._pre_depth = 0
+        self._row_has_text = False
+        self._cell_pending = False
+
+    def _write(self, text: str) -> None:
+        self.parts.append(text)
+        self.length += len(text)
+
+    def _break(self, paragraph: bool = False) -> None:
+        self._write("\n\n" if paragraph else "\n")
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if self._skip_tag:
+            if tag == self._skip_tag:
+                self._skip_depth += 1
+            return
+
+        attributes = dict(attrs)
+        hidden = "hidden" in attributes or (
+            attributes.get("aria-hidden") == "true" and tag not in _VOID_TAGS
+        ) or _HIDDEN_STYLE_RE.search(attributes.get("style") or "")
+        if tag in _SKIPPED_TAGS or (hidden and tag not in _VOID_TAGS):
+            self._skip_tag, self._skip_depth = tag, 1
+            return
+
+        if tag == "br":
+            self._break()
+        elif tag == "li":
+            self._write("\n- ")
+        elif tag == "tr":
+            self._break()
+            self._row_has_text = False
+            self._cell_pending = False
+        elif tag in ("td", "th"):
+            # Separate cells only when both sides have text, so spacer
+            # columns of layout tables leave no trace
+            self._cell_pending = self._row_has_text
+        elif tag == "img":
+            self._image(attributes)
+        elif tag in _BLOCK_TAGS:
+            self._break(paragraph=tag not in ("div", "dd", "dt", "center"))
+            if tag == "pre":
+                self._pre_depth += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._skip_tag:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+                if not self._skip_depth:
+                    self._skip_tag = None
+            return
+
+        if tag == "pre" and self._pre_depth:
+            self._pre_depth -= 1
+        if tag in ("tr", "table"):
+            self._row_has_text = False
+            self._cell_pending = False
+        if tag in _BLOCK_TAGS:
+            self._break(paragraph=tag in ("p", "table", "blockquote") or tag.startswith("h"))
+
+    def handle_data(self, data: str) -> None:
+        if self._skip_tag:
+            return
+
+        if not self._pre_depth:
+            data = _SPACES_RE.sub(" ", data.replace("\n", " "))
+            if not data.strip():
+                if data and self.parts and not self.parts[-1].endswith((" ", "\n")):
+                    self._write(" ")
+                return
+
+        if self._cell_pending:
+            self._write(" | ")
+            self._cell_pending = False
+        self._row_has_text = True
+        self._write(data)
+
+    def _image(self, attributes: dict) -> None:
+        """Keep the alt text of real images; tracking pixels and spacers vanish."""
+        alt = (attributes.get("alt") or "").strip()
+        if not alt:
+            return
+        for size in (attributes.get("width"), attributes.get("height")):
+            if size and size.strip().rstrip("px").isdigit() and int(size.strip().rstrip("px")) <= 2:
+                return
+        self.handle_data(f" {alt} ")
+
+
+def html_to_text(html: str, max_chars: int = MAX_TEXT_CHARS) -> str:
+    """
+    Convert an HTML email body to readable plain text.
+
+    Scripts, styles, hidden elements (preheaders and the like) and
+    tracking pixels are dropped; links keep only their text; table rows
+    become lines with " | " between non-empty cells, so layout tables
+    collapse into plain paragraphs. Work is bounded: at most
+    ``MAX_HTML_CHARS`` of input are parsed, and parsing stops once
+    ``max_chars`` of text have been collected.
+
+    Args:
+        html: HTML source
+        max_chars: Maximum length of the returned text
+
+    Returns:
+        Plain text with collapsed whitespace
+    """
+    parser = _TextExtractor()
+    html = html[:MAX_HTML_CHARS]
+    try:
+        for start in range(0, len(html), _CHUNK_CHARS):
+            parser.feed(html[start:start + _CHUNK_CHARS])
+            if parser.length > max_chars * 2:
+                break
+        parser.close()
+    except Exception:
+        # Malformed markup: keep whatever was extracted so far
+        pass
+
+    lines = (line.strip() for line in "".join(parser.parts).split("\n"))
+    text = _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+    if len(text) > max_chars:
+        text = text[:max_chars].rsplit(" ", 1)[0].rstrip() + "..."
+    return text
@@ -1,26 +1,322 @@
 """IMAP client for reading emails."""
 
+import base64
 import email
 import imaplib
+import json
 import logging
-from datetime import datetime
+import re
+from datetime import date, datetime, timezone
 from email.header import decode_header
 from email.utils import parsedate_to_datetime
-from typing import Optional
+from typing import Iterator, Literal, Optional
 
 from app.config import Settings
-from app.email.models import Email, EmailAttachment
+from app.email.fingerprint import email_fingerprint
+from app.email.html_text import html_to_text
+from app.email.imap_transport import (
+    DeflateReader,
+    ServerCapabilities,
+    enable_compression,
+    negotiate_capabilities,
+    stream_literals,
+)
+from app.email.mime_stream import MimeStreamParser
+from app.email.models import EmailHeader, EmailPage, MailboxInfo
+from app.email.records import AttachmentRecord, EmailRecord, as_utc
+from app.email.store import MailStore
 
 logger = logging.getLogger(__name__)
 
 
+def decode_str(s: str) -> str:
+    """Decode email header string."""
+    if not s:
+        return ""
+
+    decoded_parts = decode_header(s)
+    result = []
+
+    for content, encoding in decoded_parts:
+        if isinstance(content, bytes):
+            result.append(content.decode(encoding or "utf-8", errors="replace"))
+        else:
+            result.append(str(content))
+
+    return "".join(result)
+
+
+def extract_address(value: str) -> str:
+    """Extract just the email address from "Name <email>"."""
+    if "<" in value and ">" in value:
+        return value.split("<")[1].split(">")[0].strip()
+    return value.strip()
+
+
+# Header fields fetched for mailbox listings
+HEADER_FIELDS = "FROM SUBJECT DATE MESSAGE-ID IN-REPLY-TO"
+
+_MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+_LIST_RE = re.compile(rb'\((?P<flags>[^)]*)\) (?P<delim>"[^"]*"|NIL) (?P<name>.+)$')
+_STATUS_ITEM_RE = re.compile(rb"(MESSAGES|UNSEEN|UIDNEXT|UIDVALIDITY) (\d+)")
+_FETCH_START_RE = re.compile(rb"\d+ \(")
+_FETCH_UID_RE = re.compile(rb"UID (\d+)")
+_FETCH_FLAGS_RE = re.compile(rb"FLAGS \(([^)]*)\)")
+_FETCH_SIZE_RE = re.compile(rb"RFC822\.SIZE (\d+)")
+_ESEARCH_ALL_RE = re.compile(rb"\bALL ([\d:,]+)")
+
+
+def quote_mailbox(mailbox: str) -> str:
+    """Quote a mailbox name for use as an IMAP astring."""
+    escaped = mailbox.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def imap_date(value: date) -> str:
+    """Format a date for IMAP SEARCH (e.g. 01-Jan-2026), independent of locale."""
+    return f"{value.day:02d}-{_MONTHS[value.month - 1]}-{value.year}"
+
+
+def compress_uid_set(uids) -> str:
+    """Render UIDs as a compact IMAP sequence set, e.g. [1, 2, 3, 7] -> "1:3,7"."""
+    ordered = sorted(set(int(uid) for uid in uids))
+    ranges = []
+    start = prev = None
+
+    for uid in ordered:
+        if start is None:
+            start = prev = uid
+        elif uid == prev + 1:
+            prev = uid
+        else:
+            ranges.append(f"{start}:{prev}" if prev != start else str(start))
+            start = prev = uid
+
+    if start is not None:
+        ranges.append(f"{start}:{prev}" if prev != start else str(start))
+    return ",".join(ranges)
+
+
+def expand_uid_set(uid_set: str) -> list[int]:
+    """Expand an IMAP sequence set of UIDs, e.g. "1:3,7" -> [1, 2, 3, 7]."""
+    uids: list[int] = []
+    for part in uid_set.split(","):
+        if ":" in part:
+            start, end = sorted(int(n) for n in part.split(":"))
+            uids.extend(range(start, end + 1))
+        elif part:
+            uids.append(int(part))
+    return uids
+
+
+def encode_cursor(mailbox: str, uidvalidity: int, uid: int, order: str) -> str:
+    """Encode listing position into an opaque cursor string."""
+    payload = json.dumps({"m": mailbox, "v": uidvalidity, "u": uid, "o": order})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a cursor produced by encode_cursor. Raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return {"m": str(data["m"]), "v": int(data["v"]), "u": int(data["u"]), "o": str(data["o"])}
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def iter_fetch_items(data: list) -> Iterator[tuple[bytes, Optional[bytes]]]:
+    """
+    Yield (metadata, literal) pairs from an imaplib FETCH response.
+
+    Metadata that some servers send after the literal (e.g. FLAGS) is
+    folded into the metadata of the item it belongs to.
+    """
+    meta: Optional[bytes] = None
+    literal: Optional[bytes] = None
+
+    for part in data:
+        if isinstance(part, tuple):
+            if meta is not None:
+                yield meta, literal
+            meta, literal = part[0], part[1]
+        elif isinstance(part, bytes):
+            if meta is not None and literal is not None and not _FETCH_START_RE.match(part):
+                # Trailing ")" or " FLAGS (...))" belonging to the previous literal
+                meta += part
+                yield meta, literal
+                meta, literal = None, None
+            else:
+                if meta is not None:
+                    yield meta, literal
+                meta, literal = part, None
+
+    if meta is not None:
+        yield meta, literal
+
+
+def parse_date(date_str: Optional[str]) -> datetime:
+    """
+    Parse a Date header, falling back to now when missing or malformed.
+
+    The result is always timezone-aware: a date without a usable offset
+    (e.g. ``-0000``) is taken as UTC, so any two message dates compare.
+    """
+    try:
+        return as_utc(parsedate_to_datetime(date_str)) if date_str else datetime.now(timezone.utc)
+    except Exception:
+        return datetime.now(timezone.utc)
+
+
+def is_bulk_message(msg: email.message.Message) -> bool:
+    """Whether headers mark a message as mailing-list or machine-generated mail."""
+    if msg.get("List-Id") or msg.get("List-Unsubscribe"):
+        return True
+    if str(msg.get("Precedence", "")).strip().lower() in ("bulk", "list", "junk"):
+        return True
+    auto_submitted = str(msg.get("Auto-Submitted", "")).strip().lower()
+    return bool(auto_submitted) and auto_submitted != "no"
+
+
+def parse_email_message(email_id: str, msg: email.message.Message) -> EmailRecord:
+    """Parse a message into a record (no validation, never raises on odd headers)."""
+    # Extract body
+    body = ""
+    html_body = None
+    attachments = []
+
+    if msg.is_multipart():
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            content_disposition = str(part.get("Content-Disposition", ""))
+
+            # Extract text body
+            if content_type == "text/plain" and "attachment" not in content_disposition:
+                try:
+                    body = part.get_payload(decode=True).decode(errors="replace")
+                except Exception:
+                    pass
+
+            # Extract HTML body
+            elif content_type == "text/html" and "attachment" not in content_disposition:
+                try:
+                    html_body = part.get_payload(decode=True).decode(errors="replace")
+                except Exception:
+                    pass
+
+            # Extract attachments
+            elif "attachment" in content_disposition:
+                filename = part.get_filename()
+                if filename:
+                    attachments.append(AttachmentRecord(
+                        filename=decode_str(filename),
+                        content_type=content_type,
+                        size=len(part.get_payload(decode=True) or b"")
+                    ))
+    else:
+        # Simple email
+        try:
+            body = msg.get_payload(decode=True).decode(errors="replace")
+        except Exception:
+            body = str(msg.get_payload())
+
+        if msg.get_content_type() == "text/html":
+            html_body, body = body, ""
+
+    return build_email_record(email_id, msg, body, html_body, attachments)
+
+
+def parse_email_stream(email_id: str, parser: MimeStreamParser) -> EmailRecord:
+    """Finish a streaming parse (see app.email.mime_stream) and build its record."""
+    parsed = parser.close()
+    attachments = [
+        AttachmentRecord(
+            filename=decode_str(attachment.filename),
+            content_type=attachment.content_type,
+            size=attachment.size,
+        )
+        for attachment in parsed.attachments
+    ]
+    return build_email_record(email_id, parsed.headers, parsed.body, parsed.html_body, attachments)
+
+
+def parse_email_bytes(email_id: str, raw: bytes) -> EmailRecord:
+    """Parse a raw message without building a message tree or decoding attachments."""
+    parser = MimeStreamParser()
+    parser.feed(raw)
+    return parse_email_stream(email_id, parser)
+
+
+def build_email_record(
+    email_id: str,
+    msg: email.message.Message,
+    body: str,
+    html_body: Optional[str],
+    attachments: list[AttachmentRecord],
+) -> EmailRecord:
+    """Build a record from a message's top-level headers and its extracted parts."""
+    # Extract basic fields
+    from_address = extract_address(decode_str(msg.get("From", "")))
+
+    to_addresses = [
+        addr.strip()
+        for addr in decode_str(msg.get("To", "")).split(",")
+        if addr.strip()
+    ]
+
+    cc_addresses = [
+        addr.strip()
+        for addr in decode_str(msg.get("Cc", "")).split(",")
+        if addr.strip()
+    ]
+
+    subject = decode_str(msg.get("Subject", ""))
+    message_id = msg.get("Message-ID", "")
+    in_reply_to = msg.get("In-Reply-To")
+    references = msg.get("References", "").split() if msg.get("References") else []
+    date = parse_date(msg.get("Date"))
+
+    # HTML-only mail: derive the text body once; it is cached with the message
+    if not body.strip() and html_body:
+        body = html_to_text(html_body)
+
+    return EmailRecord(
+        id=email_id,
+        message_id=message_id,
+        from_address=from_address,
+        to_addresses=to_addresses,
+        cc_addresses=cc_addresses,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        date=date,
+        is_read=False,
+        has_attachments=len(attachments) > 0,
+        attachments=attachments,
+        in_reply_to=in_reply_to,
+        references=references,
+        fingerprint=email_fingerprint(subject, body),
+        bulk=is_bulk_message(msg),
+    )
+
+
 class IMAPClient:
     """IMAP client for reading emails."""
 
-    def __init__(self, settings: Settings):
-        """Initialize IMAP client with settings."""
+    def __init__(self, settings: Settings, store: Optional[MailStore] = None):
+        """
+        Initialize IMAP client with settings.
+
+        Args:
+            settings: Application settings
+            store: Optional local store that every parsed email is written to
+        """
         self.settings = settings
+        self.store = store
         self.imap: Optional[imaplib.IMAP4_SSL] = None
+        self.mailbox = "INBOX"
+        self.capabilities = ServerCapabilities()
+        self._deflate: Optional[DeflateReader] = None
         self._connected = False
 
     def connect(self) -> None:
@@ -37,6 +333,14 @@ class IMAPClient:
                 self.settings.email_password
             )
 
+            # Extensions the rest of the client can rely on for this server
+            self.capabilities = negotiate_capabilities(
+                self.imap, self.settings.imap_server, self.settings.imap_port
+            )
+            self._deflate = None
+            if self.settings.imap_compression and self.capabilities.compress_deflate:
+                self._deflate = enable_compression(self.imap)
+
             self._connected = True
             logger.info("Successfully connected to IMAP server")
 
@@ -48,58 +352,270 @@ class IMAPClient:
         """Disconnect from IMAP server."""
         if self.imap and self._connected:
             try:
-                self.imap.close()
+                if self.imap.state == "SELECTED":
+                    self.imap.close()
                 self.imap.logout()
-                self._connected = False
-                logger.info("Disconnected from IMAP server")
+                if self._deflate and self._deflate.compressed_bytes:
+                    logger.info(
+                        f"Disconnected from IMAP server (received {self._deflate.inflated_bytes} bytes "
+                        f"as {self._deflate.compressed_bytes} compressed)"
+                    )
+                else:
+                    logger.info("Disconnected from IMAP server")
             except Exception as e:
                 logger.error(f"Error disconnecting from IMAP: {e}")
+            finally:
+                self._connected = False
+
+    def is_alive(self) -> bool:
+        """Check that the connection is still usable (for pooled reuse)."""
+        if not self._connected or not self.imap:
+            return False
+        try:
+            status, _ = self.imap.noop()
+            return status == "OK"
+        except Exception:
+            return False
 
     def _ensure_connected(self) -> None:
         """Ensure connection is established."""
         if not self._connected or not self.imap:
             self.connect()
 
-    def select_mailbox(self, mailbox: str = "INBOX") -> None:
-        """Select a mailbox."""
+    def select_mailbox(self, mailbox: str = "INBOX", readonly: bool = False) -> Optional[int]:
+        """
+        Select a mailbox.
+
+        Returns:
+            The mailbox UIDVALIDITY, if the server reported one
+        """
         self._ensure_connected()
-        if self.imap:
-            self.imap.select(mailbox)
+        if not self.imap:
+            return None
 
-    def fetch_unread_emails(self, limit: int = 20) -> list[Email]:
-        """Fetch unread emails from inbox."""
+        status, _ = self.imap.select(quote_mailbox(mailbox), readonly=readonly)
+        if status != "OK":
+            raise ValueError(f"Mailbox {mailbox} not found")
+        self.mailbox = mailbox
+
+        _, data = self.imap.response("UIDVALIDITY")
+        if data and data[0]:
+            uidvalidity = int(data[0])
+            if self.store:
+                self.store.check_uidvalidity(mailbox, uidvalidity)
+            return uidvalidity
+        return None
+
+    def list_mailboxes(self) -> list[MailboxInfo]:
+        """List selectable mailboxes with their message counts (via STATUS)."""
         self._ensure_connected()
-        self.select_mailbox("INBOX")
 
         if not self.imap:
             return []
 
-        try:
-            # Search for unread emails
-            status, messages = self.imap.search(None, "UNSEEN")
+        status, data = self.imap.list()
+        if status != "OK":
+            logger.error("Failed to list mailboxes")
+            return []
 
-            if status != "OK":
-                logger.error("Failed to search for unread emails")
-                return []
+        mailboxes = []
+        for line in data:
+            if not isinstance(line, bytes):
+                continue
+
+            match = _LIST_RE.match(line)
+            if not match or b"\\Noselect" in match.group("flags"):
+                continue
+
+            name = match.group("name").decode(errors="replace").strip()
+            if name.startswith('"') and name.endswith('"'):
+                name = name[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+
+            info = MailboxInfo(name=name)
+            try:
+                status, status_data = self.imap.status(
+                    quote_mailbox(name), "(MESSAGES UNSEEN UIDNEXT UIDVALIDITY)"
+                )
+                if status == "OK" and status_data and status_data[0]:
+                    items = {
+                        key.decode().lower(): int(value)
+                        for key, value in _STATUS_ITEM_RE.findall(status_data[0])
+                    }
+                    info = MailboxInfo(name=name, **items)
+            except Exception as e:
+                logger.error(f"Error getting status of mailbox {name}: {e}")
+
+            mailboxes.append(info)
+
+        return mailboxes
+
+    def mailbox_exists(self, mailbox: str) -> bool:
+        """Whether a mailbox exists (one STATUS command; the selected mailbox is unchanged)."""
+        self._ensure_connected()
+        if not self.imap:
+            return False
+
+        status, _ = self.imap.status(quote_mailbox(mailbox), "(UIDVALIDITY)")
+        return status == "OK"
+
+    def fetch_page(
+        self,
+        mailbox: str = "INBOX",
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        order: Literal["desc", "asc"] = "desc",
+        is_read: Optional[bool] = None,
+        is_flagged: Optional[bool] = None,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+    ) -> EmailPage:
+        """
+        Fetch one page of message headers from any mailbox.
+
+        Filtering is done by a single UID SEARCH over the whole mailbox, so
+        the total counts every matching message whichever page is asked
+        for; the page itself costs one UID FETCH. Headers come
+        from the local cache when available, in which case only FLAGS are
+        fetched.
+
+        Args:
+            mailbox: Mailbox to list
+            limit: Page size
+            cursor: Cursor returned with the previous page
+            order: "desc" for newest first, "asc" for oldest first (by UID)
+            is_read: Only read (True) or unread (False) messages
+            is_flagged: Only flagged (True) or unflagged (False) messages
+            since: Only messages received on or after this date
+            until: Only messages received before this date
+
+        Returns:
+            The page of headers and the cursor for the next one
+
+        Raises:
+            ValueError: If the cursor is malformed, belongs to another
+                listing, or the mailbox UIDVALIDITY changed since it was issued
+        """
+        uidvalidity = self.select_mailbox(mailbox, readonly=True) or 0
+
+        if not self.imap:
+            return EmailPage(mailbox=mailbox, emails=[], total=0)
+
+        position = decode_cursor(cursor) if cursor else None
+        if position:
+            if position["m"] != mailbox or position["o"] != order:
+                raise ValueError("Cursor does not match this mailbox listing")
+            if position["v"] != uidvalidity:
+                raise ValueError("Cursor expired: mailbox UIDVALIDITY changed")
+
+        criteria = ["ALL"]
+        if is_read is not None:
+            criteria.append("SEEN" if is_read else "UNSEEN")
+        if is_flagged is not None:
+            criteria.append("FLAGGED" if is_flagged else "UNFLAGGED")
+        if since:
+            criteria += ["SINCE", imap_date(since)]
+        if until:
+            criteria += ["BEFORE", imap_date(until)]
+
+        matches = self.uid_search(*criteria)
+        total = len(matches)
+
+        # Keep the UIDs after the cursor
+        if order == "desc":
+            matches.reverse()
+            uids = [uid for uid in matches if uid < position["u"]] if position else matches
+        else:
+            uids = [uid for uid in matches if uid > position["u"]] if position else matches
+        page_uids = uids[:limit]
+
+        headers = self._fetch_headers(mailbox, page_uids)
+
+        next_cursor = None
+        if len(uids) > limit:
+            next_cursor = encode_cursor(mailbox, uidvalidity, page_uids[-1], order)
+
+        return EmailPage(
+            mailbox=mailbox,
+            emails=[headers[uid] for uid in page_uids if uid in headers],
+            total=total,
+            next_cursor=next_cursor,
+        )
+
+    def _fetch_headers(self, mailbox: str, uids: list[int]) -> dict[int, EmailHeader]:
+        """Fetch headers and flags for the given UIDs in one UID FETCH."""
+        if not uids or not self.imap:
+            return {}
+
+        cached = self.store.get_headers(mailbox, uids) if self.store else {}
+        need_headers = len(cached) < len(uids)
+
+        items = "(UID FLAGS)"
+        if need_headers:
+            items = f"(UID FLAGS RFC822.SIZE BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})])"
+
+        uid_set = ",".join(str(uid) for uid in uids)
+        status, data = self.imap.uid("FETCH", uid_set, items)
+        if status != "OK":
+            raise RuntimeError(f"Failed to fetch headers from {mailbox}")
+
+        headers: dict[int, EmailHeader] = {}
+        for meta, literal in iter_fetch_items(data):
+            uid_match = _FETCH_UID_RE.search(meta)
+            if not uid_match:
+                continue
+
+            uid = int(uid_match.group(1))
+            flags_match = _FETCH_FLAGS_RE.search(meta)
+            flags = flags_match.group(1).split() if flags_match else []
+            is_read = b"\\Seen" in flags
+            is_flagged = b"\\Flagged" in flags
+
+            if literal is not None:
+                msg = email.message_from_bytes(literal)
+                size_match = _FETCH_SIZE_RE.search(meta)
+                headers[uid] = EmailHeader(
+                    id=str(uid),
+                    mailbox=mailbox,
+                    message_id=msg.get("Message-ID", "").strip(),
+                    from_address=extract_address(decode_str(msg.get("From", ""))),
+                    subject=decode_str(msg.get("Subject", "")),
+                    date=parse_date(msg.get("Date")),
+                    size=int(size_match.group(1)) if size_match else 0,
+                    is_read=is_read,
+                    is_flagged=is_flagged,
+                    in_reply_to=msg.get("In-Reply-To"),
+                )
+            elif uid in cached:
+                headers[uid] = cached[uid].model_copy(
+                    update={"is_read": is_read, "is_flagged": is_flagged}
+                )
+
+        if self.store:
+            try:
+                self.store.add_headers(mailbox, list(headers.values()))
+            except Exception as e:
+                logger.error(f"Error caching headers for {mailbox}: {e}")
 
-            email_ids = messages[0].split()
+        return headers
+
+    def fetch_unread_emails(self, limit: int = 20) -> list[EmailRecord]:
+        """Fetch the most recent unread emails from inbox (newest first) with one UID FETCH."""
+        self._ensure_connected()
+        self.select_mailbox("INBOX")
+
+        if not self.imap:
+            return []
+
+        try:
+            uids = self.uid_search("UNSEEN")
 
-            if not email_ids:
+            if not uids:
                 logger.info("No unread emails found")
                 return []
 
             # Limit the number of emails to fetch
-            email_ids = email_ids[-limit:]  # Get most recent
-
-            emails = []
-            for email_id in reversed(email_ids):  # Most recent first
-                try:
-                    email_obj = self._fetch_email_by_id(email_id.decode())
-                    if email_obj:
-                        emails.append(email_obj)
-                except Exception as e:
-                    logger.error(f"Error fetching email {email_id}: {e}")
-                    continue
+            emails = self._parse_raw(self.fetch_raw(uids[-limit:]), "INBOX")
+            emails.reverse()  # Most recent first
 
             logger.info(f"Fetched {len(emails)} unread emails")
             return emails
@@ -108,140 +624,224 @@ class IMAPClient:
             logger.error(f"Error fetching unread emails: {e}")
             return []
 
-    def fetch_email_by_id(self, email_id: str) -> Optional[Email]:
+    def fetch_new_emails(
+        self, mailbox: str = "INBOX", since_uid: Optional[int] = None, limit: int = 50
+    ) -> tuple[list[EmailRecord], int]:
+        """
+        Fetch messages that arrived after a known UID.
+
+        Args:
+            mailbox: Mailbox to check
+            since_uid: Highest UID already processed; None on the first run
+            limit: Maximum number of new messages to fetch; the oldest are
+                fetched first and the rest are left for later calls
+
+        Returns:
+            The new emails (oldest first) and the highest UID now processed.
+            On the first run nothing is fetched; the current highest UID is
+            returned so that only later arrivals are reported.
+        """
+        self.select_mailbox(mailbox)
+
+        if not self.imap:
+            return [], since_uid or 0
+
+        start = (since_uid or 0) + 1
+        uids = self.search_uids(start)
+        if not uids:
+            return [], since_uid or 0
+
+        if since_uid is None:
+            return [], uids[-1]
+
+        messages = self.fetch_raw(uids[:limit])
+        emails = self._parse_raw(messages, mailbox)
+
+        if emails:
+            logger.info(f"Fetched {len(emails)} new emails from {mailbox}")
+        # Messages expunged before the fetch are simply not returned
+        return emails, max((uid for uid, _, _, _ in messages), default=since_uid)
+
+    def search_uids(self, start: int = 1, end: Optional[int] = None) -> list[int]:
+        """
+        List the UIDs of the selected mailbox within [start, end], ascending.
+
+        Args:
+            start: Lowest UID
+            end: Highest UID (None for no upper bound)
+        """
+        if not self.imap or (end is not None and end < start):
+            return []
+
+        uids = self.uid_search("UID", f"{start}:{end if end is not None else '*'}")
+        # "n:*" always matches the highest UID, even when it is below n
+        return [uid for uid in uids if uid >= start and (end is None or uid <= end)]
+
+    def uid_search(self, *criteria: str) -> list[int]:
+        """
+        Run UID SEARCH on the selected mailbox and return the matching UIDs, ascending.
+
+        With ESEARCH the server answers with a compact sequence set
+        ("1:5000,5002") instead of listing every UID.
+        """
+        if self.capabilities.esearch:
+            status, _ = self.imap.uid("SEARCH", "RETURN", "(ALL)", *criteria)
+            if status != "OK":
+                raise RuntimeError(f"Failed to search mailbox {self.mailbox}")
+            _, data = self.imap.response("ESEARCH")
+            uids: list[int] = []
+            for item in data or []:
+                match = _ESEARCH_ALL_RE.search(item or b"")
+                if match:
+                    uids.extend(expand_uid_set(match.group(1).decode()))
+            return sorted(set(uids))
+
+        status, data = self.imap.uid("SEARCH", None, *criteria)
+        if status != "OK":
+            raise RuntimeError(f"Failed to search mailbox {self.mailbox}")
+        return sorted(int(uid) for uid in (data[0] or b"").split())
+
+    def fetch_raw(self, uids: list[int]) -> list[tuple[int, bytes, bool, bool]]:
+        """
+        Fetch complete messages of the selected mailbox in one UID FETCH, without parsing.
+
+        Messages are not marked as read.
+
+        Returns:
+            (uid, raw message, is_read, is_flagged) tuples in server order
+        """
+        if not uids or not self.imap:
+            return []
+
+        status, data = self.imap.uid("FETCH", compress_uid_set(uids), "(UID FLAGS BODY.PEEK[])")
+        if status != "OK":
+            raise RuntimeError(f"Failed to fetch messages from {self.mailbox}")
+
+        messages = []
+        for meta, literal in iter_fetch_items(data):
+            uid_match = _FETCH_UID_RE.search(meta)
+            if not uid_match or literal is None:
+                continue
+            flags_match = _FETCH_FLAGS_RE.search(meta)
+            flags = flags_match.group(1).split() if flags_match else []
+            messages.append((int(uid_match.group(1)), literal, b"\\Seen" in flags, b"\\Flagged" in flags))
+        return messages
+
+    def fetch_emails(self, uids: list[int], mailbox: str = "INBOX") -> list[EmailRecord]:
+        """
+        Fetch and parse several messages with a single UID FETCH, caching them.
+
+        Messages are not marked as read; their read and flagged state is
+        taken from the server.
+
+        Args:
+            uids: Message UIDs
+            mailbox: Mailbox containing the messages
+
+        Returns:
+            The messages found, in server order
+        """
+        self._ensure_connected()
+        self.select_mailbox(mailbox)
+        return self._parse_raw(self.fetch_raw(uids), mailbox)
+
+    def _parse_raw(self, messages: list[tuple[int, bytes, bool, bool]], mailbox: str) -> list[EmailRecord]:
+        """Parse messages returned by fetch_raw and cache them."""
+        emails = []
+        for uid, raw, is_read, is_flagged in messages:
+            try:
+                email_obj = parse_email_bytes(str(uid), raw)
+            except Exception as e:
+                logger.error(f"Error parsing email {uid}: {e}")
+                continue
+            email_obj.is_read = is_read
+            email_obj.is_flagged = is_flagged
+            emails.append(email_obj)
+
+        if self.store and emails:
+            try:
+                self.store.add_emails(emails, mailbox)
+            except Exception as e:
+                logger.error(f"Error caching emails from {mailbox}: {e}")
+
+        return emails
+
+    def fetch_email_by_id(self, email_id: str) -> Optional[EmailRecord]:
         """Fetch a specific email by ID."""
         self._ensure_connected()
         self.select_mailbox("INBOX")
         return self._fetch_email_by_id(email_id)
 
-    def _fetch_email_by_id(self, email_id: str) -> Optional[Email]:
+    def _fetch_email_by_id(self, email_id: str) -> Optional[EmailRecord]:
         """Internal method to fetch email by ID."""
         if not self.imap:
             return None
 
         try:
-            # Use BODY.PEEK[] to fetch without marking as read
-            status, msg_data = self.imap.fetch(email_id, "(BODY.PEEK[])")
-
-            if status != "OK":
+            # Use BODY.PEEK[] to fetch without marking as read; the message is
+            # parsed as it is read from the socket instead of buffered whole.
+            # FLAGS come along so that caching the message keeps its state.
+            parser = MimeStreamParser()
+            with stream_literals(self.imap, parser.feed):
+                status, msg_data = self.imap.uid("FETCH", email_id, "(UID FLAGS BODY.PEEK[])")
+
+            if status != "OK" or not msg_data or not isinstance(msg_data[0], tuple):
                 logger.error(f"Failed to fetch email {email_id}")
                 return None
 
-            # Parse email
-            email_body = msg_data[0][1]
-            email_message = email.message_from_bytes(email_body)
+            meta, literal = next(iter_fetch_items(msg_data))
+            # A literal the connection had already buffered
+            if literal:
+                parser.feed(literal)
+
+            email_obj = parse_email_stream(email_id, parser)
+            flags_match = _FETCH_FLAGS_RE.search(meta)
+            flags = flags_match.group(1).split() if flags_match else []
+            email_obj.is_read = b"\\Seen" in flags
+            email_obj.is_flagged = b"\\Flagged" in flags
 
-            return self._parse_email(email_id, email_message)
+            if self.store:
+                try:
+                    self.store.add_email(email_obj, self.mailbox)
+                except Exception as e:
+                    logger.error(f"Error caching email {email_id}: {e}")
+
+            return email_obj
 
         except Exception as e:
             logger.error(f"Error fetching email {email_id}: {e}")
             return None
 
-    def _parse_email(self, email_id: str, msg: email.message.Message) -> Email:
-        """Parse email message into Email model."""
-        # Decode email header
-        def decode_str(s: str) -> str:
-            """Decode email header string."""
-            if not s:
-                return ""
+    def store_flags(self, mailbox: str, uids: list[int], flag: str, add: bool) -> bool:
+        """
+        Add or remove a flag on many messages with a single UID STORE.
 
-            decoded_parts = decode_header(s)
-            result = []
+        Args:
+            mailbox: Mailbox containing the messages
+            uids: Message UIDs
+            flag: IMAP flag, e.g. "\\Seen" or "\\Flagged"
+            add: True to set the flag, False to clear it
 
-            for content, encoding in decoded_parts:
-                if isinstance(content, bytes):
-                    result.append(content.decode(encoding or "utf-8", errors="replace"))
-                else:
-                    result.append(str(content))
-
-            return "".join(result)
-
-        # Extract basic fields
-        from_address = decode_str(msg.get("From", ""))
-        # Extract just the email address from "Name <email>"
-        if "<" in from_address and ">" in from_address:
-            from_address = from_address.split("<")[1].split(">")[0].strip()
-
-        to_addresses = [
-            addr.strip()
-            for addr in decode_str(msg.get("To", "")).split(",")
-            if addr.strip()
-        ]
-
-        cc_addresses = [
-            addr.strip()
-            for addr in decode_str(msg.get("Cc", "")).split(",")
-            if addr.strip()
-        ]
-
-        subject = decode_str(msg.get("Subject", ""))
-        message_id = msg.get("Message-ID", "")
-        in_reply_to = msg.get("In-Reply-To")
-        references = msg.get("References", "").split() if msg.get("References") else []
-
-        # Parse date
-        date_str = msg.get("Date")
-        try:
-            date = parsedate_to_datetime(date_str) if date_str else datetime.now()
-        except Exception:
-            date = datetime.now()
-
-        # Extract body
-        body = ""
-        html_body = None
-        attachments = []
-
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                content_disposition = str(part.get("Content-Disposition", ""))
-
-                # Extract text body
-                if content_type == "text/plain" and "attachment" not in content_disposition:
-                    try:
-                        body = part.get_payload(decode=True).decode(errors="replace")
-                    except Exception:
-                        pass
-
-                # Extract HTML body
-                elif content_type == "text/html" and "attachment" not in content_disposition:
-                    try:
-                        html_body = part.get_payload(decode=True).decode(errors="replace")
-                    except Exception:
-                        pass
-
-                # Extract attachments
-                elif "attachment" in content_disposition:
-                    filename = part.get_filename()
-                    if filename:
-                        attachments.append(EmailAttachment(
-                            filename=decode_str(filename),
-                            content_type=content_type,
-                            size=len(part.get_payload(decode=True) or b"")
-                        ))
-        else:
-            # Simple email
-            try:
-                body = msg.get_payload(decode=True).decode(errors="replace")
-            except Exception:
-                body = str(msg.get_payload())
-
-        return Email(
-            id=email_id,
-            message_id=message_id,
-            from_address=from_address,
-            to_addresses=to_addresses,
-            cc_addresses=cc_addresses,
-            subject=subject,
-            body=body,
-            html_body=html_body,
-            date=date,
-            is_read=False,
-            has_attachments=len(attachments) > 0,
-            attachments=attachments,
-            in_reply_to=in_reply_to,
-            references=references
-        )
+        Returns:
+            True if the server accepted the command
+        """
+        if not uids:
+            return True
+
+        self.select_mailbox(mailbox)
+
+        if not self.imap:
+            return False
+
+        uid_set = compress_uid_set(uids)
+        command = "+FLAGS.SILENT" if add else "-FLAGS.SILENT"
+        status, _ = self.imap.uid("STORE", uid_set, command, f"({flag})")
+        if status != "OK":
+            logger.error(f"Failed to store {command} {flag} on {mailbox} {uid_set}")
+            return False
+
+        logger.info(f"Stored {command} {flag} on {len(uids)} emails in {mailbox}")
+        return True
 
     def mark_as_read(self, email_id: str) -> bool:
         """Mark an email as read."""
@@ -252,7 +852,7 @@ class IMAPClient:
             return False
 
         try:
-            self.imap.store(email_id, "+FLAGS", "\\Seen")
+            self.imap.uid("STORE", email_id, "+FLAGS", "\\Seen")
             logger.info(f"Marked email {email_id} as read")
             return True
         except Exception as e:
@@ -268,7 +868,7 @@ class IMAPClient:
             return False
 
         try:
-            self.imap.store(email_id, "-FLAGS", "\\Seen")
+            self.imap.uid("STORE", email_id, "-FLAGS", "\\Seen")
             logger.info(f"Marked email {email_id} as unread")
             return True
         except Exception as e:
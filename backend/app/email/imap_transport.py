@@ -0,0 +1,200 @@
+"""IMAP capability negotiation, transparent COMPRESS=DEFLATE (RFC 4978) and literal streaming for imaplib connections."""
+
+import imaplib
+import io
+import logging
+import threading
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# imaplib refuses commands it does not know
+imaplib.Commands.setdefault("COMPRESS", ("AUTH", "SELECTED"))
+
+# Bytes requested from the socket per read
+READ_SIZE = 65536
+
+
+@dataclass(frozen=True, slots=True)
+class ServerCapabilities:
+    """Capabilities a server advertised after login, and the extensions the client uses."""
+
+    names: frozenset[str] = frozenset()
+
+    def has(self, name: str) -> bool:
+        """Whether the server advertised a capability (case-insensitive)."""
+        return name.upper() in self.names
+
+    @property
+    def compress_deflate(self) -> bool:
+        """COMPRESS=DEFLATE (RFC 4978): the connection can be compressed."""
+        return self.has("COMPRESS=DEFLATE")
+
+    @property
+    def condstore(self) -> bool:
+        """CONDSTORE (RFC 7162): per-message mod-sequences for incremental flag sync."""
+        return self.has("CONDSTORE")
+
+    @property
+    def esearch(self) -> bool:
+        """ESEARCH (RFC 4731): SEARCH RETURN (...) with compact sequence-set results."""
+        return self.has("ESEARCH")
+
+    @property
+    def literal_plus(self) -> bool:
+        """LITERAL+ (RFC 7888): non-synchronizing literals."""
+        return self.has("LITERAL+")
+
+    @property
+    def idle(self) -> bool:
+        """IDLE (RFC 2177): server push of mailbox changes."""
+        return self.has("IDLE")
+
+    def enabled(self) -> list[str]:
+        """Names of the extensions above that the server supports."""
+        return [
+            name for name, supported in (
+                ("COMPRESS=DEFLATE", self.compress_deflate),
+                ("CONDSTORE", self.condstore),
+                ("ESEARCH", self.esearch),
+                ("LITERAL+", self.literal_plus),
+                ("IDLE", self.idle),
+            ) if supported
+        ]
+
+
+# Post-login capabilities per (host, port), so pooled connections skip the CAPABILITY round trip
+_capability_cache: dict[tuple[str, int], ServerCapabilities] = {}
+_cache_lock = threading.Lock()
+
+
+def negotiate_capabilities(imap: imaplib.IMAP4, host: str, port: int) -> ServerCapabilities:
+    """
+    Return the capabilities of an authenticated connection's server.
+
+    Servers often advertise more after login than in their greeting, so
+    the first connection to a server asks again with CAPABILITY; the
+    answer is cached for later connections to the same host and port.
+    """
+    key = (host.lower(), port)
+    with _cache_lock:
+        cached = _capability_cache.get(key)
+    if cached is not None:
+        return cached
+
+    names = {str(name).upper() for name in getattr(imap, "capabilities", ())}
+    try:
+        status, data = imap.capability()
+        if status == "OK" and data and data[0]:
+            names = {name.upper() for name in data[0].decode(errors="replace").split()}
+    except Exception as e:
+        logger.warning(f"CAPABILITY failed on {host}, using the greeting's capabilities: {e}")
+
+    capabilities = ServerCapabilities(frozenset(names))
+    with _cache_lock:
+        _capability_cache[key] = capabilities
+    logger.info(f"IMAP server {host} supports: {', '.join(capabilities.enabled()) or 'no optional extensions'}")
+    return capabilities
+
+
+def forget_capabilities(host: str, port: int) -> None:
+    """Drop the cached capabilities of a server (e.g. after it misbehaved)."""
+    with _cache_lock:
+        _capability_cache.pop((host.lower(), port), None)
+
+
+class DeflateReader(io.RawIOBase):
+    """Raw stream that inflates what the server sends on a compressed connection."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+        self._pending = b""
+        self.compressed_bytes = 0
+        self.inflated_bytes = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        """Fill ``buffer`` with inflated bytes, reading the socket as needed (0 at EOF)."""
+        while not self._pending:
+            data = self.sock.recv(READ_SIZE)
+            if not data:
+                return 0
+            self.compressed_bytes += len(data)
+            self._pending = self._inflater.decompress(data)
+            self.inflated_bytes += len(self._pending)
+
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class DeflateWriter:
+    """Deflates what the client sends, flushing after every command so the server can act on it."""
+
+    def __init__(self, sock, level: int = 6):
+        self.sock = sock
+        self._deflater = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+
+    def send(self, data: bytes) -> None:
+        """Compress and send one chunk of protocol data."""
+        self.sock.sendall(self._deflater.compress(data) + self._deflater.flush(zlib.Z_SYNC_FLUSH))
+
+
+def enable_compression(imap: imaplib.IMAP4) -> DeflateReader | None:
+    """
+    Switch an authenticated connection to COMPRESS=DEFLATE.
+
+    After the server accepts, imaplib's reads go through an inflating
+    buffered reader and its sends through a deflater; nothing else in
+    imaplib changes.
+
+    Returns:
+        The reader (with byte counters), or None if the server refused
+    """
+    status, data = imap._simple_command("COMPRESS", "DEFLATE")
+    if status != "OK":
+        logger.warning(f"Server refused COMPRESS=DEFLATE: {data}")
+        return None
+
+    # The server sends nothing after the OK until our next (compressed) command,
+    # so the old buffered file holds no unread bytes
+    reader = DeflateReader(imap.sock)
+    writer = DeflateWriter(imap.sock)
+    imap.file = io.BufferedReader(reader, READ_SIZE)
+    imap.send = writer.send
+    return reader
+
+
+@contextmanager
+def stream_literals(imap: imaplib.IMAP4, sink: Callable[[bytes], None]) -> Iterator[None]:
+    """
+    Pass literals to ``sink`` in chunks as they are read, instead of buffering them.
+
+    While active, every literal in a server response (e.g. the BODY[] of a
+    FETCH) is handed to ``sink`` piece by piece and appears empty in
+    imaplib's parsed response, so a large message is never held whole.
+    """
+    read = imap.read
+
+    def streaming_read(size: int) -> bytes:
+        remaining = size
+        while remaining:
+            chunk = read(min(remaining, READ_SIZE))
+            if not chunk:
+                raise imaplib.IMAP4.abort("socket error: EOF in literal")
+            sink(chunk)
+            remaining -= len(chunk)
+        return b""
+
+    imap.read = streaming_read
+    try:
+        yield
+    finally:
+        del imap.read
@@ -0,0 +1,319 @@
+"""Incremental MIME parsing that keeps only the text parts of a message in memory."""
+
+import binascii
+import email.message
+from dataclasses import dataclass, field
+from email.parser import BytesHeaderParser
+from typing import Optional
+
+from app.email.records import AttachmentRecord
+
+# A partial line longer than this cannot be a boundary and is passed on without waiting for its end
+MAX_LINE = 65536
+
+_BASE64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+# Bytes to delete to keep base64 digits, with and without the padding character
+_NOT_BASE64 = bytes(b for b in range(256) if b not in _BASE64_ALPHABET + b"=")
+_NOT_BASE64_DIGIT = _NOT_BASE64 + b"="
+
+# Parser states
+_HEADERS = "headers"
+_BODY = "body"
+_SKIP = "skip"  # multipart preamble or epilogue
+
+
+class _Base64Decoder:
+    """Decodes base64 fed in arbitrary pieces (lenient, like email's decoder)."""
+
+    def __init__(self):
+        self._carry = b""
+        self._digits = 0
+
+    def decode(self, data: bytes) -> bytes:
+        data = self._carry + data.translate(None, _NOT_BASE64)
+        end = len(data) - len(data) % 4
+        self._carry = data[end:]
+        return self._convert(data[:end])
+
+    def flush(self) -> bytes:
+        data, self._carry = self._carry, b""
+        return self._convert(data + b"=" * (-len(data) % 4)) if data.strip(b"=") else b""
+
+    def measure(self, data: bytes) -> None:
+        """Count the digits of data whose decoded size is all that is needed."""
+        self._digits += len(data.translate(None, _NOT_BASE64_DIGIT))
+
+    @property
+    def measured_size(self) -> int:
+        """Decoded size of the data measured so far (6 bits per digit)."""
+        return self._digits * 6 // 8
+
+    @staticmethod
+    def _convert(data: bytes) -> bytes:
+        try:
+            return binascii.a2b_base64(data)
+        except binascii.Error:
+            return b""
+
+
+class _QuotedPrintableDecoder:
+    """Decodes quoted-printable a complete line at a time, so soft breaks are seen whole."""
+
+    def __init__(self):
+        self._carry = b""
+
+    def decode(self, data: bytes) -> bytes:
+        data = self._carry + data
+        end = data.rfind(b"\n") + 1
+        self._carry = data[end:]
+        return binascii.a2b_qp(data[:end]) if end else b""
+
+    def flush(self) -> bytes:
+        data, self._carry = self._carry, b""
+        return binascii.a2b_qp(data) if data else b""
+
+
+class _IdentityDecoder:
+    """7bit, 8bit, binary and unknown transfer encodings."""
+
+    def decode(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def _decoder(encoding: str):
+    if encoding == "base64":
+        return _Base64Decoder()
+    if encoding == "quoted-printable":
+        return _QuotedPrintableDecoder()
+    return _IdentityDecoder()
+
+
+class _Leaf:
+    """One non-multipart part: decoded into memory when it is text we keep, otherwise only measured."""
+
+    __slots__ = ("kind", "content_type", "filename", "decoder", "buffer", "size")
+
+    def __init__(self, kind: Optional[str], content_type: str, filename: Optional[str], encoding: str):
+        self.kind = kind  # "body", "html", "attachment" or None (discarded)
+        self.content_type = content_type
+        self.filename = filename
+        self.decoder = _decoder(encoding)
+        self.buffer = bytearray() if kind in ("body", "html") else None
+        self.size = 0
+
+    def write(self, data: bytes) -> None:
+        if self.kind is None or not data:
+            return
+        if self.buffer is None and isinstance(self.decoder, _Base64Decoder):
+            # Only the size is kept: count base64 digits instead of decoding them
+            self.decoder.measure(data)
+        else:
+            self._take(self.decoder.decode(data))
+
+    def finish(self) -> None:
+        if self.kind is None:
+            return
+        if self.buffer is None and isinstance(self.decoder, _Base64Decoder):
+            self.size = self.decoder.measured_size
+        else:
+            self._take(self.decoder.flush())
+
+    def _take(self, decoded: bytes) -> None:
+        self.size += len(decoded)
+        if self.buffer is not None:
+            self.buffer += decoded
+
+
+@dataclass(slots=True)
+class ParsedMessage:
+    """What the rest of the backend needs from a message."""
+
+    headers: email.message.Message  # top-level headers only
+    body: str = ""
+    html_body: Optional[str] = None
+    attachments: list[AttachmentRecord] = field(default_factory=list)  # filenames not yet RFC 2047-decoded
+
+
+class MimeStreamParser:
+    """
+    Parses a raw message fed in chunks, as it arrives from the server.
+
+    Unlike ``email.message_from_bytes``, no message tree is built and no
+    part is kept whole: text/plain and text/html parts are decoded into
+    memory, attachments are only measured (base64 digits are counted, not
+    decoded), and other parts (inline images, signatures) are skipped.
+    Peak memory is the text of the message plus one chunk, whatever the
+    size of its attachments.
+
+    Parts are classified as ``parse_email_message`` does: the last inline
+    text/plain and text/html parts become the body, and parts with an
+    attachment disposition and a filename are listed as attachments.
+    Attached messages (message/rfc822) are listed, not descended into;
+    inline ones are parsed as part of the message.
+    """
+
+    def __init__(self):
+        self.headers: Optional[email.message.Message] = None
+        self._carry = b""
+        self._state = _HEADERS
+        self._header_lines: list[bytes] = []
+        self._boundaries: list[bytes] = []
+        self._leaf: Optional[_Leaf] = None
+        self._batch: list[bytes] = []
+        self._pending_eol = b""
+        self._body: Optional[bytes] = None
+        self._html: Optional[bytes] = None
+        self._attachments: list[AttachmentRecord] = []
+
+    def feed(self, data: bytes) -> None:
+        """Parse the next chunk of the raw message."""
+        if not data:
+            return
+        buf = self._carry + data
+        start = 0
+
+        while start < len(buf):
+            if self._state != _HEADERS and not buf.startswith(b"--", start):
+                # Every line before the next one starting with "--" is content: take them at once
+                candidate = buf.find(b"\n--", start)
+                stop = candidate + 1 if candidate >= 0 else buf.rfind(b"\n", start) + 1
+                if stop <= start:
+                    break
+                if self._state == _BODY:
+                    self._batch.append(buf[start:stop])
+                start = stop
+                continue
+
+            end = buf.find(b"\n", start)
+            if end < 0:
+                break
+            self._line(buf[start:end + 1])
+            start = end + 1
+
+        self._carry = buf[start:]
+        if len(self._carry) > MAX_LINE and self._state != _HEADERS:
+            self._line(self._carry)
+            self._carry = b""
+        self._flush_batch()
+
+    def close(self) -> ParsedMessage:
+        """Finish parsing (a message cut short keeps what was read) and return the result."""
+        if self._carry:
+            self._line(self._carry)
+            self._carry = b""
+        if self._state == _HEADERS and self.headers is None:
+            self._end_headers()
+        self._flush_batch()
+        # A part ended by the end of the message keeps its final line break
+        self._write(self._pending_eol)
+        self._end_leaf()
+
+        return ParsedMessage(
+            headers=self.headers or email.message.Message(),
+            body=self._body.decode(errors="replace") if self._body is not None else "",
+            html_body=self._html.decode(errors="replace") if self._html is not None else None,
+            attachments=self._attachments,
+        )
+
+    def _line(self, line: bytes) -> None:
+        """Handle one line (with its line break, if any)."""
+        if self._state == _HEADERS:
+            if line.strip(b"\r\n"):
+                self._header_lines.append(line)
+            else:
+                self._end_headers()
+            return
+
+        if self._boundaries and line.startswith(b"--") and len(line) < 256:
+            delimiter = line.rstrip()
+            for depth in range(len(self._boundaries) - 1, -1, -1):
+                boundary = b"--" + self._boundaries[depth]
+                if delimiter == boundary:
+                    # Next part of this multipart; any deeper multiparts ended without a close delimiter
+                    self._end_part()
+                    del self._boundaries[depth + 1:]
+                    self._state = _HEADERS
+                    return
+                if delimiter == boundary + b"--":
+                    self._end_part()
+                    del self._boundaries[depth:]
+                    self._state = _SKIP
+                    return
+
+        if self._state == _BODY:
+            self._batch.append(line)
+
+    def _end_headers(self) -> None:
+        """Start the body of the part whose headers were just read."""
+        headers = BytesHeaderParser().parsebytes(b"".join(self._header_lines))
+        self._header_lines = []
+        top_level = self.headers is None
+        if top_level:
+            self.headers = headers
+
+        content_type = headers.get_content_type()
+        disposition = str(headers.get("Content-Disposition", ""))
+        attachment = "attachment" in disposition
+
+        if headers.get_content_maintype() == "multipart":
+            boundary = headers.get_boundary()
+            if boundary:
+                self._boundaries.append(boundary.encode(errors="surrogateescape"))
+                self._state = _SKIP
+                return
+        elif content_type == "message/rfc822" and not attachment:
+            # An inline message: its headers follow, then its body
+            self._state = _HEADERS
+            return
+
+        if top_level and content_type.startswith("text/"):
+            kind = "html" if content_type == "text/html" else "body"
+        elif content_type in ("text/plain", "text/html") and not attachment:
+            kind = "html" if content_type == "text/html" else "body"
+        elif (attachment or top_level) and headers.get_filename():
+            kind = "attachment"
+        else:
+            kind = None
+
+        encoding = str(headers.get("Content-Transfer-Encoding", "")).strip().lower()
+        self._leaf = _Leaf(kind, content_type, headers.get_filename(), encoding)
+        self._state = _BODY
+
+    def _flush_batch(self) -> None:
+        """Write the body lines read so far, holding back the last line break (it may precede a boundary)."""
+        if not self._batch:
+            return
+        data = b"".join(self._batch)
+        self._batch = []
+        eol = b"\r\n" if data.endswith(b"\r\n") else b"\n" if data.endswith(b"\n") else b""
+        self._write(self._pending_eol + data[:len(data) - len(eol)])
+        self._pending_eol = eol
+
+    def _write(self, data: bytes) -> None:
+        if self._leaf is not None:
+            self._leaf.write(data)
+
+    def _end_part(self) -> None:
+        """A boundary ended the current part; the line break before it is not content."""
+        self._flush_batch()
+        self._end_leaf()
+
+    def _end_leaf(self) -> None:
+        leaf, self._leaf = self._leaf, None
+        self._pending_eol = b""
+        if leaf is None:
+            return
+        leaf.finish()
+        if leaf.kind == "body":
+            self._body = bytes(leaf.buffer)
+        elif leaf.kind == "html":
+            self._html = bytes(leaf.buffer)
+        elif leaf.kind == "attachment":
+            self._attachments.append(AttachmentRecord(
+                filename=leaf.filename,
+                content_type=leaf.content_type,
+                size=leaf.size,
+            ))
@@ -30,15 +30,23 @@ class EmailAttachment(BaseModel):
     content_type: str
     size: int  # bytes
 
+    class Config:
+        from_attributes = True
+
 
 class Email(BaseModel):
-    """Email message model."""
+    """
+    Email message model (API representation of records.EmailRecord).
+
+    Addresses are reported as received from the server and not validated;
+    only addresses we send to (EmailDraft) are.
+    """
 
     id: str = Field(..., description="Unique email ID (IMAP UID)")
     message_id: str = Field(..., description="Email Message-ID header")
-    from_address: EmailStr = Field(..., alias="from")
-    to_addresses: list[EmailStr] = Field(default_factory=list, alias="to")
-    cc_addresses: list[EmailStr] = Field(default_factory=list, alias="cc")
+    from_address: str = Field(..., alias="from")
+    to_addresses: list[str] = Field(default_factory=list, alias="to")
+    cc_addresses: list[str] = Field(default_factory=list, alias="cc")
     subject: str
     body: str
     html_body: Optional[str] = None
@@ -52,6 +60,56 @@ class Email(BaseModel):
 
     class Config:
         populate_by_name = True
+        from_attributes = True
+
+
+class EmailHeader(BaseModel):
+    """Lightweight email header used for mailbox listings."""
+
+    id: str = Field(..., description="IMAP UID")
+    mailbox: str = "INBOX"
+    message_id: str = ""
+    from_address: str = Field("", alias="from")
+    subject: str = ""
+    date: datetime
+    size: int = Field(0, description="RFC822 size in bytes")
+    is_read: bool = False
+    is_flagged: bool = False
+    in_reply_to: Optional[str] = None
+
+    class Config:
+        populate_by_name = True
+
+
+class EmailPage(BaseModel):
+    """One page of a cursor-paginated mailbox listing."""
+
+    mailbox: str
+    emails: list[EmailHeader]
+    total: int = Field(..., description="Messages matching the filters in the mailbox")
+    next_cursor: Optional[str] = Field(
+        None, description="Opaque cursor for the next page, null on the last page"
+    )
+
+
+class MailboxInfo(BaseModel):
+    """Mailbox name with message counts from IMAP STATUS."""
+
+    name: str
+    messages: int = 0
+    unseen: int = 0
+    uidnext: Optional[int] = None
+    uidvalidity: Optional[int] = None
+
+
+class EmailThread(BaseModel):
+    """A conversation thread reconstructed from Message-ID/References."""
+
+    thread_id: str = Field(..., description="Message-ID of the thread root container")
+    messages: list[Email] = Field(default_factory=list, description="Messages, oldest first")
+
+    class Config:
+        from_attributes = True
 
 
 class EmailSummary(BaseModel):
@@ -64,6 +122,17 @@ class EmailSummary(BaseModel):
     priority: EmailPriority = EmailPriority.MEDIUM
     action_required: bool = False
     suggested_actions: list[str] = Field(default_factory=list)
+    derived_from: Optional[str] = Field(
+        default=None,
+        description="Id of the near-duplicate email whose summary was reused (no model call)",
+    )
+    heuristic: bool = Field(
+        default=False,
+        description=(
+            "True for a rule-based stand-in: the model was unavailable (not stored), or the "
+            "daily budget was used up (stored until the summary is requested)"
+        ),
+    )
 
 
 class EmailDraft(BaseModel):
@@ -86,9 +155,91 @@ class SendEmailRequest(BaseModel):
     draft: EmailDraft
 
 
+class BulkEmailsRequest(BaseModel):
+    """Request to apply the same change to several emails."""
+
+    email_ids: list[str] = Field(..., min_length=1, description="Email IDs (IMAP UIDs)")
+    mailbox: str = "INBOX"
+
+
+class BulkEmailsResponse(BaseModel):
+    """Acknowledgement of a queued bulk change."""
+
+    message: str
+    email_ids: list[str]
+    pending: int = Field(..., description="Flag changes still waiting to be written to the server")
+
+
 class CheckEmailsResponse(BaseModel):
     """Response from checking for new emails."""
 
     new_emails_count: int
     emails: list[Email]
     last_check: datetime
+    summaries: dict[str, EmailSummary] = Field(
+        default_factory=dict,
+        description="Summaries already generated in the background, keyed by email id",
+    )
+    duplicate_groups: list[list[str]] = Field(
+        default_factory=list,
+        description="Ids of near-duplicate emails from the same sender, in listing order; "
+                    "clients can show each group as one notification",
+    )
+
+
+class PrioritizedEmail(BaseModel):
+    """A message in the priority inbox."""
+
+    email_id: str
+    mailbox: str = "INBOX"
+    from_address: str = Field(..., alias="from")
+    subject: str
+    date: datetime
+    is_read: bool = False
+    is_flagged: bool = False
+    priority: Optional[EmailPriority] = Field(None, description="From the stored summary, if any")
+    action_required: bool = False
+    score: float = Field(..., description="Points from local signals (recency is applied on top)")
+    reasons: list[str] = Field(
+        default_factory=list,
+        description="Signals behind the score, e.g. frequent_contact, replied_thread, "
+                    "priority_high, action_required, flagged, direct, reply, bulk",
+    )
+
+    class Config:
+        populate_by_name = True
+
+
+class PrioritizedEmailsResponse(BaseModel):
+    """A page of the priority inbox."""
+
+    emails: list[PrioritizedEmail]
+    limit: int
+    offset: int
+    has_more: bool
+    indexed: int = Field(..., description="Cached messages ranked by the index")
+
+
+class SearchHit(BaseModel):
+    """A single full-text search result."""
+
+    email_id: str
+    mailbox: str = "INBOX"
+    from_address: str = Field(..., alias="from")
+    subject: str
+    date: datetime
+    snippet: str = Field("", description="Body excerpt around the matched terms")
+    score: float = Field(..., description="Relevance score (higher is better)")
+
+    class Config:
+        populate_by_name = True
+
+
+class SearchResponse(BaseModel):
+    """A page of full-text search results."""
+
+    query: str
+    total: int = Field(..., description="Total number of matching emails")
+    limit: int
+    offset: int
+    results: list[SearchHit]
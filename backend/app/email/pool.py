@@ -0,0 +1,100 @@
+"""Bounded connection pools for IMAP and SMTP clients."""
+
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Generic, Iterator, Protocol, TypeVar
+
+logger = logging.getLogger(__name__)
+
+
+class PooledClient(Protocol):
+    """Interface shared by IMAPClient and SMTPClient."""
+
+    def connect(self) -> None: ...
+
+    def disconnect(self) -> None: ...
+
+    def is_alive(self) -> bool: ...
+
+
+C = TypeVar("C", bound=PooledClient)
+
+
+class ConnectionPool(Generic[C]):
+    """
+    Keeps up to ``size`` authenticated clients and hands them out one at a time.
+
+    Callers block when every connection is checked out, which caps the
+    number of concurrent sessions per account. Idle connections are
+    health-checked before reuse, and a connection whose use raised is
+    discarded rather than returned to the pool.
+    """
+
+    def __init__(self, factory: Callable[[], C], size: int, name: str = "pool"):
+        """Create an empty pool; connections are opened lazily."""
+        self.factory = factory
+        self.size = max(1, size)
+        self.name = name
+        self._idle: list[C] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
+
+    @contextmanager
+    def connection(self) -> Iterator[C]:
+        """Check out a connected client for the duration of the block."""
+        self._slots.acquire()
+        client = None
+        try:
+            client = self._checkout()
+            yield client
+        except Exception:
+            if client is not None:
+                self._discard(client)
+                client = None
+            raise
+        finally:
+            if client is not None:
+                self._checkin(client)
+            self._slots.release()
+
+    def _checkout(self) -> C:
+        """Return a live idle client or open a new one."""
+        while True:
+            with self._lock:
+                client = self._idle.pop() if self._idle else None
+
+            if client is None:
+                break
+            if client.is_alive():
+                return client
+            self._discard(client)
+
+        client = self.factory()
+        client.connect()
+        return client
+
+    def _checkin(self, client: C) -> None:
+        """Return a client to the idle list (or close it if the pool is closed)."""
+        with self._lock:
+            if not self._closed:
+                self._idle.append(client)
+                return
+        self._discard(client)
+
+    def _discard(self, client: C) -> None:
+        """Disconnect a client without returning it to the pool."""
+        try:
+            client.disconnect()
+        except Exception as e:
+            logger.debug(f"Error discarding {self.name} connection: {e}")
+
+    def close(self) -> None:
+        """Disconnect all idle clients and stop pooling."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+
+        for client in idle:
+            self._discard(client)
@@ -0,0 +1,320 @@
+"""Priority inbox: messages ranked from cheap local signals, kept sorted incrementally."""
+
+import bisect
+import json
+import logging
+import math
+import re
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from email.utils import getaddresses
+from typing import Optional
+
+from app.email.records import as_utc
+from app.email.store import MailStore
+
+logger = logging.getLogger(__name__)
+
+# Rows read from the store per refresh step
+REFRESH_BATCH = 5000
+
+# Score points per signal (see PriorityIndex)
+CONTACT_POINTS = 2.0  # reached at CONTACT_SATURATION messages sent to the sender
+CONTACT_SATURATION = 20
+REPLIED_THREAD_POINTS = 1.5
+THREAD_POINTS = 0.5
+PRIORITY_POINTS = {"high": 3.0, "medium": 1.0, "low": -1.0}
+ACTION_POINTS = 1.5
+FLAGGED_POINTS = 1.0
+DIRECT_POINTS = 0.5
+REPLY_POINTS = 0.5
+BULK_POINTS = -2.0
+NO_REPLY_POINTS = -1.0
+# Recency: a message this many days newer outranks one point of signals
+RECENCY_DAYS_PER_POINT = 2.0
+
+_NO_REPLY_RE = re.compile(
+    r"^(no-?reply|do-?not-?reply|notifications?|mailer-daemon|bounces?)([+.-][^@]*)?@", re.IGNORECASE
+)
+
+
+@dataclass(slots=True)
+class PriorityEntry:
+    """Ranking signals and score of one indexed message."""
+
+    mailbox: str
+    uid: str
+    sender: str
+    subject: str
+    date: datetime
+    thread_id: str
+    is_read: bool = False
+    is_flagged: bool = False
+    direct: bool = False  # our address is in To
+    reply: bool = False
+    bulk: bool = False
+    priority: Optional[str] = None  # from the stored summary, if any
+    action_required: bool = False
+    score: float = 0.0
+    rank: float = 0.0  # score plus recency, the sort key
+    reasons: list[str] = field(default_factory=list)
+
+    @property
+    def key(self) -> tuple[float, str, str]:
+        """Position in the sorted index (best first)."""
+        return (-self.rank, self.mailbox, self.uid)
+
+
+def _addresses(values) -> list[str]:
+    """Bare lowercase addresses of a JSON list (or list) of "Name <addr>" strings."""
+    if isinstance(values, str):
+        values = json.loads(values)
+    return [addr.lower() for _, addr in getaddresses(values or []) if addr]
+
+
+def _days(value: datetime) -> float:
+    """Days since the epoch (naive datetimes are taken as UTC)."""
+    return as_utc(value).timestamp() / 86400
+
+
+class PriorityIndex:
+    """
+    Ranks cached messages by how likely they are to need the user, without a model call.
+
+    Signals, each worth a fixed number of points:
+      - how often we wrote to the sender (messages from ``own_address``
+        in any cached mailbox, e.g. Sent), saturating at CONTACT_SATURATION;
+      - whether we took part in the message's thread, and whether it is
+        part of a thread at all;
+      - the stored summary's priority and action_required, once the
+        background summarizer has produced one;
+      - headers: flagged, addressed to us directly, a reply, mailing-list
+        or automated mail, a no-reply sender.
+
+    Messages are kept in a list sorted by score plus recency (every
+    RECENCY_DAYS_PER_POINT days newer is worth one point), so the key
+    never changes with the clock and a page is a slice of the list. The
+    index catches up with the store incrementally before every query,
+    following the messages' write versions: new messages are inserted
+    with bisect, messages changed since (flags synced from the server,
+    threads merged) are moved, new summaries and new messages of ours
+    re-score only the messages they affect, and flag changes made through
+    the API are applied as they are queued.
+    """
+
+    def __init__(self, store: MailStore, own_address: str):
+        """Create an empty index (filled from the store on first use)."""
+        self.store = store
+        self.own_address = own_address.strip().lower()
+
+        self._entries: dict[tuple[str, str], PriorityEntry] = {}
+        self._order: list[tuple[float, str, str]] = []
+        self._by_sender: dict[str, set[tuple[str, str]]] = {}
+        self._by_thread: dict[str, set[tuple[str, str]]] = {}
+        self._thread_sizes: dict[str, int] = {}
+        self._sent_counts: dict[str, int] = {}
+        self._own_threads: set[str] = set()
+        self._own_messages: dict[tuple[str, str], str] = {}  # our messages' threads
+        self._last_row = (0, 0)  # (version, rowid) of the last store row read
+        self._last_summary_rowid = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of ranked messages."""
+        return len(self._entries)
+
+    def refresh(self) -> None:
+        """Index messages and summaries written to the store since the last refresh."""
+        with self._lock:
+            while True:
+                rows = self.store.ranking_rows_after(*self._last_row, REFRESH_BATCH)
+                if not rows:
+                    break
+                self._last_row = (rows[-1]["version"], rows[-1]["rowid"])
+                self._add_rows(rows)
+
+            while True:
+                summaries = self.store.summaries_after(self._last_summary_rowid, REFRESH_BATCH)
+                if not summaries:
+                    break
+                self._last_summary_rowid = summaries[-1][0]
+                for _, mailbox, uid, priority, action_required in summaries:
+                    entry = self._entries.get((mailbox, uid))
+                    if entry and (entry.priority, entry.action_required) != (priority, action_required):
+                        entry.priority, entry.action_required = priority, action_required
+                        self._rescore(entry)
+
+    def _add_rows(self, rows: list[dict]) -> None:
+        """Add a batch of new or changed store rows. Caller holds the lock."""
+        stale: set[tuple[str, str]] = set()
+        for row in rows:
+            sender = (row["from_address"] or "").strip().lower()
+            thread_id = row["thread_id"] or f"{row['mailbox']}/{row['uid']}"
+            key = (row["mailbox"], row["uid"])
+            previous = self._entries.get(key)
+            if previous:
+                self._remove(previous)
+                self._by_sender.get(previous.sender, set()).discard(key)
+
+            known_thread = previous.thread_id if previous else self._own_messages.get(key)
+            if known_thread != thread_id:
+                if known_thread is not None:
+                    self._leave_thread(key, known_thread, stale)
+                self._thread_sizes[thread_id] = self._thread_sizes.get(thread_id, 0) + 1
+                if self._thread_sizes[thread_id] == 2:
+                    stale |= self._by_thread.get(thread_id, set())
+
+            if sender == self.own_address:
+                # Our own message: a contact signal for its recipients, not a ranked message
+                if key not in self._own_messages:
+                    for address in set(_addresses(row["to_addresses"]) + _addresses(row["cc_addresses"])):
+                        self._sent_counts[address] = self._sent_counts.get(address, 0) + 1
+                        stale |= self._by_sender.get(address, set())
+                self._own_messages[key] = thread_id
+                if thread_id not in self._own_threads:
+                    self._own_threads.add(thread_id)
+                    stale |= self._by_thread.get(thread_id, set())
+                continue
+
+            entry = PriorityEntry(
+                mailbox=row["mailbox"],
+                uid=row["uid"],
+                sender=sender,
+                subject=row["subject"],
+                date=as_utc(datetime.fromisoformat(row["date"])),
+                thread_id=thread_id,
+                is_read=bool(row["is_read"]),
+                is_flagged=bool(row["is_flagged"]),
+                direct=self.own_address in _addresses(row["to_addresses"]),
+                reply=bool(row["in_reply_to"]),
+                bulk=bool(row["bulk"]),
+                priority=row["priority"],
+                action_required=bool(row["action_required"]),
+            )
+            self._entries[key] = entry
+            self._by_sender.setdefault(sender, set()).add(key)
+            self._by_thread.setdefault(thread_id, set()).add(key)
+            self._score(entry)
+            bisect.insort(self._order, entry.key)
+            stale.discard(key)
+
+        for key in stale:
+            self._rescore(self._entries[key])
+
+    def _leave_thread(self, key: tuple[str, str], thread_id: str, stale: set) -> None:
+        """Take a message out of the thread it was indexed in. Caller holds the lock."""
+        members = self._by_thread.get(thread_id, set())
+        members.discard(key)
+        size = self._thread_sizes.get(thread_id, 0) - 1
+        if size > 0:
+            self._thread_sizes[thread_id] = size
+            if size == 1:
+                stale |= members
+        else:
+            self._thread_sizes.pop(thread_id, None)
+            self._by_thread.pop(thread_id, None)
+
+    def _score(self, entry: PriorityEntry) -> None:
+        """Compute an entry's score and reasons (it must not be in the sorted list)."""
+        score = 0.0
+        reasons = []
+
+        sent = self._sent_counts.get(entry.sender, 0)
+        if sent:
+            score += CONTACT_POINTS * min(1.0, math.log1p(sent) / math.log1p(CONTACT_SATURATION))
+            reasons.append("frequent_contact" if sent >= 3 else "known_contact")
+        if entry.thread_id in self._own_threads:
+            score += REPLIED_THREAD_POINTS
+            reasons.append("replied_thread")
+        elif self._thread_sizes.get(entry.thread_id, 0) > 1:
+            score += THREAD_POINTS
+            reasons.append("thread")
+
+        if entry.priority in PRIORITY_POINTS:
+            score += PRIORITY_POINTS[entry.priority]
+            reasons.append(f"priority_{entry.priority}")
+        if entry.action_required:
+            score += ACTION_POINTS
+            reasons.append("action_required")
+
+        for applies, points, reason in (
+            (entry.is_flagged, FLAGGED_POINTS, "flagged"),
+            (entry.direct, DIRECT_POINTS, "direct"),
+            (entry.reply, REPLY_POINTS, "reply"),
+            (entry.bulk, BULK_POINTS, "bulk"),
+            (bool(_NO_REPLY_RE.match(entry.sender)), NO_REPLY_POINTS, "no_reply_sender"),
+        ):
+            if applies:
+                score += points
+                reasons.append(reason)
+
+        entry.score = round(score, 3)
+        entry.rank = score + _days(entry.date) / RECENCY_DAYS_PER_POINT
+        entry.reasons = reasons
+
+    def _remove(self, entry: PriorityEntry) -> None:
+        """Take an entry out of the sorted list. Caller holds the lock."""
+        i = bisect.bisect_left(self._order, entry.key)
+        if i < len(self._order) and self._order[i] == entry.key:
+            del self._order[i]
+
+    def _rescore(self, entry: PriorityEntry) -> None:
+        """Recompute an entry's score and move it in the sorted list. Caller holds the lock."""
+        self._remove(entry)
+        self._score(entry)
+        bisect.insort(self._order, entry.key)
+
+    def update_flags(
+        self,
+        mailbox: str,
+        uids: list[int],
+        is_read: Optional[bool] = None,
+        is_flagged: Optional[bool] = None,
+    ) -> None:
+        """Apply flag changes made through the API (mirrors MailStore.update_flags)."""
+        with self._lock:
+            for uid in uids:
+                entry = self._entries.get((mailbox, str(uid)))
+                if entry is None:
+                    continue
+                if is_read is not None:
+                    entry.is_read = is_read
+                if is_flagged is not None and is_flagged != entry.is_flagged:
+                    entry.is_flagged = is_flagged
+                    self._rescore(entry)
+
+    def top(
+        self,
+        limit: int = 20,
+        offset: int = 0,
+        mailbox: str = "INBOX",
+        unread_only: bool = True,
+    ) -> tuple[list[PriorityEntry], bool]:
+        """
+        Return one page of the ranking.
+
+        Args:
+            limit: Page size
+            offset: Number of matching messages to skip
+            mailbox: Mailbox to rank
+            unread_only: Skip messages already read
+
+        Returns:
+            (entries best first, whether more matching messages follow)
+        """
+        self.refresh()
+        page: list[PriorityEntry] = []
+        skipped = 0
+        with self._lock:
+            for key in self._order:
+                entry = self._entries[(key[1], key[2])]
+                if entry.mailbox != mailbox or (unread_only and entry.is_read):
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                if len(page) == limit:
+                    return page, True
+                page.append(entry)
+        return page, False
@@ -0,0 +1,105 @@
+"""Compact internal email records, converted to pydantic models only for the API."""
+
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.email.models import Email, EmailThread
+
+
+def as_utc(value: datetime) -> datetime:
+    """Treat a naive datetime as UTC, so dates from any source can be compared."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+@dataclass(slots=True)
+class AttachmentRecord:
+    """Attachment metadata of a parsed message."""
+
+    filename: str
+    content_type: str
+    size: int  # bytes
+
+
+@dataclass(slots=True)
+class EmailRecord:
+    """
+    A parsed message as passed between the IMAP client, store and agent.
+
+    Plain slotted dataclass: building one does no validation, so parsing
+    never fails on odd headers and costs a fraction of a pydantic model.
+    Fields mirror ``Email``; call ``to_model()`` at the API boundary.
+    """
+
+    id: str
+    message_id: str
+    from_address: str
+    subject: str
+    body: str
+    date: datetime
+    to_addresses: list[str] = field(default_factory=list)
+    cc_addresses: list[str] = field(default_factory=list)
+    html_body: Optional[str] = None
+    is_read: bool = False
+    is_flagged: bool = False
+    has_attachments: bool = False
+    attachments: list[AttachmentRecord] = field(default_factory=list)
+    in_reply_to: Optional[str] = None
+    references: list[str] = field(default_factory=list)
+    fingerprint: int = 0  # SimHash of subject and body (see app.email.fingerprint), 0 if unknown
+    bulk: bool = False  # mailing-list or automated mail (List-Id, Precedence, Auto-Submitted headers)
+
+    def to_dict(self) -> dict:
+        """JSON-ready dict keyed by field name (the store's format)."""
+        return {
+            "id": self.id,
+            "message_id": self.message_id,
+            "from_address": self.from_address,
+            "to_addresses": self.to_addresses,
+            "cc_addresses": self.cc_addresses,
+            "subject": self.subject,
+            "body": self.body,
+            "html_body": self.html_body,
+            "date": self.date.isoformat(),
+            "is_read": self.is_read,
+            "is_flagged": self.is_flagged,
+            "has_attachments": self.has_attachments,
+            "attachments": [
+                {"filename": a.filename, "content_type": a.content_type, "size": a.size}
+                for a in self.attachments
+            ],
+            "in_reply_to": self.in_reply_to,
+            "references": self.references,
+            "fingerprint": self.fingerprint,
+            "bulk": self.bulk,
+        }
+
+    def to_json(self) -> str:
+        """Serialize for the store (deterministic, so it can back an ETag)."""
+        return json.dumps(self.to_dict(), separators=(",", ":"), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: str) -> "EmailRecord":
+        """Load a record stored by to_json() (or by the former pydantic model)."""
+        values = json.loads(data)
+        # Records stored before dates were normalized may be naive
+        values["date"] = as_utc(datetime.fromisoformat(values["date"]))
+        values["attachments"] = [AttachmentRecord(**a) for a in values.get("attachments") or []]
+        return cls(**values)
+
+    def to_model(self) -> Email:
+        """Convert to the API model."""
+        return Email.model_validate(self, from_attributes=True)
+
+
+@dataclass(slots=True)
+class ThreadRecord:
+    """Cached messages of one conversation, oldest first."""
+
+    thread_id: str
+    messages: list[EmailRecord]
+
+    def to_model(self) -> EmailThread:
+        """Convert to the API model."""
+        return EmailThread.model_validate(self, from_attributes=True)
@@ -0,0 +1,257 @@
+"""Local similarity index over cached mail, used to give reply prompts related context."""
+
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+from app.email.records import EmailRecord, as_utc
+from app.email.store import MailStore
+
+logger = logging.getLogger(__name__)
+
+# Hashed feature space; each indexed message costs DIMENSIONS * 4 bytes
+DIMENSIONS = 2048
+# Only the start of each message is vectorized
+MAX_INDEX_TEXT_CHARS = 3000
+# Matches scoring below this cosine similarity are not worth prompt space
+MIN_SCORE = 0.15
+
+_WORD_RE = re.compile(r"[^\W\d_]{2,}", re.UNICODE)
+
+
+@dataclass(slots=True)
+class IndexEntry:
+    """Metadata of one indexed message; the text itself stays in the store."""
+
+    mailbox: str
+    uid: str
+    message_id: str
+    from_address: str
+    to_addresses: tuple[str, ...]
+    date: datetime
+    is_own: bool
+    record: Optional[EmailRecord] = None  # sent through the API but not cached yet
+
+
+@dataclass(slots=True)
+class RelatedMatch:
+    """An indexed message similar to a query email."""
+
+    entry: IndexEntry
+    score: float
+
+
+def _index_text(email: EmailRecord) -> str:
+    """Subject and unquoted body text of a message."""
+    body = "\n".join(
+        line for line in email.body[:MAX_INDEX_TEXT_CHARS].splitlines()
+        if not line.lstrip().startswith(">")
+    )
+    return f"{email.subject}\n{body}"
+
+
+def _features(text: str) -> tuple[np.ndarray, np.ndarray]:
+    """Hashed word features of a text: (dimensions, counts)."""
+    dims = [hash(word) % DIMENSIONS for word in _WORD_RE.findall(text.lower())]
+    if not dims:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    return np.unique(np.fromiter(dims, np.int64, len(dims)), return_counts=True)
+
+
+def _normalize_address(address: str) -> str:
+    """Bare lowercase address of "Name <addr>" or "addr"."""
+    start, end = address.rfind("<"), address.rfind(">")
+    if start != -1 and end > start:
+        address = address[start + 1:end]
+    return address.strip().lower()
+
+
+class RelatedIndex:
+    """
+    In-memory TF-IDF index over the messages cached in a MailStore.
+
+    Messages are vectorized with the hashing trick (no vocabulary to
+    maintain), weighted by sublinear term frequency and the inverse
+    document frequency known when they were added, and L2-normalized,
+    so a query is one matrix-vector product. The index catches up with
+    the store incrementally by rowid before every query, keeps the newest
+    ``max_messages`` (older rows are overwritten in place) and is rebuilt
+    from the store on restart.
+    Messages from ``own_address`` are treated as our replies.
+    """
+
+    def __init__(self, store: MailStore, own_address: str, max_messages: int = 5000):
+        """Create an empty index (filled from the store on first use)."""
+        self.store = store
+        self.own_address = own_address.strip().lower()
+        self.max_messages = max(1, max_messages)
+
+        # Rows [0, len(self._entries)) are in use; capacity grows by doubling
+        self._vectors = np.zeros((0, DIMENSIONS), np.float32)
+        self._entries: list[IndexEntry] = []
+        self._next_slot = 0  # oldest row, overwritten next once the index is full
+        self._df = np.zeros(DIMENSIONS, np.float64)
+        self._documents = 0
+        self._last_rowid = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of indexed messages."""
+        return len(self._entries)
+
+    def refresh(self) -> None:
+        """Index messages added to the store since the last refresh."""
+        with self._lock:
+            rows = self.store.emails_after(self._last_rowid, limit=self.max_messages)
+            if not rows:
+                return
+            self._last_rowid = max(rowid for rowid, _, _ in rows)
+            self._add([(mailbox, email, None) for _, mailbox, email in rows])
+
+    def add_sent(self, email: EmailRecord) -> None:
+        """Index a message we just sent, until the Sent folder copy is cached."""
+        with self._lock:
+            self._add([("", email, email)])
+
+    def _add(self, items: list[tuple[str, EmailRecord, Optional[EmailRecord]]]) -> None:
+        """Vectorize and append messages. Caller holds the lock."""
+        features = [_features(_index_text(email)) for _, email, _ in items]
+
+        # Count the whole batch first, so a cold start weights every row by the same idf
+        for dims, _ in features:
+            self._df[dims] += 1
+        self._documents += len(items)
+        idf = self._idf()
+
+        vectors = np.zeros((len(items), DIMENSIONS), np.float32)
+        for row, (dims, counts) in enumerate(features):
+            if len(dims):
+                weights = (1.0 + np.log(counts)) * idf[dims]
+                vectors[row, dims] = weights / np.linalg.norm(weights)
+
+        for row, (mailbox, email, record) in enumerate(items):
+            entry = IndexEntry(
+                mailbox=mailbox,
+                uid=email.id,
+                message_id=email.message_id.strip(),
+                from_address=_normalize_address(email.from_address),
+                to_addresses=tuple(
+                    _normalize_address(a) for a in email.to_addresses + email.cc_addresses
+                ),
+                date=email.date,
+                is_own=_normalize_address(email.from_address) == self.own_address,
+                record=record,
+            )
+            if len(self._entries) < self.max_messages:
+                slot = len(self._entries)
+                self._entries.append(entry)
+                if slot == len(self._vectors):
+                    self._grow()
+            else:
+                slot = self._next_slot
+                self._entries[slot] = entry
+                self._next_slot = (slot + 1) % self.max_messages
+            self._vectors[slot] = vectors[row]
+
+    def _grow(self) -> None:
+        """Double the vector capacity (up to max_messages). Caller holds the lock."""
+        capacity = min(max(2 * len(self._vectors), 64), self.max_messages)
+        grown = np.zeros((capacity, DIMENSIONS), np.float32)
+        grown[:len(self._vectors)] = self._vectors
+        self._vectors = grown
+
+    def _idf(self) -> np.ndarray:
+        """Smoothed inverse document frequency per dimension."""
+        return np.log((1.0 + self._documents) / (1.0 + self._df)) + 1.0
+
+    def search(
+        self, email: EmailRecord, k: int = 3, exclude: Optional[set[str]] = None
+    ) -> list[RelatedMatch]:
+        """
+        Find the indexed messages most similar to an email.
+
+        Args:
+            email: Query email
+            k: Maximum number of matches
+            exclude: Message-IDs to skip (the email itself is always skipped)
+
+        Returns:
+            Matches with cosine similarity of at least MIN_SCORE, best first
+        """
+        self.refresh()
+        skip = (exclude or set()) | {email.message_id.strip()}
+
+        with self._lock:
+            dims, counts = _features(_index_text(email))
+            if not len(dims) or not self._entries:
+                return []
+
+            weights = (1.0 + np.log(counts)) * self._idf()[dims]
+            query = (weights / np.linalg.norm(weights)).astype(np.float32)
+            # Only the query's own dimensions contribute to the dot products
+            scores = self._vectors[:len(self._entries), dims] @ query
+
+            # Over-fetch a little so skipped messages do not leave the result short
+            top = min(len(scores), k + len(skip) + 2)
+            candidates = np.argpartition(-scores, top - 1)[:top]
+
+            matches = []
+            for i in candidates[np.argsort(-scores[candidates])]:
+                entry = self._entries[i]
+                if scores[i] < MIN_SCORE:
+                    break
+                if entry.message_id and entry.message_id in skip:
+                    continue
+                matches.append(RelatedMatch(entry=entry, score=float(scores[i])))
+                if len(matches) == k:
+                    break
+            return matches
+
+    def last_reply_to(self, address: str, before: Optional[datetime] = None) -> Optional[IndexEntry]:
+        """Our most recent indexed message to an address (optionally before a date)."""
+        address = _normalize_address(address)
+        self.refresh()
+        with self._lock:
+            replies = [
+                entry for entry in self._entries
+                if entry.is_own and address in entry.to_addresses
+                and (before is None or entry.date < as_utc(before))
+            ]
+        return max(replies, key=lambda entry: entry.date, default=None)
+
+    def related_emails(
+        self, email: EmailRecord, k: int = 3, exclude: Optional[set[str]] = None
+    ) -> list[EmailRecord]:
+        """
+        Context for replying to an email: our last reply to its sender, then similar messages.
+
+        Args:
+            email: Email being replied to
+            k: Maximum number of messages
+            exclude: Message-IDs already in the prompt (e.g. the thread)
+
+        Returns:
+            Up to ``k`` cached messages, most useful first
+        """
+        skip = set(exclude or ())
+        entries: list[IndexEntry] = []
+
+        last = self.last_reply_to(email.from_address, before=email.date)
+        if last and not (last.message_id and last.message_id in skip):
+            entries.append(last)
+            skip.add(last.message_id)
+
+        entries += [
+            match.entry for match in self.search(email, k, skip) if match.entry is not last
+        ]
+        records = (self.load(entry) for entry in entries[:k])
+        return [record for record in records if record is not None]
+
+    def load(self, entry: IndexEntry) -> Optional[EmailRecord]:
+        """The full message of an index entry."""
+        return entry.record or self.store.get_email(entry.uid, entry.mailbox)
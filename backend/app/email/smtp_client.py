@@ -57,6 +57,16 @@ class SMTPClient:
             except Exception as e:
                 logger.error(f"Error disconnecting from SMTP: {e}")
 
+    def is_alive(self) -> bool:
+        """Check that the connection is still usable (for pooled reuse)."""
+        if not self._connected or not self.smtp:
+            return False
+        try:
+            status, _ = self.smtp.noop()
+            return status == 250
+        except Exception:
+            return False
+
     def _ensure_connected(self) -> None:
         """Ensure connection is established."""
         if not self._connected or not self.smtp:
@@ -0,0 +1,897 @@
+"""Local SQLite store for parsed emails, the full-text search index and thread links."""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from app.email.fingerprint import MAX_BANDED_DISTANCE, bands, hamming
+from app.email.models import (
+    EmailHeader,
+    EmailSummary,
+    SearchHit,
+    SearchResponse,
+)
+from app.email.records import EmailRecord, ThreadRecord, as_utc
+
+logger = logging.getLogger(__name__)
+
+# Seconds a write waits for another process's transaction before failing
+BUSY_TIMEOUT = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    mailbox TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    message_id TEXT NOT NULL DEFAULT '',
+    from_address TEXT NOT NULL DEFAULT '',
+    subject TEXT NOT NULL DEFAULT '',
+    date TEXT NOT NULL,
+    date_ts REAL NOT NULL DEFAULT 0,  -- date as a UTC Unix timestamp, for range queries
+    version INTEGER NOT NULL DEFAULT 0,  -- raised on every write, for incremental readers
+    data TEXT NOT NULL,
+    PRIMARY KEY (mailbox, uid)
+);
+
+CREATE INDEX IF NOT EXISTS idx_messages_message_id ON messages (message_id);
+
+-- Header cache for mailbox listings, valid for one UIDVALIDITY per mailbox
+CREATE TABLE IF NOT EXISTS message_headers (
+    mailbox TEXT NOT NULL,
+    uid INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (mailbox, uid)
+);
+
+CREATE TABLE IF NOT EXISTS mailbox_state (
+    mailbox TEXT PRIMARY KEY,
+    uidvalidity INTEGER NOT NULL
+);
+
+-- Highest UID the mailbox watcher has already processed
+CREATE TABLE IF NOT EXISTS sync_state (
+    mailbox TEXT PRIMARY KEY,
+    last_uid INTEGER NOT NULL
+);
+
+-- UID range [low_uid, high_uid] of a mailbox already stored by the backfill command
+CREATE TABLE IF NOT EXISTS backfill_state (
+    mailbox TEXT PRIMARY KEY,
+    low_uid INTEGER NOT NULL,
+    high_uid INTEGER NOT NULL
+);
+
+-- Messages inside that range the backfill fetched but could not parse, retried by its next run
+CREATE TABLE IF NOT EXISTS backfill_failures (
+    mailbox TEXT NOT NULL,
+    uid INTEGER NOT NULL,
+    PRIMARY KEY (mailbox, uid)
+);
+
+-- AI summaries, keyed like messages
+CREATE TABLE IF NOT EXISTS summaries (
+    mailbox TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (mailbox, uid)
+);
+
+-- Replies drafted ahead of time for high-priority mail
+CREATE TABLE IF NOT EXISTS drafts (
+    mailbox TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    tone TEXT NOT NULL,
+    reply_text TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (mailbox, uid, tone)
+);
+
+-- JWZ-style thread containers: one row per Message-ID seen either on a
+-- message or in another message's References/In-Reply-To chain.
+CREATE TABLE IF NOT EXISTS thread_links (
+    message_id TEXT PRIMARY KEY,
+    thread_id TEXT NOT NULL,
+    parent_id TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_thread_links_thread_id ON thread_links (thread_id);
+
+-- SimHash fingerprints split into bands: a locality-sensitive index in which
+-- near-duplicate messages share at least one band value
+CREATE TABLE IF NOT EXISTS fingerprints (
+    mailbox TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    fingerprint INTEGER NOT NULL,
+    band0 INTEGER NOT NULL,
+    band1 INTEGER NOT NULL,
+    band2 INTEGER NOT NULL,
+    band3 INTEGER NOT NULL,
+    PRIMARY KEY (mailbox, uid)
+);
+
+CREATE INDEX IF NOT EXISTS idx_fingerprints_band0 ON fingerprints (band0);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_band1 ON fingerprints (band1);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_band2 ON fingerprints (band2);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_band3 ON fingerprints (band3);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    subject,
+    sender,
+    recipients,
+    body,
+    attachments,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# bm25 column weights: subject, sender, recipients, body, attachments
+BM25_WEIGHTS = "10.0, 5.0, 3.0, 1.0, 2.0"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _to_signed(value: int) -> int:
+    """Map an unsigned 64-bit fingerprint onto SQLite's signed INTEGER range."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _timestamp(value: datetime | str) -> float:
+    """UTC Unix timestamp of a datetime or ISO date (naive values are taken as UTC)."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return as_utc(value).timestamp()
+
+
+def build_match_query(query: str) -> str:
+    """
+    Turn free-form user input into a safe FTS5 MATCH expression.
+
+    Every word becomes a quoted phrase (so FTS5 operators in user input
+    are never interpreted) and the last word is prefix-matched so results
+    update while the user is still typing.
+    """
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        return ""
+
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class MailStore:
+    """SQLite-backed cache of parsed emails with an FTS5 search index."""
+
+    def __init__(self, path: str):
+        """Open (and create if needed) the store at the given path."""
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Several worker processes may share the file: WAL lets readers
+        # proceed during writes, and writers wait for each other
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=BUSY_TIMEOUT)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._migrate()
+
+        logger.info(f"MailStore opened at {path}")
+
+    def _migrate(self) -> None:
+        """Bring a store created by an earlier version up to the current schema."""
+        with self._lock:
+            # Serialize with other processes opening the same file
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(messages)")}
+                if "date_ts" not in columns:
+                    # Dates were compared as ISO text, which ignores their UTC offsets
+                    self._conn.execute("ALTER TABLE messages ADD COLUMN date_ts REAL NOT NULL DEFAULT 0")
+                    rows = self._conn.execute("SELECT rowid, date FROM messages").fetchall()
+                    self._conn.executemany(
+                        "UPDATE messages SET date_ts = ? WHERE rowid = ?",
+                        [(_timestamp(row["date"]), row["rowid"]) for row in rows],
+                    )
+                    logger.info(f"Added UTC timestamps to {len(rows)} cached emails")
+                if "version" not in columns:
+                    # Readers followed new rowids only and missed rows updated in place
+                    self._conn.execute("ALTER TABLE messages ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+                    self._conn.execute("UPDATE messages SET version = rowid")
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_messages_date_ts ON messages (mailbox, date_ts)"
+                )
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_version ON messages (version)")
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def add_email(self, email: EmailRecord, mailbox: str = "INBOX") -> None:
+        """Insert or update a parsed email and its search index entry."""
+        self.add_emails([email], mailbox)
+
+    def add_emails(self, emails: list[EmailRecord], mailbox: str = "INBOX") -> None:
+        """Insert or update several parsed emails in a single transaction."""
+        if not emails:
+            return
+
+        with self._lock, self._conn:
+            version = self._next_version()
+            for email in emails:
+                self._upsert(email, mailbox, version)
+
+    def _next_version(self) -> int:
+        """
+        Version to stamp on the messages written by the current transaction.
+
+        The transaction is started with BEGIN IMMEDIATE (sqlite3 would only
+        begin one at the first write), so the write lock is held before the
+        current maximum is read: another process writing the same store
+        waits, and versions grow in commit order. A reader that remembers
+        the last one it saw thus finds every message inserted or changed
+        since. Caller holds the lock, inside ``with self._conn``.
+        """
+        if not self._conn.in_transaction:
+            self._conn.execute("BEGIN IMMEDIATE")
+        row = self._conn.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM messages").fetchone()
+        return row[0]
+
+    def _upsert(self, email: EmailRecord, mailbox: str, version: int) -> None:
+        """Write one email row and replace its FTS entry. Caller holds the lock."""
+        row = self._conn.execute(
+            "SELECT rowid FROM messages WHERE mailbox = ? AND uid = ?",
+            (mailbox, email.id),
+        ).fetchone()
+
+        values = (
+            email.message_id,
+            email.from_address,
+            email.subject,
+            email.date.isoformat(),
+            _timestamp(email.date),
+            version,
+            email.to_json(),
+        )
+
+        if row:
+            rowid = row["rowid"]
+            self._conn.execute(
+                "UPDATE messages SET message_id = ?, from_address = ?, subject = ?, "
+                "date = ?, date_ts = ?, version = ?, data = ? WHERE rowid = ?",
+                (*values, rowid),
+            )
+            self._conn.execute("DELETE FROM messages_fts WHERE rowid = ?", (rowid,))
+        else:
+            cursor = self._conn.execute(
+                "INSERT INTO messages (mailbox, uid, message_id, from_address, subject, "
+                "date, date_ts, version, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (mailbox, email.id, *values),
+            )
+            rowid = cursor.lastrowid
+
+        self._conn.execute(
+            "INSERT INTO messages_fts (rowid, subject, sender, recipients, body, attachments) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                rowid,
+                email.subject,
+                email.from_address,
+                " ".join(email.to_addresses + email.cc_addresses),
+                email.body,
+                " ".join(attachment.filename for attachment in email.attachments),
+            ),
+        )
+
+        self._link_thread(email, version)
+
+        if email.fingerprint:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fingerprints "
+                "(mailbox, uid, fingerprint, band0, band1, band2, band3) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (mailbox, email.id, _to_signed(email.fingerprint), *bands(email.fingerprint)),
+            )
+
+        if not row:
+            self._invalidate_thread_drafts(email, mailbox)
+
+    def _invalidate_thread_drafts(self, email: EmailRecord, mailbox: str) -> None:
+        """
+        Drop drafts written for other messages of this email's thread.
+
+        A newly arrived message changes what a reply should say, so drafts
+        prepared before it are stale. Caller holds the lock.
+        """
+        message_id = email.message_id.strip()
+        if not message_id:
+            return
+
+        self._conn.execute(
+            "DELETE FROM drafts WHERE rowid IN ("
+            "  SELECT d.rowid FROM drafts d"
+            "  JOIN messages m ON m.mailbox = d.mailbox AND m.uid = d.uid"
+            "  JOIN thread_links t ON t.message_id = m.message_id"
+            "  WHERE t.thread_id = (SELECT thread_id FROM thread_links WHERE message_id = ?)"
+            "  AND NOT (d.mailbox = ? AND d.uid = ?)"
+            ")",
+            (message_id, mailbox, email.id),
+        )
+
+    def _link_thread(self, email: EmailRecord, version: int) -> None:
+        """
+        Attach an email to its conversation thread. Caller holds the lock.
+
+        Follows the container step of the JWZ algorithm: every id in the
+        References chain gets a container whose parent is the id before
+        it, and the message's own container hangs off In-Reply-To (or the
+        last reference). Threads that turn out to share a container are
+        merged, so messages can be indexed in any order; messages moved to
+        another thread by a merge get the new version.
+        """
+        message_id = email.message_id.strip()
+        if not message_id:
+            return
+
+        chain = [ref for ref in email.references if ref and ref != message_id]
+        if email.in_reply_to and email.in_reply_to.strip() not in chain:
+            chain.append(email.in_reply_to.strip())
+
+        ids = chain + [message_id]
+        placeholders = ", ".join("?" for _ in ids)
+        rows = self._conn.execute(
+            f"SELECT message_id, thread_id FROM thread_links WHERE message_id IN ({placeholders})",
+            ids,
+        ).fetchall()
+        known = {row["message_id"]: row["thread_id"] for row in rows}
+
+        # Prefer the thread of the oldest known ancestor as the surviving id
+        thread_id = next((known[i] for i in ids if i in known), ids[0])
+
+        stale = {tid for tid in known.values() if tid != thread_id}
+        for old_id in stale:
+            self._conn.execute(
+                "UPDATE messages SET version = ? WHERE message_id != '' AND message_id IN ("
+                "  SELECT message_id FROM thread_links WHERE thread_id = ?"
+                ")",
+                (version, old_id),
+            )
+            self._conn.execute(
+                "UPDATE thread_links SET thread_id = ? WHERE thread_id = ?",
+                (thread_id, old_id),
+            )
+
+        parent = None
+        for ref in chain:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO thread_links (message_id, thread_id, parent_id) "
+                "VALUES (?, ?, ?)",
+                (ref, thread_id, parent),
+            )
+            parent = ref
+
+        # The message's own headers are authoritative for its parent link
+        self._conn.execute(
+            "INSERT INTO thread_links (message_id, thread_id, parent_id) VALUES (?, ?, ?) "
+            "ON CONFLICT(message_id) DO UPDATE SET thread_id = excluded.thread_id, "
+            "parent_id = excluded.parent_id",
+            (message_id, thread_id, parent),
+        )
+
+    @staticmethod
+    def etag_for(data: str) -> str:
+        """Strong ETag for a serialized email."""
+        return '"' + hashlib.sha1(data.encode()).hexdigest()[:20] + '"'
+
+    def get_etag(self, email_id: str, mailbox: str = "INBOX") -> str | None:
+        """Return the ETag of a cached email without deserializing it."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM messages WHERE mailbox = ? AND uid = ?",
+                (mailbox, email_id),
+            ).fetchone()
+        return self.etag_for(row["data"]) if row else None
+
+    def get_email(self, email_id: str, mailbox: str = "INBOX") -> EmailRecord | None:
+        """Return a cached email, or None if it has not been fetched yet."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM messages WHERE mailbox = ? AND uid = ?",
+                (mailbox, email_id),
+            ).fetchone()
+
+        if not row:
+            return None
+        return EmailRecord.from_json(row["data"])
+
+    def emails_after(self, rowid: int, limit: int) -> list[tuple[int, str, EmailRecord]]:
+        """
+        Return cached emails stored after the given rowid, for incremental indexing.
+
+        At most the newest ``limit`` are returned, oldest first, as
+        (rowid, mailbox, email) tuples.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rowid, mailbox, data FROM messages WHERE rowid > ? "
+                "ORDER BY rowid DESC LIMIT ?",
+                (rowid, limit),
+            ).fetchall()
+
+        return [
+            (row["rowid"], row["mailbox"], EmailRecord.from_json(row["data"]))
+            for row in reversed(rows)
+        ]
+
+    def emails_in_range(
+        self,
+        mailbox: str,
+        since: datetime,
+        until: datetime,
+        limit: int,
+    ) -> list[tuple[EmailRecord, str, EmailSummary | None]]:
+        """
+        Return cached emails dated within [since, until), newest first.
+
+        Each email comes with its thread id (its Message-ID or uid if it
+        is not threaded) and its stored summary, if any.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.data, t.thread_id, s.data AS summary FROM messages m "
+                "LEFT JOIN thread_links t ON t.message_id = m.message_id AND m.message_id != '' "
+                "LEFT JOIN summaries s ON s.mailbox = m.mailbox AND s.uid = m.uid "
+                "WHERE m.mailbox = ? AND m.date_ts >= ? AND m.date_ts < ? "
+                "ORDER BY m.date_ts DESC LIMIT ?",
+                (mailbox, _timestamp(since), _timestamp(until), limit),
+            ).fetchall()
+
+        results = []
+        for row in rows:
+            email = EmailRecord.from_json(row["data"])
+            summary = EmailSummary.model_validate_json(row["summary"]) if row["summary"] else None
+            results.append((email, row["thread_id"] or email.message_id.strip() or email.id, summary))
+        return results
+
+    def ranking_rows_after(self, version: int, rowid: int, limit: int) -> list[dict]:
+        """
+        Return the ranking signals of cached emails written after a position, oldest first.
+
+        Rows are ordered by (version, rowid), so a reader pages through
+        every message inserted or changed since the last row it saw. Only
+        the fields the priority index needs are extracted (no bodies),
+        with the thread id and the stored summary's priority and
+        action_required, if any.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.version, m.rowid, m.mailbox, m.uid, m.from_address, m.subject, m.date, "
+                "json_extract(m.data, '$.to_addresses') AS to_addresses, "
+                "json_extract(m.data, '$.cc_addresses') AS cc_addresses, "
+                "json_extract(m.data, '$.is_read') AS is_read, "
+                "json_extract(m.data, '$.is_flagged') AS is_flagged, "
+                "json_extract(m.data, '$.in_reply_to') AS in_reply_to, "
+                "json_extract(m.data, '$.bulk') AS bulk, "
+                "t.thread_id, "
+                "json_extract(s.data, '$.priority') AS priority, "
+                "json_extract(s.data, '$.action_required') AS action_required "
+                "FROM messages m "
+                "LEFT JOIN thread_links t ON t.message_id = m.message_id AND m.message_id != '' "
+                "LEFT JOIN summaries s ON s.mailbox = m.mailbox AND s.uid = m.uid "
+                "WHERE (m.version, m.rowid) > (?, ?) ORDER BY m.version, m.rowid LIMIT ?",
+                (version, rowid, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def summaries_after(self, rowid: int, limit: int) -> list[tuple[int, str, str, str, bool]]:
+        """
+        Return summaries stored (or replaced) after a rowid, oldest first.
+
+        Returns:
+            (rowid, mailbox, uid, priority, action_required) tuples
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rowid, mailbox, uid, json_extract(data, '$.priority') AS priority, "
+                "json_extract(data, '$.action_required') AS action_required "
+                "FROM summaries WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (rowid, limit),
+            ).fetchall()
+        return [
+            (row["rowid"], row["mailbox"], row["uid"], row["priority"], bool(row["action_required"]))
+            for row in rows
+        ]
+
+    def check_uidvalidity(self, mailbox: str, uidvalidity: int) -> bool:
+        """
+        Record a mailbox's UIDVALIDITY, dropping its cached data if it changed.
+
+        Returns:
+            True if previously cached UIDs for the mailbox are still valid
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT uidvalidity FROM mailbox_state WHERE mailbox = ?", (mailbox,)
+            ).fetchone()
+
+            if row and row["uidvalidity"] == uidvalidity:
+                return True
+
+            if row:
+                logger.warning(f"UIDVALIDITY changed for {mailbox}, clearing cached messages")
+                self._conn.execute("DELETE FROM message_headers WHERE mailbox = ?", (mailbox,))
+                self._conn.execute("DELETE FROM sync_state WHERE mailbox = ?", (mailbox,))
+                self._conn.execute("DELETE FROM backfill_state WHERE mailbox = ?", (mailbox,))
+                self._conn.execute("DELETE FROM backfill_failures WHERE mailbox = ?", (mailbox,))
+                self._conn.execute("DELETE FROM summaries WHERE mailbox = ?", (mailbox,))
+                self._conn.execute("DELETE FROM drafts WHERE mailbox = ?", (mailbox,))
+                self._conn.execute("DELETE FROM fingerprints WHERE mailbox = ?", (mailbox,))
+                self._conn.execute(
+                    "DELETE FROM messages_fts WHERE rowid IN "
+                    "(SELECT rowid FROM messages WHERE mailbox = ?)",
+                    (mailbox,),
+                )
+                self._conn.execute("DELETE FROM messages WHERE mailbox = ?", (mailbox,))
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO mailbox_state (mailbox, uidvalidity) VALUES (?, ?)",
+                (mailbox, uidvalidity),
+            )
+            return row is None
+
+    def get_last_uid(self, mailbox: str) -> int | None:
+        """Return the highest UID already processed by the watcher, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_uid FROM sync_state WHERE mailbox = ?", (mailbox,)
+            ).fetchone()
+        return row["last_uid"] if row else None
+
+    def set_last_uid(self, mailbox: str, uid: int) -> None:
+        """Record the highest UID processed by the watcher."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (mailbox, last_uid) VALUES (?, ?)",
+                (mailbox, uid),
+            )
+
+    def get_backfill_range(self, mailbox: str) -> tuple[int, int] | None:
+        """Return the (low, high) UID range the backfill has stored, if it ran."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT low_uid, high_uid FROM backfill_state WHERE mailbox = ?", (mailbox,)
+            ).fetchone()
+        return (row["low_uid"], row["high_uid"]) if row else None
+
+    def set_backfill_range(
+        self, mailbox: str, low_uid: int, high_uid: int, failed: list[int] | None = None
+    ) -> None:
+        """
+        Record the UID range the backfill has stored.
+
+        Args:
+            mailbox: Mailbox backfilled
+            low_uid: Lowest UID of the range
+            high_uid: Highest UID of the range
+            failed: UIDs the range now covers that could not be stored
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO backfill_state (mailbox, low_uid, high_uid) VALUES (?, ?, ?)",
+                (mailbox, low_uid, high_uid),
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO backfill_failures (mailbox, uid) VALUES (?, ?)",
+                [(mailbox, uid) for uid in failed or []],
+            )
+
+    def get_backfill_failures(self, mailbox: str) -> list[int]:
+        """Return the UIDs the backfill skipped because they could not be stored, ascending."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT uid FROM backfill_failures WHERE mailbox = ? ORDER BY uid", (mailbox,)
+            ).fetchall()
+        return [row["uid"] for row in rows]
+
+    def clear_backfill_failures(self, mailbox: str, uids: list[int]) -> None:
+        """Forget skipped UIDs that have since been stored or no longer exist."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM backfill_failures WHERE mailbox = ? AND uid = ?",
+                [(mailbox, uid) for uid in uids],
+            )
+
+    def clear_backfill_range(self, mailbox: str) -> None:
+        """Forget the backfill progress of a mailbox."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM backfill_state WHERE mailbox = ?", (mailbox,))
+            self._conn.execute("DELETE FROM backfill_failures WHERE mailbox = ?", (mailbox,))
+
+    def get_headers(self, mailbox: str, uids: list[int]) -> dict[int, EmailHeader]:
+        """Return cached headers for the given UIDs, keyed by UID."""
+        if not uids:
+            return {}
+
+        placeholders = ", ".join("?" for _ in uids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT uid, data FROM message_headers "
+                f"WHERE mailbox = ? AND uid IN ({placeholders})",
+                (mailbox, *uids),
+            ).fetchall()
+
+        return {row["uid"]: EmailHeader.model_validate_json(row["data"]) for row in rows}
+
+    def add_headers(self, mailbox: str, headers: list[EmailHeader]) -> None:
+        """Insert or refresh cached headers (including their flags)."""
+        if not headers:
+            return
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO message_headers (mailbox, uid, data) VALUES (?, ?, ?)",
+                [(mailbox, int(header.id), header.model_dump_json()) for header in headers],
+            )
+
+    def get_summary(self, email_id: str, mailbox: str = "INBOX") -> EmailSummary | None:
+        """Return the stored summary of an email, if one was generated."""
+        return self.get_summaries([email_id], mailbox).get(email_id)
+
+    def get_summaries(self, email_ids: list[str], mailbox: str = "INBOX") -> dict[str, EmailSummary]:
+        """Return stored summaries for the given emails, keyed by email id."""
+        if not email_ids:
+            return {}
+
+        placeholders = ", ".join("?" for _ in email_ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT uid, data FROM summaries WHERE mailbox = ? AND uid IN ({placeholders})",
+                (mailbox, *email_ids),
+            ).fetchall()
+
+        return {row["uid"]: EmailSummary.model_validate_json(row["data"]) for row in rows}
+
+    def save_summary(self, summary: EmailSummary, mailbox: str = "INBOX") -> None:
+        """Store (or replace) the summary of an email."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (mailbox, uid, data) VALUES (?, ?, ?)",
+                (mailbox, summary.email_id, summary.model_dump_json()),
+            )
+
+    def find_duplicate_summary(
+        self,
+        email: EmailRecord,
+        since: datetime,
+        max_distance: int = MAX_BANDED_DISTANCE,
+        mailbox: str = "INBOX",
+    ) -> EmailSummary | None:
+        """
+        Find the summary of an already-summarized near-duplicate of an email.
+
+        Candidates come from the band index, must be from the same sender
+        and dated no earlier than ``since``; the closest fingerprint wins.
+
+        Args:
+            email: Email to match (needs a fingerprint)
+            since: Oldest message date considered
+            max_distance: Largest Hamming distance counted as a duplicate
+                (capped at what the band index can guarantee to find)
+            mailbox: Mailbox of the email and its candidates
+
+        Returns:
+            The matching message's summary, or None
+        """
+        if not email.fingerprint or max_distance < 0:
+            return None
+
+        max_distance = min(max_distance, MAX_BANDED_DISTANCE)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT f.fingerprint, s.data FROM fingerprints f "
+                "JOIN messages m ON m.mailbox = f.mailbox AND m.uid = f.uid "
+                "JOIN summaries s ON s.mailbox = f.mailbox AND s.uid = f.uid "
+                "WHERE f.mailbox = ? AND f.uid != ? AND m.from_address = ? AND m.date_ts >= ? "
+                "AND (f.band0 = ? OR f.band1 = ? OR f.band2 = ? OR f.band3 = ?)",
+                (mailbox, email.id, email.from_address, _timestamp(since), *bands(email.fingerprint)),
+            ).fetchall()
+
+        matches = [
+            (hamming(email.fingerprint, row["fingerprint"] & ((1 << 64) - 1)), row["data"])
+            for row in rows
+        ]
+        matches = [match for match in matches if match[0] <= max_distance]
+        if not matches:
+            return None
+        return EmailSummary.model_validate_json(min(matches, key=lambda match: match[0])[1])
+
+    def get_draft(self, email_id: str, tone: str, mailbox: str = "INBOX") -> str | None:
+        """Return a pre-generated reply for an email in the given tone, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT reply_text FROM drafts WHERE mailbox = ? AND uid = ? AND tone = ?",
+                (mailbox, email_id, tone),
+            ).fetchone()
+        return row["reply_text"] if row else None
+
+    def save_draft(self, email_id: str, tone: str, reply_text: str, mailbox: str = "INBOX") -> None:
+        """Store a pre-generated reply."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO drafts (mailbox, uid, tone, reply_text) VALUES (?, ?, ?, ?)",
+                (mailbox, email_id, tone, reply_text),
+            )
+
+    def update_flags(
+        self,
+        mailbox: str,
+        uids: list[int],
+        is_read: bool | None = None,
+        is_flagged: bool | None = None,
+    ) -> None:
+        """Apply flag changes to cached emails and headers ahead of the server."""
+        changes = [
+            (field, value)
+            for field, value in (("is_read", is_read), ("is_flagged", is_flagged))
+            if value is not None
+        ]
+        if not uids or not changes:
+            return
+
+        placeholders = ", ".join("?" for _ in uids)
+        with self._lock, self._conn:
+            version = self._next_version()
+            for field, value in changes:
+                literal = "json('true')" if value else "json('false')"
+                self._conn.execute(
+                    f"UPDATE message_headers SET data = json_set(data, '$.{field}', {literal}) "
+                    f"WHERE mailbox = ? AND uid IN ({placeholders})",
+                    (mailbox, *uids),
+                )
+                self._conn.execute(
+                    f"UPDATE messages SET data = json_set(data, '$.{field}', {literal}), version = ? "
+                    f"WHERE mailbox = ? AND uid IN ({placeholders})",
+                    (version, mailbox, *(str(uid) for uid in uids)),
+                )
+
+    def cached_flags(self, mailbox: str, uids: list[int], field: str) -> dict[int, bool]:
+        """
+        Return the cached value of a flag field per message, for the messages cached.
+
+        Args:
+            mailbox: Mailbox of the messages
+            uids: Message UIDs
+            field: "is_read" or "is_flagged"
+        """
+        if field not in ("is_read", "is_flagged") or not uids:
+            return {}
+
+        placeholders = ", ".join("?" for _ in uids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT uid, json_extract(data, '$.{field}') AS value FROM message_headers "
+                f"WHERE mailbox = ? AND uid IN ({placeholders})",
+                (mailbox, *uids),
+            ).fetchall()
+            rows += self._conn.execute(
+                f"SELECT uid, json_extract(data, '$.{field}') AS value FROM messages "
+                f"WHERE mailbox = ? AND uid IN ({placeholders})",
+                (mailbox, *(str(uid) for uid in uids)),
+            ).fetchall()
+        return {int(row["uid"]): bool(row["value"]) for row in rows if row["value"] is not None}
+
+    def get_thread(self, email: EmailRecord) -> ThreadRecord:
+        """
+        Return every cached message in the same thread as the given email.
+
+        Messages are ordered oldest first. Only messages already in the
+        store are included; nothing is fetched from the mail server.
+        """
+        message_id = email.message_id.strip()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT thread_id FROM thread_links WHERE message_id = ?",
+                (message_id,),
+            ).fetchone() if message_id else None
+
+            if not row:
+                return ThreadRecord(thread_id=message_id or email.id, messages=[email])
+
+            thread_id = row["thread_id"]
+            rows = self._conn.execute(
+                "SELECT m.data FROM thread_links t "
+                "JOIN messages m ON m.message_id = t.message_id "
+                "WHERE t.thread_id = ?",
+                (thread_id,),
+            ).fetchall()
+
+        # The same message can be cached in several mailboxes (e.g. INBOX and Sent)
+        messages: dict[str, EmailRecord] = {}
+        for data_row in rows:
+            message = EmailRecord.from_json(data_row["data"])
+            messages.setdefault(message.message_id, message)
+        messages.setdefault(message_id, email)
+
+        return ThreadRecord(
+            thread_id=thread_id,
+            messages=sorted(messages.values(), key=lambda m: m.date.timestamp()),
+        )
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        mailbox: str | None = None,
+    ) -> SearchResponse:
+        """
+        Run a ranked full-text query against the local index.
+
+        Args:
+            query: Free-form search text
+            limit: Page size
+            offset: Number of hits to skip
+            mailbox: Restrict results to one mailbox (default: all)
+
+        Returns:
+            A page of hits ordered by relevance, plus the total hit count
+        """
+        match = build_match_query(query)
+        if not match:
+            return SearchResponse(query=query, total=0, limit=limit, offset=offset, results=[])
+
+        where = "messages_fts MATCH ?"
+        params: list = [match]
+        if mailbox:
+            where += " AND m.mailbox = ?"
+            params.append(mailbox)
+
+        with self._lock:
+            total = self._conn.execute(
+                f"SELECT COUNT(*) FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid "
+                f"WHERE {where}",
+                params,
+            ).fetchone()[0]
+
+            rows = self._conn.execute(
+                f"SELECT m.uid, m.mailbox, m.from_address, m.subject, m.date, "
+                f"snippet(messages_fts, 3, '', '', '…', 16) AS snippet, "
+                f"bm25(messages_fts, {BM25_WEIGHTS}) AS score "
+                f"FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid "
+                f"WHERE {where} ORDER BY score LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+
+        results = [
+            SearchHit(
+                email_id=row["uid"],
+                mailbox=row["mailbox"],
+                from_address=row["from_address"],
+                subject=row["subject"],
+                date=row["date"],
+                snippet=row["snippet"],
+                # bm25() is lower-is-better; expose a higher-is-better score
+                score=-row["score"],
+            )
+            for row in rows
+        ]
+
+        return SearchResponse(
+            query=query,
+            total=total,
+            limit=limit,
+            offset=offset,
+            results=results,
+        )
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
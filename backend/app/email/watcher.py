@@ -0,0 +1,103 @@
+"""Background watcher that polls a mailbox for newly arrived email."""
+
+import asyncio
+import inspect
+import logging
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional, Union
+
+from app.email.records import EmailRecord
+
+if TYPE_CHECKING:
+    from app.core.accounts import MailAccount
+
+logger = logging.getLogger(__name__)
+
+NewEmailListener = Callable[["MailAccount", list[EmailRecord]], Union[None, Awaitable[None]]]
+
+# Upper bound on the retry delay after repeated poll failures (seconds)
+MAX_BACKOFF = 900
+
+
+class MailboxWatcher:
+    """
+    Polls one mailbox of an account and reports messages with new UIDs.
+
+    The highest processed UID is kept in the account's store, so a
+    restart only reports mail that arrived while the backend was down.
+    Listeners are called with the account and the new emails after each
+    poll that found any.
+    """
+
+    def __init__(self, account: "MailAccount", mailbox: str = "INBOX"):
+        """Create a watcher for the given account mailbox."""
+        self.account = account
+        self.mailbox = mailbox
+        self.interval = account.settings.check_interval
+        self._listeners: list[NewEmailListener] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_listener(self, listener: NewEmailListener) -> None:
+        """Register a callback (sync or async) for newly arrived emails."""
+        self._listeners.append(listener)
+
+    def start(self) -> None:
+        """Start polling in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(
+                self._run(), name=f"watcher-{self.account.id}-{self.mailbox}"
+            )
+
+    async def stop(self) -> None:
+        """Stop polling and wait for the task to finish."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        """Poll forever, backing off exponentially while the server is failing."""
+        failures = 0
+        while True:
+            try:
+                await self.poll()
+                failures = 0
+                delay = self.interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                delay = min(self.interval * 2**failures, MAX_BACKOFF)
+                logger.error(
+                    f"Watcher for account {self.account.id} failed ({failures}x), "
+                    f"retrying in {delay}s: {e}"
+                )
+            await asyncio.sleep(delay)
+
+    async def poll(self) -> list[EmailRecord]:
+        """Check the mailbox once and notify listeners about new emails."""
+        store = self.account.store
+        since_uid = store.get_last_uid(self.mailbox)
+
+        emails, last_uid = await self.account.run_imap(
+            lambda imap: imap.fetch_new_emails(self.mailbox, since_uid)
+        )
+
+        if last_uid != since_uid:
+            store.set_last_uid(self.mailbox, last_uid)
+
+        if emails:
+            await self._notify(emails)
+        return emails
+
+    async def _notify(self, emails: list[EmailRecord]) -> None:
+        """Call every listener, isolating their failures from each other."""
+        for listener in self._listeners:
+            try:
+                result = listener(self.account, emails)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"New-email listener {listener!r} failed: {e}")
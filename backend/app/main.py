@@ -1,12 +1,18 @@
 """FastAPI application entry point."""
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
+from app.agent.draft_worker import get_draft_worker
+from app.agent.summary_worker import get_summary_worker
 from app.config import get_settings
+from app.core.accounts import get_accounts
+from app.core.leader import LeaderLock
 
 # Configure logging
 settings = get_settings()
@@ -17,13 +23,46 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def run_background_jobs(leader: LeaderLock) -> None:
+    """Once this worker is elected leader, start the watchers and background workers."""
+    await leader.wait_for_leadership(settings.leader_retry_interval)
+
+    accounts = get_accounts()
+    summary_worker = get_summary_worker()
+    draft_worker = get_draft_worker()
+    if settings.summary_worker_enabled:
+        for account in accounts.all():
+            account.watcher.add_listener(summary_worker.enqueue)
+        summary_worker.start()
+    if settings.speculative_drafts_enabled:
+        summary_worker.add_listener(draft_worker.on_summary)
+        draft_worker.start()
+    if settings.watcher_enabled:
+        accounts.start()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events."""
     logger.info(f"Starting {settings.app_name} v{app.version}")
     logger.info(f"Backend running on {settings.backend_host}:{settings.backend_port}")
+
+    # With several workers only the leader polls IMAP and summarizes; the
+    # others serve summaries, drafts and caches from the shared store
+    accounts = get_accounts()
+    leader = LeaderLock(settings.leader_lock_path)
+    background = asyncio.create_task(run_background_jobs(leader), name="leader-election")
+
     yield
+
     logger.info(f"Shutting down {settings.app_name}")
+    background.cancel()
+    await asyncio.gather(background, return_exceptions=True)
+    # Workers first: their in-flight jobs still write to the account stores
+    await get_summary_worker().stop()
+    await get_draft_worker().stop()
+    await accounts.stop()
+    leader.release()
 
 
 # Create FastAPI app
@@ -34,6 +73,14 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Compress larger responses (brotli when the optional extra is installed, gzip otherwise)
+try:
+    from brotli_asgi import BrotliMiddleware
+
+    app.add_middleware(BrotliMiddleware, minimum_size=1024)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Configure CORS for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -65,10 +112,11 @@ async def health():
 
 
 # Import and include API routers
-from app.api import agent, emails
+from app.api import agent, batch, emails
 
 app.include_router(emails.router, prefix="/api/emails", tags=["emails"])
 app.include_router(agent.router, prefix="/api/agent", tags=["agent"])
+app.include_router(batch.router, prefix="/api", tags=["batch"])
 
 
 if __name__ == "__main__":
@@ -79,4 +127,5 @@ if __name__ == "__main__":
         host=settings.backend_host,
         port=settings.backend_port,
         reload=settings.debug,
+        workers=None if settings.debug else settings.workers,
     )
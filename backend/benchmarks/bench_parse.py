@@ -0,0 +1,101 @@
+"""
+Parse-to-model cost per 1,000 messages.
+
+Compares the internal path (raw bytes -> EmailRecord, converted to the API
+model only when served) with building a pydantic model that validates
+every address with EmailStr, as every parsed message used to.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_parse [--messages 1000] [--rounds 5]
+"""
+
+import argparse
+import email
+import time
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.utils import format_datetime
+
+from pydantic import EmailStr
+
+from app.email.imap_client import parse_email_message
+from app.email.models import Email
+from app.email.records import EmailRecord
+
+
+class ValidatedEmail(Email):
+    """The former API model: every address checked by email-validator."""
+
+    from_address: EmailStr
+    to_addresses: list[EmailStr] = []
+    cc_addresses: list[EmailStr] = []
+
+
+def make_messages(count: int) -> list[bytes]:
+    """Build ``count`` synthetic multipart messages."""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    messages = []
+    for i in range(count):
+        msg = EmailMessage()
+        msg["From"] = f"Sender {i} <sender{i}@example.com>"
+        msg["To"] = f"me@example.com, team{i % 7}@example.org"
+        msg["Cc"] = f"cc{i % 11}@example.net"
+        msg["Subject"] = f"Quarterly report #{i}"
+        msg["Message-ID"] = f"<msg{i}@example.com>"
+        msg["Date"] = format_datetime(start + timedelta(minutes=i))
+        if i % 3:
+            msg["In-Reply-To"] = f"<msg{i - 1}@example.com>"
+            msg["References"] = f"<msg0@example.com> <msg{i - 1}@example.com>"
+        body = f"Hello,\n\nPlease find the numbers for item {i} below.\n\n" + "Lorem ipsum. " * 40
+        msg.set_content(body)
+        msg.add_alternative(f"<html><body><p>{body}</p></body></html>", subtype="html")
+        messages.append(msg.as_bytes())
+    return messages
+
+
+def parse_records(raw: list[bytes]) -> list[EmailRecord]:
+    """Raw bytes to internal records."""
+    return [parse_email_message(str(i), email.message_from_bytes(data)) for i, data in enumerate(raw)]
+
+
+def timed(func, *args) -> tuple[float, object]:
+    """Run ``func`` and return (seconds, result)."""
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    raw = make_messages(args.messages)
+    per_1k = 1000 / args.messages
+    results: dict[str, list[float]] = {
+        "parse (bytes -> EmailRecord)": [],
+        "EmailRecord -> Email (API boundary)": [],
+        "EmailRecord -> validated Email (EmailStr)": [],
+    }
+
+    for _ in range(args.rounds):
+        seconds, records = timed(parse_records, raw)
+        results["parse (bytes -> EmailRecord)"].append(seconds)
+
+        seconds, _ = timed(lambda: [r.to_model() for r in records])
+        results["EmailRecord -> Email (API boundary)"].append(seconds)
+
+        seconds, _ = timed(
+            lambda: [ValidatedEmail.model_validate(r, from_attributes=True) for r in records]
+        )
+        results["EmailRecord -> validated Email (EmailStr)"].append(seconds)
+
+    print(f"{args.messages} messages, best of {args.rounds} rounds, ms per 1,000 messages:")
+    for name, samples in results.items():
+        print(f"  {name:<44} {min(samples) * per_1k * 1000:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
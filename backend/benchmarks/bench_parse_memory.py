@@ -0,0 +1,95 @@
+"""
+Peak memory of parsing one large message.
+
+Compares the former path (the whole literal read into memory, then
+``email.message_from_bytes`` and every part decoded) with the streaming
+parser fed the literal in socket-sized chunks, as ``_fetch_email_by_id``
+now does. The message is written to a temporary file first, so neither
+side is charged for generating it.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_parse_memory [--attachment-mb 30] [--attachments 1]
+"""
+
+import argparse
+import email
+import os
+import tempfile
+import time
+import tracemalloc
+from email.message import EmailMessage
+
+from app.email.imap_client import parse_email_message, parse_email_stream
+from app.email.imap_transport import READ_SIZE
+from app.email.mime_stream import MimeStreamParser
+
+
+def make_message(attachment_mb: float, attachments: int) -> bytes:
+    """Build a message with a text and HTML body and large binary attachments."""
+    msg = EmailMessage()
+    msg["From"] = "Sender <sender@example.com>"
+    msg["To"] = "me@example.com"
+    msg["Subject"] = "Scans attached"
+    msg["Message-ID"] = "<large@example.com>"
+    body = "Hello,\n\nThe scans are attached.\n\n" + "Lorem ipsum dolor sit amet. " * 200
+    msg.set_content(body)
+    msg.add_alternative(f"<html><body><p>{body}</p></body></html>", subtype="html")
+    for i in range(attachments):
+        payload = os.urandom(int(attachment_mb * 1024 * 1024))
+        msg.add_attachment(payload, maintype="application", subtype="pdf", filename=f"scan{i}.pdf")
+    return msg.as_bytes()
+
+
+def parse_buffered(path: str):
+    """Former path: the literal whole in memory, then a full message tree."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    return parse_email_message("1", email.message_from_bytes(raw))
+
+
+def parse_streaming(path: str):
+    """Streaming path: the literal fed to the parser as it is read."""
+    parser = MimeStreamParser()
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_SIZE):
+            parser.feed(chunk)
+    return parse_email_stream("1", parser)
+
+
+def measure(func, path: str) -> tuple[float, float, object]:
+    """Run ``func`` and return (peak MB allocated, seconds, result)."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(path)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6, seconds, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--attachment-mb", type=float, default=30)
+    parser.add_argument("--attachments", type=int, default=1)
+    args = parser.parse_args()
+
+    raw = make_message(args.attachment_mb, args.attachments)
+    with tempfile.NamedTemporaryFile(suffix=".eml", delete=False) as f:
+        f.write(raw)
+        path = f.name
+    size_mb = len(raw) / 1e6
+    del raw
+
+    try:
+        print(f"Message of {size_mb:.1f} MB ({args.attachments} x {args.attachment_mb:g} MB attachments):")
+        for name, func in (("buffered (message_from_bytes)", parse_buffered), ("streaming (MimeStreamParser)", parse_streaming)):
+            peak, seconds, record = measure(func, path)
+            sizes = ", ".join(f"{a.size / 1e6:.1f} MB" for a in record.attachments)
+            print(f"  {name:<30} peak {peak:7.1f} MB  {seconds * 1000:7.0f} ms  attachments: {sizes}")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
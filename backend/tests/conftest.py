@@ -0,0 +1,18 @@
+"""Shared fixtures."""
+
+import pytest
+
+from app.config import Settings
+
+
+@pytest.fixture
+def settings(tmp_path) -> Settings:
+    """Settings independent of the environment, with data files under a temporary directory."""
+    return Settings(
+        _env_file=None,
+        anthropic_api_key="test-key",
+        email_address="me@example.com",
+        email_password="password",
+        local_store_path=str(tmp_path / "email_agent.db"),
+        llm_usage_path=str(tmp_path / "email_agent.usage.db"),
+    )
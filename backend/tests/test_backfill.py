@@ -0,0 +1,96 @@
+"""Tests for the backfill checkpoint around messages that fail to parse."""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import pytest
+
+from app import backfill
+from app.backfill import Backfill
+from app.email.records import EmailRecord
+from app.email.store import MailStore
+
+
+class FakeIMAP:
+    """Serves raw messages by UID; the store's messages are parsed by parse_chunk."""
+
+    uids: list[int] = []
+
+    def __init__(self, settings, store):
+        pass
+
+    def select_mailbox(self, mailbox, readonly=False):
+        return 1
+
+    def search_uids(self):
+        return list(self.uids)
+
+    def fetch_raw(self, uids):
+        return [(uid, b"raw", False, False) for uid in uids if uid in self.uids]
+
+    def disconnect(self):
+        pass
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MailStore(str(tmp_path / "store.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def broken(monkeypatch):
+    """UIDs that fail to parse (may be changed by the test)."""
+    failing = set()
+
+    def parse_chunk(items):
+        return [
+            EmailRecord(
+                id=str(uid),
+                message_id=f"<{uid}@example.com>",
+                from_address="a@example.com",
+                subject=f"Subject {uid}",
+                body="",
+                date=datetime(2025, 10, 14, tzinfo=timezone.utc),
+            )
+            for uid, _, _, _ in items
+            if uid not in failing
+        ]
+
+    monkeypatch.setattr(backfill, "IMAPClient", FakeIMAP)
+    monkeypatch.setattr(backfill, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(backfill, "parse_chunk", parse_chunk)
+    return failing
+
+
+def test_failed_messages_are_recorded_and_retried(settings, store, broken):
+    FakeIMAP.uids = list(range(1, 11))
+    broken |= {4, 8}
+
+    stats = Backfill(settings, store, chunk_size=3, workers=1).run()
+    assert (stats.stored, stats.failed) == (8, 2)
+    assert store.get_backfill_range("INBOX") == (1, 10)
+    assert store.get_backfill_failures("INBOX") == [4, 8]
+    assert store.get_email("4") is None
+
+    # 4 parses now; 8 was expunged
+    broken.clear()
+    FakeIMAP.uids = [uid for uid in range(1, 12) if uid != 8]
+    stats = Backfill(settings, store, chunk_size=3, workers=1).run()
+    assert (stats.total, stats.stored, stats.failed) == (2, 2, 0)
+    assert store.get_email("4") is not None
+    assert store.get_backfill_failures("INBOX") == []
+    assert store.get_backfill_range("INBOX") == (1, 11)
+
+
+def test_restart_forgets_failures(settings, store, broken):
+    FakeIMAP.uids = [1, 2, 3]
+    broken.add(2)
+    Backfill(settings, store, workers=1).run()
+    assert store.get_backfill_failures("INBOX") == [2]
+
+    Backfill(settings, store, workers=1).run(restart=True)
+    assert store.get_backfill_failures("INBOX") == [2]
+    store.clear_backfill_range("INBOX")
+    assert store.get_backfill_failures("INBOX") == []
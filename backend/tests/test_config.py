@@ -0,0 +1,53 @@
+"""Tests for the validation of additional account ids."""
+
+import pytest
+from pydantic import ValidationError
+
+from app.config import AccountConfig, Settings
+
+
+def account(account_id: str) -> dict:
+    return {"id": account_id, "email_address": f"{account_id}@example.com", "email_password": "password"}
+
+
+def settings_with(*ids: str, **fields) -> Settings:
+    return Settings(
+        _env_file=None,
+        anthropic_api_key="test-key",
+        email_address="me@example.com",
+        email_password="password",
+        accounts=[account(account_id) for account_id in ids],
+        **fields,
+    )
+
+
+def test_valid_ids_get_their_own_store():
+    settings = settings_with("support", "Sales_2-eu")
+    paths = [settings.for_account(config).local_store_path for config in settings.accounts]
+    assert paths == ["data/email_agent.support.db", "data/email_agent.Sales_2-eu.db"]
+
+
+@pytest.mark.parametrize("account_id", ["", "../etc", "a/b", "a\\b", ".hidden", "-x", "a b", "é", "x" * 65])
+def test_ids_unsafe_in_file_names_are_rejected(account_id):
+    with pytest.raises(ValidationError, match="Invalid account id"):
+        AccountConfig(**account(account_id))
+
+
+@pytest.mark.parametrize("account_id", ["usage", "sessions", "Sessions"])
+def test_ids_colliding_with_data_files_are_rejected(account_id):
+    with pytest.raises(ValidationError, match="reserved"):
+        settings_with(account_id)
+
+
+def test_reserved_ids_follow_the_configured_paths():
+    settings = settings_with("usage", llm_usage_path="data/usage.db")
+    assert settings.accounts[0].id == "usage"
+
+    with pytest.raises(ValidationError, match="LEADER_LOCK_PATH"):
+        settings_with("lock", leader_lock_path="data/email_agent.lock.db")
+
+
+@pytest.mark.parametrize("ids", [("support", "support"), ("support", "SUPPORT"), ("default",)])
+def test_duplicate_ids_are_rejected(ids):
+    with pytest.raises(ValidationError, match="Duplicate account id"):
+        settings_with(*ids)
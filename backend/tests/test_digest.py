@@ -0,0 +1,71 @@
+"""Tests for grouping and batching in the digest builder."""
+
+from datetime import datetime, timedelta, timezone
+
+from app.agent.digest import group_emails, pack
+from app.agent.summary_worker import estimate_tokens
+from app.email.models import EmailPriority, EmailSummary
+from app.email.records import EmailRecord
+
+START = datetime(2025, 10, 14, tzinfo=timezone.utc)
+
+
+def row(uid: int, sender: str, thread: str, priority=EmailPriority.MEDIUM, action=False, read=True):
+    email = EmailRecord(
+        id=str(uid),
+        message_id=f"<{uid}@example.com>",
+        from_address=sender,
+        subject=f"Subject {uid}",
+        body="",
+        date=START + timedelta(hours=uid),
+        is_read=read,
+    )
+    summary = EmailSummary(email_id=str(uid), summary=f"Summary {uid}", priority=priority, action_required=action)
+    return email, thread, summary
+
+
+def test_pack_keeps_order_within_budget():
+    texts = ["a" * 40, "b" * 40, "c" * 40, "d" * 200, "e" * 4]
+    budget = 25
+    batches = pack(texts, budget)
+    assert batches == [[0, 1], [2], [3], [4]]
+    for batch in batches:
+        if len(batch) > 1:
+            assert sum(estimate_tokens(texts[i]) for i in batch) <= budget
+
+
+def test_pack_empty():
+    assert pack([], 100) == []
+
+
+def test_group_by_thread_ranks_groups():
+    rows = [
+        row(5, "Carol <carol@example.com>", "t3"),
+        row(4, "Bob <bob@example.com>", "t2", priority=EmailPriority.HIGH),
+        row(3, "alice@example.com", "t1"),
+        row(2, "bob@example.com", "t2"),
+        row(1, "alice@example.com", "t1", action=True),
+    ]
+    groups = group_emails(rows, "thread")
+    assert [group.key for group in groups] == ["t2", "t1", "t3"]
+    assert [email.id for email in groups[0].emails] == ["4", "2"]
+    assert groups[0].priority == EmailPriority.HIGH
+    assert groups[1].action_required and not groups[2].action_required
+
+
+def test_group_by_sender_uses_bare_addresses():
+    rows = [
+        row(3, "Bob <BOB@example.com>", "t1"),
+        row(2, "alice@example.com", "t2"),
+        row(1, "bob@example.com", "t3"),
+    ]
+    groups = group_emails(rows, "sender")
+    assert {group.key: [e.id for e in group.emails] for group in groups} == {
+        "bob@example.com": ["3", "1"],
+        "alice@example.com": ["2"],
+    }
+
+
+def test_ties_are_broken_by_the_newest_message():
+    rows = [row(2, "a@example.com", "t2"), row(1, "b@example.com", "t1")]
+    assert [group.key for group in group_emails(rows, "thread")] == ["t2", "t1"]
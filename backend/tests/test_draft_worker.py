@@ -0,0 +1,73 @@
+"""Tests for speculative drafts using the same context as on-demand replies."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.agent.draft_worker import DraftWorker
+from app.agent.prompts import EmailTone
+from app.core.accounts import MailAccount
+from app.email.records import EmailRecord
+
+START = datetime(2025, 10, 14, tzinfo=timezone.utc)
+
+
+def record(uid: int, subject: str, body: str, **fields) -> EmailRecord:
+    values = {
+        "id": str(uid),
+        "message_id": f"<{uid}@example.com>",
+        "from_address": "alice@example.com",
+        "to_addresses": ["me@example.com"],
+        "subject": subject,
+        "body": body,
+        "date": START + timedelta(hours=uid),
+    }
+    values.update(fields)
+    return EmailRecord(**values)
+
+
+class FakeAgent:
+    """Records the context generate_reply was called with."""
+
+    def __init__(self):
+        self.calls: list[dict] = []
+
+    def generate_reply(self, **kwargs) -> str:
+        self.calls.append(kwargs)
+        return "Draft reply"
+
+
+@pytest.fixture
+def account(settings):
+    account = MailAccount("default", settings)
+    account.store.add_emails([
+        record(1, "Invoice 1041 overdue", "The invoice 1041 for the hosting contract is overdue."),
+        record(2, "Lunch", "Shall we meet for lunch on Friday?"),
+        record(3, "Re: Invoice 1041 overdue", "Reminder: invoice 1041 for hosting is still overdue.",
+               in_reply_to="<9@example.com>", references=["<9@example.com>"]),
+    ])
+    yield account
+    account.close()
+
+
+def test_draft_gets_thread_and_related_context(account):
+    email = account.store.get_email("3")
+    thread, related = account.reply_context(email)
+    assert related, "the related index should find the earlier invoice"
+
+    agent = FakeAgent()
+    worker = DraftWorker(agent, EmailTone.PROFESSIONAL, daily_token_budget=100_000)
+    asyncio.run(worker._draft(account, email))
+
+    assert len(agent.calls) == 1
+    call = agent.calls[0]
+    assert [m.id for m in call["thread"]] == [m.id for m in thread]
+    assert [m.id for m in call["related"]] == [m.id for m in related]
+    assert account.store.get_draft("3", EmailTone.PROFESSIONAL.value) == "Draft reply"
+
+
+def test_related_context_can_be_turned_off(account):
+    account.settings = account.settings.model_copy(update={"related_context_max_tokens": 0})
+    _, related = account.reply_context(account.store.get_email("3"))
+    assert related == []
@@ -0,0 +1,74 @@
+"""Tests for the agent's draft edits and lenient summary parsing."""
+
+from langchain_core.messages import AIMessage
+
+from app.agent.email_agent import apply_edits, repair_summary_output
+from app.agent.models import DraftEdit
+from app.email.models import EmailPriority, EmailSentiment
+
+DRAFT = "Hi Bob,\n\nThanks for the update. I can meet on Tuesday.\n\nBest,\nAlice"
+
+
+def test_apply_edits_in_order():
+    edits = [
+        DraftEdit(find="Tuesday", replace="Wednesday at 10"),
+        DraftEdit(find="Wednesday at 10.", replace="Wednesday at 10. See you then."),
+    ]
+    assert apply_edits(DRAFT, edits) == (
+        "Hi Bob,\n\nThanks for the update. I can meet on Wednesday at 10. See you then.\n\nBest,\nAlice"
+    )
+
+
+def test_apply_edits_deletes_passages():
+    edits = [DraftEdit(find="Thanks for the update. ", replace="")]
+    assert apply_edits(DRAFT, edits) == "Hi Bob,\n\nI can meet on Tuesday.\n\nBest,\nAlice"
+    assert apply_edits(DRAFT, []) == DRAFT
+
+
+def test_apply_edits_refuses_missing_or_ambiguous_passages():
+    assert apply_edits(DRAFT, [DraftEdit(find="Friday", replace="Monday")]) is None
+    assert apply_edits(DRAFT, [DraftEdit(find="e", replace="E")]) is None
+    assert apply_edits(DRAFT, [DraftEdit(find="", replace="x")]) is None
+
+
+def test_repair_from_tool_call_arguments():
+    message = AIMessage(
+        content="",
+        tool_calls=[{
+            "name": "EmailSummary",
+            "id": "call_1",
+            "args": {
+                "summary": " Invoice due Friday. ",
+                "key_points": "- Amount: 120 EUR\n- Due Friday\n\n- Pay by card\n- Extra",
+                "sentiment": "Positive",
+                "priority": "urgent",
+                "action_required": "yes",
+            },
+        }],
+    )
+    assert repair_summary_output(message) == {
+        "summary": "Invoice due Friday.",
+        "key_points": ["Amount: 120 EUR", "Due Friday", "Pay by card"],
+        "sentiment": EmailSentiment.POSITIVE,
+        "priority": EmailPriority.MEDIUM,
+        "action_required": True,
+        "suggested_actions": [],
+    }
+
+
+def test_repair_from_json_in_text():
+    message = AIMessage(content=(
+        "Here is the summary:\n```json\n"
+        '{"summary": "Lunch moved to noon", "priority": "low", "action_required": False,}\n'
+        "```"
+    ))
+    repaired = repair_summary_output(message)
+    assert repaired["summary"] == "Lunch moved to noon"
+    assert repaired["priority"] == EmailPriority.LOW
+    assert repaired["action_required"] is False
+    assert repaired["sentiment"] == EmailSentiment.NEUTRAL
+
+
+def test_repair_gives_up_without_a_summary():
+    assert repair_summary_output(AIMessage(content="I cannot summarize this email.")) is None
+    assert repair_summary_output(AIMessage(content='{"summary": "  ", "priority": "high"}')) is None
@@ -0,0 +1,55 @@
+"""Tests for message dates: always timezone-aware, so any two compare."""
+
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.agent.email_agent import EmailAgent
+from app.email.imap_client import parse_date, parse_email_bytes
+from app.email.records import EmailRecord
+
+
+def message(uid: str, date: str, message_id: str, in_reply_to: str = "") -> EmailRecord:
+    headers = f"From: a@example.com\r\nSubject: Hi\r\nMessage-ID: {message_id}\r\nDate: {date}\r\n"
+    if in_reply_to:
+        headers += f"In-Reply-To: {in_reply_to}\r\n"
+    return parse_email_bytes(uid, (headers + f"\r\nBody of {uid}\r\n").encode())
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "Mon, 13 Oct 2025 09:30:00 +0200",
+        "Mon, 13 Oct 2025 09:30:00 -0000",
+        "not a date",
+        "",
+        None,
+    ],
+)
+def test_parse_date_is_aware(value):
+    assert parse_date(value).tzinfo is not None
+
+
+def test_parse_date_keeps_instant():
+    parsed = parse_date("Mon, 13 Oct 2025 09:30:00 +0200")
+    assert parsed == datetime(2025, 10, 13, 7, 30, tzinfo=timezone.utc)
+
+
+def test_naive_stored_record_loads_aware():
+    record = message("1", "Mon, 13 Oct 2025 09:30:00 +0000", "<1@x>")
+    data = json.loads(record.to_json())
+    data["date"] = "2025-10-13T09:30:00"
+    assert EmailRecord.from_json(json.dumps(data)).date.tzinfo is not None
+
+
+def test_thread_context_with_mixed_dates(settings):
+    thread = [
+        message("1", "Mon, 13 Oct 2025 09:30:00 -0000", "<1@x>"),
+        message("2", "garbage", "<2@x>", in_reply_to="<1@x>"),
+        message("3", "Mon, 13 Oct 2025 12:00:00 +0200", "<3@x>", in_reply_to="<2@x>"),
+    ]
+    agent = SimpleNamespace(settings=settings)
+    context = EmailAgent._build_thread_context(agent, thread[2], thread)
+    assert "Body of 1" in context
@@ -0,0 +1,60 @@
+"""Tests for SimHash fingerprints and their banded index."""
+
+from app.email.fingerprint import (
+    BAND_BITS,
+    BANDS,
+    MAX_BANDED_DISTANCE,
+    bands,
+    group_near_duplicates,
+    hamming,
+    simhash,
+)
+
+ALERT = (
+    "Build #{n} of project payments-api failed on branch main at 2025-10-{day} 12:{n}. "
+    "Three tests failed in the integration suite; see https://ci.example.com/builds/{n} "
+    "for the full log and the list of changes included in this build."
+)
+
+
+def test_simhash_ignores_counters_and_links():
+    first = simhash(ALERT.format(n=1041, day=13))
+    second = simhash(ALERT.format(n=1042, day=14))
+    assert first and first == second
+
+
+def test_simhash_separates_different_text():
+    other = simhash("Quarterly planning meeting moved to Thursday; please update the agenda document.")
+    assert hamming(simhash(ALERT.format(n=1, day=1)), other) > MAX_BANDED_DISTANCE
+
+
+def test_simhash_of_text_without_words():
+    assert simhash("") == 0
+    assert simhash(" -- !! ") == 0
+
+
+def test_bands_cover_the_fingerprint():
+    fingerprint = 0x0123_4567_89AB_CDEF
+    parts = bands(fingerprint)
+    assert len(parts) == BANDS
+    assert parts == [0xCDEF, 0x89AB, 0x4567, 0x0123]
+    assert sum(part << (i * BAND_BITS) for i, part in enumerate(parts)) == fingerprint
+
+
+def test_close_fingerprints_share_a_band():
+    fingerprint = 0x0123_4567_89AB_CDEF
+    # One flipped bit in each of all but one band
+    near = fingerprint ^ (1 << 3) ^ (1 << 20) ^ (1 << 40)
+    assert hamming(fingerprint, near) == MAX_BANDED_DISTANCE
+    assert any(a == b for a, b in zip(bands(fingerprint), bands(near)))
+
+
+def test_group_near_duplicates_by_sender():
+    items = [
+        ("1", "ci@example.com", 0b1111),
+        ("2", "alice@example.com", 0b1111),
+        ("3", "ci@example.com", 0b1110),
+        ("4", "ci@example.com", 0),
+        ("5", "ci@example.com", 0b1111 << 40),
+    ]
+    assert group_near_duplicates(items, max_distance=1) == [["1", "3"]]
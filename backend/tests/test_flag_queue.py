@@ -0,0 +1,148 @@
+"""Tests for the write-behind flag queue."""
+
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.email import flag_queue
+from app.email.flag_queue import FLAGGED, SEEN, FlagQueue
+from app.email.records import EmailRecord
+from app.email.store import MailStore
+
+
+class FakeIMAP:
+    """Records UID STOREs; ``fail`` makes them return False, ``missing`` mailboxes raise."""
+
+    def __init__(self):
+        self.stores: list[tuple[str, list[int], str, bool]] = []
+        self.fail = False
+        self.missing: set[str] = set()
+
+    def store_flags(self, mailbox, uids, flag, add):
+        if mailbox in self.missing:
+            raise ValueError(f"Mailbox {mailbox} not found")
+        self.stores.append((mailbox, sorted(uids), flag, add))
+        return not self.fail
+
+
+@pytest.fixture
+def account(tmp_path):
+    imap = FakeIMAP()
+
+    async def run_imap(func):
+        return func(imap)
+
+    store = MailStore(str(tmp_path / "store.db"))
+    store.add_emails([
+        EmailRecord(
+            id=str(uid), message_id=f"<{uid}@x>", from_address="a@example.com", subject="s",
+            body="b", date=datetime(2025, 10, 13, tzinfo=timezone.utc), is_read=uid == 3,
+        )
+        for uid in (1, 2, 3)
+    ])
+    priority = SimpleNamespace(update_flags=lambda *args, **kwargs: None)
+    yield SimpleNamespace(imap=imap, run_imap=run_imap, store=store, priority=priority)
+    store.close()
+
+
+def is_read(account, uid: int) -> bool:
+    return account.store.get_email(str(uid)).is_read
+
+
+def test_changes_coalesce_into_one_store_per_direction(account):
+    async def scenario():
+        queue = FlagQueue(account, delay=60)
+        queue.enqueue("INBOX", [1, 2], SEEN, True)
+        queue.enqueue("INBOX", [2], SEEN, False)  # latest change wins
+        queue.enqueue("INBOX", [3], FLAGGED, True)
+        assert queue.pending_count == 3
+        assert is_read(account, 1) and not is_read(account, 2)
+        await queue.flush()
+        await queue.close()
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert sorted(account.imap.stores) == [
+        ("INBOX", [1], SEEN, True),
+        ("INBOX", [2], SEEN, False),
+        ("INBOX", [3], FLAGGED, True),
+    ]
+    assert queue.pending_count == 0
+
+
+def test_failing_change_is_dropped_and_reverted(account, monkeypatch):
+    monkeypatch.setattr(flag_queue, "MAX_ATTEMPTS", 3)
+    account.imap.fail = True
+
+    async def scenario():
+        queue = FlagQueue(account, delay=60)
+        queue.enqueue("INBOX", [1, 3], SEEN, True)
+        assert is_read(account, 1)
+        for _ in range(3):
+            await queue.flush()
+        await queue.close()
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert len(account.imap.stores) == 3
+    assert queue.pending_count == 0
+    assert not is_read(account, 1), "restored to its value before the change"
+    assert is_read(account, 3)
+
+
+def test_missing_mailbox_is_dropped_at_once(account):
+    account.imap.missing.add("INBOX")
+
+    async def scenario():
+        queue = FlagQueue(account, delay=60)
+        queue.enqueue("INBOX", [2], SEEN, True)
+        await queue.flush()
+        pending = queue.pending_count
+        await queue.close()
+        return pending
+
+    assert asyncio.run(scenario()) == 0
+    assert not is_read(account, 2)
+
+
+def test_retry_waits_longer_after_each_failure(account):
+    account.imap.fail = True
+
+    async def scenario():
+        queue = FlagQueue(account, delay=0.01)
+        queue.enqueue("INBOX", [1], SEEN, True)
+        await queue.flush()
+        await queue.flush()
+        failed = queue._failed_flushes
+        await queue.close()
+        return failed
+
+    assert asyncio.run(scenario()) >= 2
+
+
+def test_single_email_routes_go_through_the_queue(account):
+    from fastapi import HTTPException
+
+    from app.api.emails import mark_email_as_read, mark_email_as_unread
+
+    async def scenario():
+        account.flag_queue = FlagQueue(account, delay=60)
+        response = await mark_email_as_read("1", account)
+        assert response == {"message": "Email marked as read", "email_id": "1", "pending": 1}
+        assert is_read(account, 1)
+
+        await mark_email_as_unread("3", account)
+        assert not is_read(account, 3)
+
+        with pytest.raises(HTTPException) as error:
+            await mark_email_as_read("abc", account)
+        assert error.value.status_code == 400
+
+        await account.flag_queue.flush()
+        assert sorted(account.imap.stores) == [
+            ("INBOX", [1], SEEN, True), ("INBOX", [3], SEEN, False)
+        ]
+
+    asyncio.run(scenario())
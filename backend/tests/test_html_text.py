@@ -0,0 +1,40 @@
+"""Tests for plain-text extraction from HTML email bodies."""
+
+from app.email.html_text import html_to_text
+
+
+def test_blocks_become_lines_and_hidden_content_is_dropped():
+    html = """
+    <html><head><title>Newsletter</title><style>p { color: red }</style></head>
+    <body>
+      <div style="display:none">Preheader text</div>
+      <h1>Hello&nbsp;there</h1>
+      <p>First   paragraph with a <a href="https://example.com">link</a>.</p>
+      <script>alert("x")</script>
+      <ul><li>One</li><li>Two</li></ul>
+      <img src="https://t.example.com/pixel.gif" width="1" height="1" alt="tracker">
+      <img src="logo.png" alt="Logo">
+    </body></html>
+    """
+    assert html_to_text(html) == "Hello there\n\nFirst paragraph with a link.\n\n- One\n- Two\nLogo"
+
+
+def test_table_cells_are_separated_only_between_text():
+    html = (
+        "<table><tr><td></td><td>Name</td><td></td><td>Amount</td></tr>"
+        "<tr><td>Coffee</td><td>3.50</td></tr></table>"
+    )
+    assert html_to_text(html) == "Name | Amount\nCoffee | 3.50"
+
+
+def test_preformatted_text_keeps_its_spacing():
+    assert html_to_text("<p>a  b</p><pre>a  b\nc   d</pre>") == "a b\n\na  b\nc   d"
+
+
+def test_output_is_truncated_at_a_word():
+    text = html_to_text("<p>" + "word " * 100 + "</p>", max_chars=22)
+    assert text == "word word word word..."
+
+
+def test_malformed_markup_keeps_text():
+    assert html_to_text("<p>Unclosed <b>bold <i>text") == "Unclosed bold text"
@@ -0,0 +1,173 @@
+"""Tests for fetching messages, pages and new arrivals from IMAP."""
+
+import pytest
+
+from app.email.imap_client import IMAPClient, compress_uid_set, expand_uid_set
+from app.email.store import MailStore
+
+
+def raw_message(uid: int) -> bytes:
+    return (
+        b"From: Alice <alice@example.com>\r\n"
+        b"To: me@example.com\r\n"
+        b"Subject: Hello %d\r\n"
+        b"Message-ID: <%d@example.com>\r\n"
+        b"Date: Tue, 14 Oct 2025 10:00:00 +0000\r\n"
+        b"\r\n"
+        b"Hi there\r\n"
+    ) % (uid, uid)
+
+
+RAW = raw_message(1)
+
+
+@pytest.mark.parametrize(
+    "uids, uid_set",
+    [
+        ([1, 2, 3, 7], "1:3,7"),
+        ([9, 3, 2, 2, 1, 5, 6], "1:3,5:6,9"),
+        ([42], "42"),
+        ([], ""),
+    ],
+)
+def test_uid_sets_round_trip(uids, uid_set):
+    assert compress_uid_set(uids) == uid_set
+    assert expand_uid_set(uid_set) == sorted(set(uids))
+
+
+def test_expand_uid_set_accepts_reversed_ranges():
+    assert expand_uid_set("5:3,10") == [3, 4, 5, 10]
+
+
+class FakeConnection:
+    """Answers UID FETCH with a canned response."""
+
+    def __init__(self, response: list):
+        self.response = response
+        self.commands = []
+
+    def read(self, size: int) -> bytes:
+        return b""
+
+    def uid(self, command: str, *args):
+        self.commands.append((command, *args))
+        return "OK", self.response
+
+
+class FakeServer:
+    """A selected mailbox answering UID SEARCH and UID FETCH."""
+
+    def __init__(self, messages: dict[int, bytes], seen: set[int] = frozenset()):
+        self.messages = messages
+        self.seen = set(seen)
+        self.fetched: list[list[int]] = []
+
+    def select(self, mailbox, readonly=False):
+        return "OK", [str(len(self.messages)).encode()]
+
+    def response(self, code):
+        return "OK", [b"1"]
+
+    def uid(self, command: str, *args):
+        if command == "SEARCH":
+            criteria = args[1:]
+            uids = sorted(self.messages)
+            if "UID" in criteria:
+                low, high = criteria[criteria.index("UID") + 1].split(":")
+                uids = [u for u in uids if u >= int(low) and (high == "*" or u <= int(high))] or uids[-1:]
+            if "UNSEEN" in criteria:
+                uids = [u for u in uids if u not in self.seen]
+            return "OK", [" ".join(map(str, uids)).encode()]
+
+        uids = [u for u in expand_uid_set(args[0]) if u in self.messages]
+        self.fetched.append(uids)
+        data = []
+        for seq, uid in enumerate(uids, 1):
+            flags = b"\\Seen" if uid in self.seen else b""
+            literal = self.messages[uid]
+            if b"HEADER" in args[1].encode():
+                literal = literal.split(b"\r\n\r\n")[0] + b"\r\n\r\n"
+            data += [(b"%d (UID %d FLAGS (%s) BODY[] {%d}" % (seq, uid, flags, len(literal)), literal), b")"]
+        return "OK", data
+
+
+@pytest.fixture
+def client(settings, tmp_path):
+    store = MailStore(str(tmp_path / "store.db"))
+    client = IMAPClient(settings, store)
+    yield client
+    store.close()
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        [(b"1 (UID 7 FLAGS (\\Seen \\Flagged) BODY[] {%d}" % len(RAW), RAW), b")"],
+        # Flags sent after the literal
+        [(b"1 (UID 7 BODY[] {%d}" % len(RAW), RAW), b" FLAGS (\\Seen \\Flagged))"],
+    ],
+)
+def test_fetch_by_id_reads_flags(client, response):
+    client.imap = FakeConnection(response)
+    email_obj = client._fetch_email_by_id("7")
+
+    assert email_obj.subject == "Hello 1"
+    assert email_obj.is_read and email_obj.is_flagged
+    assert "FLAGS" in client.imap.commands[0][2]
+
+
+def test_fetch_by_id_keeps_cached_flags_in_sync(client):
+    client.imap = FakeConnection([(b"1 (UID 7 FLAGS (\\Seen) BODY[] {%d}" % len(RAW), RAW), b")"])
+    client._fetch_email_by_id("7")
+    cached = client.store.get_email("7", "INBOX")
+    assert cached.is_read and not cached.is_flagged
+
+    client.imap = FakeConnection([(b"1 (UID 7 FLAGS () BODY[] {%d}" % len(RAW), RAW), b")"])
+    client._fetch_email_by_id("7")
+    assert not client.store.get_email("7", "INBOX").is_read
+
+
+def connect(client: IMAPClient, server: FakeServer) -> FakeServer:
+    client.imap = server
+    client._connected = True
+    return server
+
+
+def test_page_total_counts_every_match(client):
+    connect(client, FakeServer({uid: raw_message(uid) for uid in range(1, 8)}, seen={2, 5}))
+
+    first = client.fetch_page(limit=2, is_read=False)
+    assert [e.id for e in first.emails] == ["7", "6"]
+    assert first.total == 5
+
+    second = client.fetch_page(limit=2, is_read=False, cursor=first.next_cursor)
+    assert [e.id for e in second.emails] == ["4", "3"]
+    assert second.total == 5
+
+    last = client.fetch_page(limit=2, is_read=False, cursor=second.next_cursor)
+    assert [e.id for e in last.emails] == ["1"]
+    assert last.total == 5 and last.next_cursor is None
+
+
+def test_new_emails_are_fetched_in_batches_without_gaps(client):
+    server = connect(client, FakeServer({uid: raw_message(uid) for uid in range(1, 11)}))
+
+    emails, last_uid = client.fetch_new_emails(since_uid=2, limit=5)
+    assert [e.id for e in emails] == ["3", "4", "5", "6", "7"]
+    assert last_uid == 7
+    assert server.fetched == [[3, 4, 5, 6, 7]]
+
+    emails, last_uid = client.fetch_new_emails(since_uid=last_uid, limit=5)
+    assert [e.id for e in emails] == ["8", "9", "10"]
+    assert last_uid == 10
+
+    assert client.fetch_new_emails(since_uid=last_uid, limit=5) == ([], 10)
+
+
+def test_unread_emails_are_fetched_in_one_request(client):
+    server = connect(client, FakeServer({uid: raw_message(uid) for uid in range(1, 8)}, seen={6}))
+
+    emails = client.fetch_unread_emails(limit=3)
+    assert [e.id for e in emails] == ["7", "5", "4"]
+    assert not any(e.is_read for e in emails)
+    assert server.fetched == [[4, 5, 7]]
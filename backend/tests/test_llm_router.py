@@ -0,0 +1,166 @@
+"""Tests for circuit breakers and deadlines in the model router."""
+
+import asyncio
+import time
+
+import pytest
+
+from app.agent.llm_router import (
+    CIRCUIT_MIN_CALLS,
+    CircuitBreaker,
+    DeadlineExceededError,
+    ModelRouter,
+    deadline,
+)
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(CIRCUIT_MIN_CALLS):
+        assert breaker.allow()
+        breaker.record(False)
+
+
+def test_breaker_opens_after_failures():
+    breaker = CircuitBreaker(failure_rate=0.5, cooldown=60)
+    for _ in range(CIRCUIT_MIN_CALLS - 1):
+        assert not breaker.record(False)
+    assert breaker.state == "closed"
+    assert breaker.record(False)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_stays_closed_below_failure_rate():
+    breaker = CircuitBreaker(failure_rate=0.5, cooldown=60)
+    for i in range(CIRCUIT_MIN_CALLS * 2):
+        breaker.record(i % 3 != 0)
+    assert breaker.state == "closed"
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker(failure_rate=0.5, cooldown=0.01)
+    open_breaker(breaker)
+    time.sleep(0.02)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow(), "only one trial call at a time"
+    assert breaker.record(False)
+    assert breaker.state == "open"
+
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+def test_released_probe_can_be_retried():
+    breaker = CircuitBreaker(failure_rate=0.5, cooldown=0.01)
+    open_breaker(breaker)
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+class FakeClient:
+    """Stands in for ChatAnthropic: ``invoke`` waits ``delay`` seconds, then answers or raises."""
+
+    def __init__(self, delay: float = 0.0, error: Exception | None = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return "answer"
+
+    async def astream(self, messages):
+        await asyncio.sleep(self.delay)
+        yield "chunk"
+
+
+@pytest.fixture
+def router(settings, monkeypatch):
+    settings.llm_circuit_cooldown = 0.01
+    router = ModelRouter(settings)
+    client = FakeClient()
+    monkeypatch.setattr(router, "client", lambda *args, **kwargs: client)
+    router.fake = client
+    return router
+
+
+def half_open(router: ModelRouter) -> CircuitBreaker:
+    breaker = router.breaker(router.settings.llm_model)
+    open_breaker(breaker)
+    time.sleep(0.02)
+    return breaker
+
+
+def test_invoke_success_closes_half_open_circuit(router):
+    breaker = half_open(router)
+    assert router.invoke("reply", []) == "answer"
+    assert breaker.state == "closed"
+
+
+def test_exhausted_deadline_releases_probe(router):
+    breaker = half_open(router)
+    with deadline(0):
+        with pytest.raises(DeadlineExceededError):
+            router.invoke("reply", [])
+    assert router.fake.calls == 0
+    assert router.invoke("reply", []) == "answer"
+    assert breaker.state == "closed"
+
+
+def test_client_deadline_does_not_count_against_model(router):
+    router.fake.delay = 0.05
+    breaker = router.breaker(router.settings.llm_model)
+    for _ in range(CIRCUIT_MIN_CALLS * 2):
+        with deadline(0.001):
+            with pytest.raises(DeadlineExceededError):
+                router.invoke("reply", [])
+    time.sleep(0.1)
+    assert breaker.state == "closed"
+
+
+def test_model_deadline_counts_against_model(router, monkeypatch):
+    router.settings.llm_deadline = 0.001
+    router.fake.delay = 0.05
+    breaker = router.breaker(router.settings.llm_model)
+    for _ in range(CIRCUIT_MIN_CALLS):
+        with pytest.raises(DeadlineExceededError):
+            router.invoke("reply", [])
+    assert breaker.state == "open"
+
+
+def test_abandoned_probe_is_recorded_when_it_completes(router):
+    breaker = half_open(router)
+    router.fake.delay = 0.05
+    with deadline(0.001):
+        with pytest.raises(DeadlineExceededError):
+            router.invoke("reply", [])
+    assert breaker.state == "half_open"
+    time.sleep(0.1)
+    assert breaker.state == "closed"
+
+
+def test_cancelled_stream_releases_probe(router):
+    breaker = half_open(router)
+    router.fake.delay = 1
+
+    async def consume():
+        async for _ in router.astream("chat", []):
+            pass
+
+    async def cancel_early():
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_early())
+    assert breaker.allow(), "the trial call was given back"
@@ -0,0 +1,84 @@
+"""Tests for the streaming MIME parser fed in arbitrary chunks."""
+
+import base64
+
+import pytest
+
+from app.email.imap_client import parse_email_bytes
+from app.email.mime_stream import MimeStreamParser
+
+ATTACHMENT = bytes(range(256)) * 40
+
+RAW = (
+    b"From: Alice <alice@example.com>\r\n"
+    b"To: me@example.com\r\n"
+    b"Subject: =?utf-8?q?Caf=C3=A9_report?=\r\n"
+    b"Message-ID: <1@example.com>\r\n"
+    b"MIME-Version: 1.0\r\n"
+    b'Content-Type: multipart/mixed; boundary="outer"\r\n'
+    b"\r\n"
+    b"Preamble is ignored.\r\n"
+    b"--outer\r\n"
+    b'Content-Type: multipart/alternative; boundary="inner"\r\n'
+    b"\r\n"
+    b"--inner\r\n"
+    b"Content-Type: text/plain; charset=utf-8\r\n"
+    b"Content-Transfer-Encoding: quoted-printable\r\n"
+    b"\r\n"
+    b"Caf=C3=A9 numbers are attached. This line is long enough to need a soft=\r\n"
+    b" break.\r\n"
+    b"--not-a-boundary\r\n"
+    b"--inner\r\n"
+    b"Content-Type: text/html; charset=utf-8\r\n"
+    b"\r\n"
+    b"<p>Caf\xc3\xa9 numbers</p>\r\n"
+    b"--inner--\r\n"
+    b"--outer\r\n"
+    b"Content-Type: application/octet-stream\r\n"
+    b'Content-Disposition: attachment; filename="data.bin"\r\n'
+    b"Content-Transfer-Encoding: base64\r\n"
+    b"\r\n"
+    + base64.encodebytes(ATTACHMENT).replace(b"\n", b"\r\n")
+    + b"--outer--\r\n"
+    b"Epilogue is ignored.\r\n"
+)
+
+
+def parse(raw: bytes, size: int):
+    parser = MimeStreamParser()
+    for start in range(0, len(raw), size):
+        parser.feed(raw[start:start + size])
+    return parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 1000, len(RAW)])
+def test_chunk_size_does_not_change_the_result(size):
+    parsed = parse(RAW, size)
+    assert parsed.headers["Message-ID"] == "<1@example.com>"
+    assert parsed.body == (
+        "Café numbers are attached. This line is long enough to need a soft break.\r\n"
+        "--not-a-boundary"
+    )
+    assert parsed.html_body == "<p>Café numbers</p>"
+    assert [(a.filename, a.content_type, a.size) for a in parsed.attachments] == [
+        ("data.bin", "application/octet-stream", len(ATTACHMENT))
+    ]
+
+
+def test_record_built_from_stream():
+    record = parse_email_bytes("1", RAW)
+    assert record.subject == "Café report"
+    assert record.from_address == "alice@example.com"
+    assert record.has_attachments
+
+
+def test_truncated_message_keeps_what_was_read():
+    parsed = parse(RAW[:RAW.index(b"--not-a-boundary")], 5)
+    assert parsed.body.startswith("Café numbers")
+    assert parsed.attachments == []
+
+
+def test_single_part_message():
+    parsed = parse(b"Subject: Hi\r\n\r\nLine one\r\nLine two\r\n", 4)
+    assert parsed.body == "Line one\r\nLine two\r\n"
+    assert parsed.html_body is None
@@ -0,0 +1,117 @@
+"""Tests for the priority index catching up with messages changed in the store."""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from app.email.priority_index import PriorityIndex
+from app.email.records import EmailRecord
+from app.email.store import MailStore
+
+ME = "me@example.com"
+
+
+def record(uid: str, **fields) -> EmailRecord:
+    values = {
+        "id": uid,
+        "message_id": f"<{uid}@example.com>",
+        "from_address": "alice@example.com",
+        "to_addresses": [ME],
+        "subject": f"Subject {uid}",
+        "body": f"Body {uid}",
+        "date": datetime(2025, 10, 14, int(uid), tzinfo=timezone.utc),
+    }
+    values.update(fields)
+    return EmailRecord(**values)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MailStore(str(tmp_path / "store.db"))
+    yield store
+    store.close()
+
+
+def uids(index: PriorityIndex, **kwargs) -> list[str]:
+    entries, _ = index.top(limit=50, **kwargs)
+    return [entry.uid for entry in entries]
+
+
+def test_flags_synced_from_server_reach_the_index(store):
+    index = PriorityIndex(store, ME)
+    store.add_emails([record("1"), record("2")])
+    assert sorted(uids(index)) == ["1", "2"]
+
+    # A later sync rewrites the row in place with the server's flags
+    store.add_email(record("1", is_read=True, is_flagged=True))
+    assert uids(index) == ["2"]
+    entry = index._entries[("INBOX", "1")]
+    assert entry.is_read and "flagged" in entry.reasons
+    assert len(index) == 2
+
+
+def test_flag_updates_in_store_reach_a_separate_index(store):
+    store.add_emails([record("1"), record("2")])
+    index = PriorityIndex(store, ME)
+    assert sorted(uids(index)) == ["1", "2"]
+
+    # Another worker's index sees flag changes written to the shared store
+    store.update_flags("INBOX", [2], is_read=True)
+    assert uids(index) == ["1"]
+
+
+def test_merged_threads_move_indexed_messages(store):
+    index = PriorityIndex(store, ME)
+    store.add_emails([record("1"), record("2", references=["<0@example.com>"])])
+    uids(index)
+    assert "thread" not in index._entries[("INBOX", "1")].reasons
+
+    # A message referencing both joins their threads
+    store.add_email(record("3", references=["<1@example.com>", "<0@example.com>"]))
+    uids(index)
+    threads = {index._entries[("INBOX", uid)].thread_id for uid in ("1", "2", "3")}
+    assert len(threads) == 1
+    assert index._thread_sizes[threads.pop()] == 3
+    assert all("thread" in index._entries[("INBOX", uid)].reasons for uid in ("1", "2", "3"))
+
+
+def test_our_messages_count_once(store):
+    index = PriorityIndex(store, ME)
+    sent = record("1", from_address=ME, to_addresses=["alice@example.com"])
+    store.add_email(sent, "Sent")
+    store.add_email(record("2"))
+    uids(index)
+    assert index._sent_counts["alice@example.com"] == 1
+
+    store.add_email(record("1", from_address=ME, to_addresses=["alice@example.com"], is_read=True), "Sent")
+    uids(index)
+    assert index._sent_counts["alice@example.com"] == 1
+    assert sum(index._thread_sizes.values()) == 2
+
+
+def test_versions_follow_commit_order_across_connections(tmp_path):
+    path = str(tmp_path / "shared.db")
+    first, second = MailStore(path), MailStore(path)
+    try:
+        index = PriorityIndex(first, ME)
+        first.add_email(record("1"))
+        uids(index)
+
+        # Another process holds a write transaction while this one writes
+        with second._lock, second._conn:
+            version = second._next_version()
+            writer = threading.Thread(target=first.add_email, args=(record("3"),))
+            writer.start()
+            time.sleep(0.2)
+            assert writer.is_alive()
+            second._upsert(record("2"), "INBOX", version)
+        writer.join()
+
+        versions = dict(first._conn.execute("SELECT uid, version FROM messages").fetchall())
+        assert versions["1"] < versions["2"] < versions["3"]
+        assert sorted(uids(index)) == ["1", "2", "3"]
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,39 @@
+"""Tests for refinement sessions shared between worker processes."""
+
+from app.agent.refine_sessions import RefineSessionStore
+
+
+def test_session_resumes_from_another_worker(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    worker_a, worker_b = RefineSessionStore(path), RefineSessionStore(path)
+
+    session = worker_a.get_or_create()
+    assert not session.resumed
+    session.add_turn("Make it shorter", "Short draft")
+    worker_a.save(session)
+
+    resumed = worker_b.get_or_create(session.id)
+    assert resumed.resumed
+    assert resumed.id == session.id
+    assert resumed.draft == "Short draft"
+    assert [m["role"] for m in resumed.history] == ["user", "assistant"]
+
+
+def test_unknown_or_expired_session_starts_fresh(tmp_path):
+    store = RefineSessionStore(str(tmp_path / "sessions.db"), ttl=-1)
+    session = store.get_or_create()
+    session.draft = "kept?"
+    store.save(session)
+
+    fresh = store.get_or_create(session.id)
+    assert not fresh.resumed
+    assert fresh.id != session.id
+    assert fresh.draft == ""
+
+
+def test_least_recently_used_sessions_are_dropped(tmp_path):
+    store = RefineSessionStore(str(tmp_path / "sessions.db"), max_sessions=2)
+    first = store.get_or_create()
+    store.get_or_create()
+    store.get_or_create()
+    assert not store.get_or_create(first.id).resumed
@@ -0,0 +1,81 @@
+"""Tests for date-range queries of the mail store across UTC offsets."""
+
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.email.models import EmailSummary
+from app.email.records import EmailRecord
+from app.email.store import MailStore
+
+UTC = timezone.utc
+
+
+def record(uid: str, date: datetime, **fields) -> EmailRecord:
+    return EmailRecord(
+        id=uid,
+        message_id=f"<{uid}@example.com>",
+        from_address="a@example.com",
+        subject=f"Subject {uid}",
+        body=f"Body {uid}",
+        date=date,
+        **fields,
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MailStore(str(tmp_path / "store.db"))
+    yield store
+    store.close()
+
+
+def test_range_compares_instants_not_text(store):
+    # 23:00 at -10:00 is 09:00 UTC the next day; as text it sorts before "2025-10-14"
+    store.add_emails([
+        record("1", datetime(2025, 10, 13, 23, 0, tzinfo=timezone(timedelta(hours=-10)))),
+        record("2", datetime(2025, 10, 14, 8, 0, tzinfo=timezone(timedelta(hours=2)))),
+        record("3", datetime(2025, 10, 14, 10, 0, tzinfo=UTC)),
+    ])
+    rows = store.emails_in_range(
+        "INBOX", datetime(2025, 10, 14, tzinfo=UTC), datetime(2025, 10, 15, tzinfo=UTC), limit=10
+    )
+    assert [email.id for email, _, _ in rows] == ["3", "1", "2"]
+
+
+def test_duplicate_window_uses_instants(store):
+    old = record("1", datetime(2025, 10, 13, 23, 0, tzinfo=timezone(timedelta(hours=-10))), fingerprint=12345)
+    store.add_email(old)
+    store.save_summary(EmailSummary(email_id="1", summary="earlier"))
+    new = record("2", datetime(2025, 10, 15, tzinfo=UTC), fingerprint=12345)
+
+    found = store.find_duplicate_summary(new, since=datetime(2025, 10, 14, 8, 0, tzinfo=UTC))
+    assert found is not None and found.summary == "earlier"
+    assert store.find_duplicate_summary(new, since=datetime(2025, 10, 14, 10, 0, tzinfo=UTC)) is None
+
+
+def test_old_store_is_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE messages (mailbox TEXT NOT NULL, uid TEXT NOT NULL, "
+        "message_id TEXT NOT NULL DEFAULT '', from_address TEXT NOT NULL DEFAULT '', "
+        "subject TEXT NOT NULL DEFAULT '', date TEXT NOT NULL, data TEXT NOT NULL, "
+        "PRIMARY KEY (mailbox, uid))"
+    )
+    email = record("1", datetime(2025, 10, 13, 23, 0, tzinfo=timezone(timedelta(hours=-10))))
+    conn.execute(
+        "INSERT INTO messages VALUES ('INBOX', '1', ?, ?, ?, ?, ?)",
+        (email.message_id, email.from_address, email.subject, email.date.isoformat(), email.to_json()),
+    )
+    conn.commit()
+    conn.close()
+
+    store = MailStore(path)
+    rows = store.emails_in_range(
+        "INBOX", datetime(2025, 10, 14, tzinfo=UTC), datetime(2025, 10, 15, tzinfo=UTC), limit=10
+    )
+    assert [email.id for email, _, _ in rows] == ["1"]
+    store.close()
+    MailStore(path).close()  # a second open finds the store up to date
@@ -0,0 +1,56 @@
+"""Tests for full-text search of the mail store."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from app.email.records import EmailRecord
+from app.email.store import MailStore, build_match_query
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("invoice", '"invoice"*'),
+        ("march invoice", '"march" "invoice"*'),
+        ('subject:"x" OR body NEAR(a b)', '"subject" "x" "OR" "body" "NEAR" "a" "b"*'),
+        ("café  déjà-vu", '"café" "déjà" "vu"*'),
+        ("  ", ""),
+        ('"*()', ""),
+    ],
+)
+def test_build_match_query(query, expected):
+    assert build_match_query(query) == expected
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MailStore(str(tmp_path / "store.db"))
+    store.add_emails([
+        EmailRecord(
+            id=str(uid),
+            message_id=f"<{uid}@example.com>",
+            from_address=sender,
+            subject=subject,
+            body=body,
+            date=datetime(2025, 10, uid, tzinfo=timezone.utc),
+        )
+        for uid, sender, subject, body in (
+            (1, "billing@example.com", "Your March invoice", "The invoice is attached."),
+            (2, "alice@example.com", "Lunch", "Shall we meet at noon? NOT about invoices."),
+            (3, "bob@example.com", "Re: Lunch", "Noon works."),
+        )
+    ])
+    yield store
+    store.close()
+
+
+def test_search_ranks_subject_matches_first(store):
+    response = store.search("invoice")
+    assert [hit.email_id for hit in response.results] == ["1", "2"]
+    assert response.total == 2
+
+
+def test_search_ignores_fts_operators(store):
+    assert store.search("lunch NOT").total == 1
+    assert store.search("NEAR(").total == 0
@@ -1,4 +1,4 @@
-import { apiClient } from './client'
+import { apiClient, API_BASE_URL } from './client'
 import type {
   GenerateReplyRequest,
   GeneratedReply,
@@ -6,9 +6,84 @@ import type {
   RefineReplyResponse,
   ChatRefineRequest,
   ChatRefineResponse,
-  EmailSummary
+  ChatMessage,
+  EmailSummary,
+  RefineSessionState
 } from '@shared/types'
 
+export interface RefineSessionHandlers {
+  onSession?: (state: RefineSessionState) => void
+  onToken?: (text: string) => void
+  onDraft?: (draft: string) => void
+  onDone?: () => void
+  onCancelled?: () => void
+  onError?: (detail: string) => void
+}
+
+export interface RefineSession {
+  send: (content: string) => void
+  cancel: () => void
+  setDraft: (draft: string) => void
+  close: () => void
+}
+
+// Open a WebSocket refinement session: history and draft stay on the server,
+// assistant tokens stream back and a generation can be cancelled mid-flight
+export const openRefineSession = (
+  init: { history: ChatMessage[]; draft: string },
+  handlers: RefineSessionHandlers
+): RefineSession => {
+  const socket = new WebSocket(`${API_BASE_URL.replace(/^http/, 'ws')}/api/agent/chat-refine/ws`)
+  const queue: string[] = []
+
+  const post = (message: object) => {
+    const data = JSON.stringify(message)
+    if (socket.readyState === WebSocket.OPEN) {
+      socket.send(data)
+    } else {
+      queue.push(data)
+    }
+  }
+
+  socket.onopen = () => {
+    socket.send(JSON.stringify({ type: 'init', ...init }))
+    queue.splice(0).forEach(data => socket.send(data))
+  }
+
+  socket.onmessage = (event) => {
+    const message = JSON.parse(event.data)
+    switch (message.type) {
+      case 'session':
+        handlers.onSession?.(message)
+        break
+      case 'token':
+        handlers.onToken?.(message.text)
+        break
+      case 'draft':
+        handlers.onDraft?.(message.draft)
+        break
+      case 'done':
+        handlers.onDone?.()
+        break
+      case 'cancelled':
+        handlers.onCancelled?.()
+        break
+      case 'error':
+        handlers.onError?.(message.detail)
+        break
+    }
+  }
+
+  socket.onerror = () => handlers.onError?.('Connection error')
+
+  return {
+    send: (content) => post({ type: 'message', content }),
+    cancel: () => post({ type: 'cancel' }),
+    setDraft: (draft) => post({ type: 'draft', draft }),
+    close: () => socket.close()
+  }
+}
+
 export const agentApi = {
   // Generate AI reply
   generateReply: async (request: GenerateReplyRequest): Promise<GeneratedReply> => {
@@ -1,6 +1,6 @@
 import axios from 'axios'
 
-const API_BASE_URL = 'http://localhost:8000'
+export const API_BASE_URL = 'http://localhost:8000'
 
 export const apiClient = axios.create({
   baseURL: API_BASE_URL,
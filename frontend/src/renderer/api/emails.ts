@@ -30,6 +30,16 @@ export const emailsApi = {
     await apiClient.post(`/api/emails/${emailId}/mark-unread`)
   },
 
+  // Mark several emails as read (queued and written to the server in bulk)
+  markManyAsRead: async (emailIds: string[]): Promise<void> => {
+    await apiClient.post('/api/emails/mark-read', { email_ids: emailIds })
+  },
+
+  // Mark several emails as unread (queued and written to the server in bulk)
+  markManyAsUnread: async (emailIds: string[]): Promise<void> => {
+    await apiClient.post('/api/emails/mark-unread', { email_ids: emailIds })
+  },
+
   // Send email
   sendEmail: async (request: SendEmailRequest): Promise<void> => {
     await apiClient.post('/api/emails/send', request)
@@ -54,15 +54,19 @@ export const InboxView: React.FC<InboxViewProps> = ({ onPrepareResponse }) => {
     setSelectedEmail(email)
   }
 
+  const setReadState = (emailIds: string[], isRead: boolean) => {
+    setEmails(prev => prev.map(e => emailIds.includes(e.id) ? { ...e, is_read: isRead } : e))
+    setSelectedEmail(prev => prev && emailIds.includes(prev.id) ? { ...prev, is_read: isRead } : prev)
+  }
+
   const handleMarkAsRead = async (emailId: string) => {
+    // Update the UI first; the backend queues the change and writes it in bulk
+    setReadState([emailId], true)
     try {
-      await emailsApi.markAsRead(emailId)
-      setEmails(emails.map(e => e.id === emailId ? { ...e, is_read: true } : e))
-      if (selectedEmail?.id === emailId) {
-        setSelectedEmail({ ...selectedEmail, is_read: true })
-      }
+      await emailsApi.markManyAsRead([emailId])
     } catch (error) {
       console.error('Failed to mark as read:', error)
+      setReadState([emailId], false)
     }
   }
 
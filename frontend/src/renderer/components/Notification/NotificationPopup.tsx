@@ -31,7 +31,7 @@ export const NotificationPopup: React.FC = () => {
 
   if (!currentNotification) return null
 
-  const { email, summary } = currentNotification
+  const { email, summary, similarCount } = currentNotification
   const sender = email.from.split('@')[0]
 
   return (
@@ -70,6 +70,11 @@ export const NotificationPopup: React.FC = () => {
               <div className="font-semibold text-text-primary line-clamp-2">
                 {email.subject}
               </div>
+              {similarCount > 0 && (
+                <div className="text-xs text-text-secondary mt-1">
+                  {t('notification.similar', { count: similarCount })}
+                </div>
+              )}
             </div>
 
             {summary && isExpanded && (
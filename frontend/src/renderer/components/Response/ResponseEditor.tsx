@@ -3,7 +3,7 @@ import { Button, Input, LoadingSpinner } from '../ui'
 import { useI18n } from '../../hooks'
 import { useEmailStore } from '../../store/emailStore'
 import { useNotificationStore } from '../../store/notificationStore'
-import { agentApi } from '../../api/agent'
+import { openRefineSession, type RefineSession } from '../../api/agent'
 import { emailsApi } from '../../api/emails'
 
 interface ResponseEditorProps {
@@ -19,7 +19,6 @@ export const ResponseEditor: React.FC<ResponseEditorProps> = ({ onBack, onCancel
     conversationHistory,
     setDraft,
     addChatMessage,
-    setChatHistory,
     isGenerating,
     setGenerating
   } = useEmailStore()
@@ -29,13 +28,43 @@ export const ResponseEditor: React.FC<ResponseEditorProps> = ({ onBack, onCancel
   const [showConfirm, setShowConfirm] = useState(false)
   const [isSending, setIsSending] = useState(false)
   const [sendError, setSendError] = useState<string | null>(null)
+  const [streamingText, setStreamingText] = useState('')
   const messagesEndRef = useRef<HTMLDivElement>(null)
+  const sessionRef = useRef<RefineSession | null>(null)
 
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' })
-  }, [conversationHistory])
+  }, [conversationHistory, streamingText])
 
-  const handleSendMessage = async () => {
+  useEffect(() => {
+    const finishTurn = () => {
+      setStreamingText('')
+      setGenerating(false)
+    }
+
+    sessionRef.current = openRefineSession(
+      { history: conversationHistory, draft: currentDraft ?? '' },
+      {
+        onToken: (text) => setStreamingText(prev => prev + text),
+        onDraft: (draft) => {
+          setDraft(draft)
+          addChatMessage({ role: 'assistant', content: draft })
+        },
+        onDone: finishTurn,
+        onCancelled: finishTurn,
+        onError: (detail) => {
+          console.error('Failed to refine reply:', detail)
+          finishTurn()
+        }
+      }
+    )
+
+    return () => sessionRef.current?.close()
+    // The session is opened once per editor; later turns only send the new message
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [])
+
+  const handleSendMessage = () => {
     if (!userMessage.trim() || isGenerating || !currentEmail) return
 
     const message = userMessage.trim()
@@ -44,23 +73,7 @@ export const ResponseEditor: React.FC<ResponseEditorProps> = ({ onBack, onCancel
 
     addChatMessage({ role: 'user', content: message })
 
-    try {
-      const response = await agentApi.chatRefine({
-        conversation_history: conversationHistory,
-        user_message: message
-      })
-
-      setChatHistory(response.updated_history)
-
-      const assistantMessage = response.updated_history[response.updated_history.length - 1]
-      if (assistantMessage.role === 'assistant') {
-        setDraft(assistantMessage.content)
-      }
-    } catch (error) {
-      console.error('Failed to refine reply:', error)
-    } finally {
-      setGenerating(false)
-    }
+    sessionRef.current?.send(message)
   }
 
   const handleKeyPress = (e: React.KeyboardEvent) => {
@@ -179,10 +192,20 @@ export const ResponseEditor: React.FC<ResponseEditorProps> = ({ onBack, onCancel
                 </div>
               ))}
 
+              {isGenerating && streamingText && (
+                <div className="p-3 rounded-lg bg-bg-secondary text-text-primary mr-8">
+                  <div className="text-xs opacity-70 mb-1">AI</div>
+                  <div className="text-sm whitespace-pre-wrap">{streamingText}</div>
+                </div>
+              )}
+
               {isGenerating && (
                 <div className="flex items-center space-x-2 text-text-secondary">
                   <LoadingSpinner size="sm" />
                   <span className="text-sm">{t('chat.refining')}</span>
+                  <Button variant="outline" onClick={() => sessionRef.current?.cancel()}>
+                    {t('chat.stop')}
+                  </Button>
                 </div>
               )}
 
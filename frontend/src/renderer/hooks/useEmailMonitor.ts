@@ -15,16 +15,28 @@ export const useEmailMonitor = () => {
       const response = await emailsApi.checkEmails()
       
       if (response.new_emails_count > 0) {
+        // Near-duplicates (alert storms, list blasts) collapse into the
+        // notification of the first message of their group
+        const similarCounts = new Map<string, number>()
+        const collapsed = new Set<string>()
+        for (const [first, ...rest] of response.duplicate_groups ?? []) {
+          similarCounts.set(first, rest.length)
+          rest.forEach((id) => collapsed.add(id))
+        }
+
         // Process each new email
         for (const email of response.emails) {
+          if (collapsed.has(email.id)) continue
+          const similarCount = similarCounts.get(email.id) ?? 0
           try {
-            // Get AI summary
-            const summary = await agentApi.summarizeEmail(email.id)
-            addNotification(email, summary)
+            // Use the summary pre-generated by the backend when available
+            const summary =
+              response.summaries?.[email.id] ?? (await agentApi.summarizeEmail(email.id))
+            addNotification(email, summary, similarCount)
           } catch (error) {
             console.error('Failed to summarize email:', error)
             // Add notification without summary
-            addNotification(email)
+            addNotification(email, undefined, similarCount)
           }
         }
       }
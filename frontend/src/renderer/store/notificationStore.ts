@@ -4,6 +4,7 @@ import type { Email, EmailSummary } from '@shared/types'
 interface EmailNotification {
   email: Email
   summary?: EmailSummary
+  similarCount: number
   timestamp: number
 }
 
@@ -11,7 +12,7 @@ interface NotificationState {
   queue: EmailNotification[]
   currentNotification: EmailNotification | null
   
-  addNotification: (email: Email, summary?: EmailSummary) => void
+  addNotification: (email: Email, summary?: EmailSummary, similarCount?: number) => void
   removeNotification: (emailId: string) => void
   showNext: () => void
   dismissCurrent: () => void
@@ -22,10 +23,11 @@ export const useNotificationStore = create<NotificationState>((set, get) => ({
   queue: [],
   currentNotification: null,
 
-  addNotification: (email, summary) => {
+  addNotification: (email, summary, similarCount = 0) => {
     const notification: EmailNotification = {
       email,
       summary,
+      similarCount,
       timestamp: Date.now()
     }
 
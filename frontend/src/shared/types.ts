@@ -34,6 +34,7 @@ export interface EmailSummary {
   priority: 'low' | 'medium' | 'high'
   action_required: boolean
   suggested_actions: string[]
+  derived_from?: string | null
 }
 
 export interface GeneratedReply {
@@ -69,6 +70,8 @@ export interface CheckEmailsResponse {
   new_emails_count: number
   emails: Email[]
   last_check: string
+  summaries: Record<string, EmailSummary>
+  duplicate_groups: string[][]
 }
 
 export interface GenerateReplyRequest {
@@ -81,11 +84,20 @@ export interface RefineReplyRequest {
   email_id: string
   current_draft: string
   user_feedback: string
+  mode?: 'edit' | 'rewrite'
 }
 
 export interface RefineReplyResponse {
   refined_text: string
   char_count: number
+  mode: 'edit' | 'rewrite'
+  diff: string
+}
+
+export interface RefineSessionState {
+  session_id: string
+  history: ChatMessage[]
+  draft: string
 }
 
 export interface ChatRefineRequest {